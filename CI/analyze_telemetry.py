@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Streams PUREDOTS_TELEMETRY_OUT ndjson files and summarizes metric records.
+Usage: python analyze_telemetry.py <telemetry.ndjson> [--prefix time.] [--json] [--mmap]
+
+Memory stays constant regardless of file size: the file is read in fixed-size
+chunks into a reusable buffer (or mapped with --mmap) and metric records are
+picked out with a precompiled pattern instead of parsing every line as JSON.
+Percentiles come from a log-bucketed sketch with bounded relative error.
+"""
+
+import argparse
+import json
+import math
+import mmap
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_PREFIXES = ("time.", "rewind.", "scenario.")
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+PERCENTILES = (0.50, 0.95, 0.99)
+
+_NUMBER = rb"(-?(?:[0-9][0-9.]*(?:[eE][+-]?[0-9]+)?|Infinity)|NaN)"
+_TRUNCATED = b'"type":"telemetryTruncated"'
+_TRUNCATED_PATTERN = re.compile(re.escape(_TRUNCATED))
+_ALLOCATION = re.compile(rb'"type":"allocation"[^\n]*?"tick":(\d+)[^\n]*?"totalAllocated":(-?\d+)')
+BYTES_PER_MB = 1024 * 1024
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch-style) with bounded relative error."""
+
+    def __init__(self, relative_error: float = 0.01):
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.log_gamma = math.log(self.gamma)
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value > 0:
+            index = math.ceil(math.log(value) / self.log_gamma)
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = math.ceil(math.log(-value) / self.log_gamma)
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zero += 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+
+    def _bucket_value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._bucket_value(index)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._bucket_value(index)
+        return self._bucket_value(max(self.positive)) if self.positive else 0.0
+
+
+class SeriesDownsampler:
+    """Streaming bucket-mean downsampler: keeps at most max_points by doubling the bucket width in ticks."""
+
+    def __init__(self, max_points: int = 2000):
+        self.max_points = max_points
+        self.width = 1
+        self.buckets = []  # [bucket start tick, tick sum, value sum, count]
+
+    def add(self, tick: int, value: float) -> None:
+        start = tick - tick % self.width
+        last = self.buckets[-1] if self.buckets else None
+        if last is not None and last[0] == start:
+            last[1] += tick
+            last[2] += value
+            last[3] += 1
+        else:
+            self.buckets.append([start, tick, value, 1])
+            if len(self.buckets) > self.max_points:
+                self._widen()
+
+    def _widen(self) -> None:
+        self.width *= 2
+        merged = []
+        for start, tick_sum, value_sum, count in self.buckets:
+            start -= start % self.width
+            if merged and merged[-1][0] == start:
+                merged[-1][1] += tick_sum
+                merged[-1][2] += value_sum
+                merged[-1][3] += count
+            else:
+                merged.append([start, tick_sum, value_sum, count])
+        self.buckets = merged
+
+    def points(self) -> list[tuple[float, float]]:
+        return [(tick_sum / count, value_sum / count) for _, tick_sum, value_sum, count in self.buckets]
+
+
+class MetricStats:
+    """Running count/min/max/mean plus a quantile sketch for one metric key."""
+
+    __slots__ = ("count", "nan", "minimum", "maximum", "total", "first_tick", "last_tick", "sketch")
+
+    def __init__(self):
+        self.count = 0
+        self.nan = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.first_tick = None
+        self.last_tick = None
+        self.sketch = QuantileSketch()
+
+    def add(self, tick: int, value: float) -> None:
+        if value != value:
+            self.nan += 1
+            return
+        self.count += 1
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.total += value
+        if self.first_tick is None:
+            self.first_tick = tick
+        self.last_tick = tick
+        if not math.isinf(value):
+            self.sketch.add(value)
+
+    def summary(self) -> dict:
+        result = {
+            "count": self.count,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "mean": self.total / self.count if self.count else None,
+            "firstTick": self.first_tick,
+            "lastTick": self.last_tick,
+        }
+        for q in PERCENTILES:
+            value = self.sketch.quantile(q)
+            if value is not None:
+                # Bucket midpoints can land just outside the observed range; clamp them back.
+                value = min(max(value, self.minimum), self.maximum)
+            result[f"p{int(q * 100)}"] = value
+        if self.nan:
+            result["nan"] = self.nan
+        return result
+
+
+def compile_patterns(prefixes: tuple[str, ...]) -> list[tuple[re.Pattern, str]]:
+    """Build the record matchers for the requested key prefixes."""
+    metric_prefixes = [p for p in prefixes if not p.startswith("frameTiming.")]
+    patterns = []
+    if metric_prefixes:
+        keys = b"|".join(re.escape(p.encode("utf-8")) for p in metric_prefixes)
+        patterns.append((re.compile(
+            rb'"type":"metric"[^\n]*?"tick":(\d+)[^\n]*?"key":"((?:' + keys + rb')[^"\n]*)","value":' + _NUMBER
+        ), ""))
+    if any(p.startswith("frameTiming.") or p == "frameTiming" for p in prefixes):
+        patterns.append((re.compile(
+            rb'"type":"frameTiming"[^\n]*?"tick":(\d+)[^\n]*?"group":"([^"\n]*)","durationMs":' + _NUMBER
+        ), "frameTiming."))
+    return patterns
+
+
+def _scan(buffer, patterns, metrics: dict, key_cache: dict) -> None:
+    for pattern, key_prefix in patterns:
+        for match in pattern.finditer(buffer):
+            raw_key = match.group(2)
+            key = key_cache.get((key_prefix, raw_key))
+            if key is None:
+                key = key_prefix + raw_key.decode("utf-8", "replace")
+                key_cache[(key_prefix, raw_key)] = key
+            stats = metrics.get(key)
+            if stats is None:
+                stats = metrics[key] = MetricStats()
+            stats.add(int(match.group(1)), float(match.group(3)))
+
+
+def iter_line_blocks(handle, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """Yield memoryviews of whole lines read through one reusable buffer.
+
+    Each view is only valid until the next iteration; a trailing line without a
+    newline is yielded last. Lines longer than the buffer grow it.
+    """
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    carry = 0
+    try:
+        while True:
+            read = handle.readinto(view[carry:])
+            if not read:
+                break
+            filled = carry + read
+            cut = buffer.rfind(b"\n", 0, filled)
+            if cut < 0:
+                if filled == len(buffer):
+                    # A single line longer than the buffer: grow it and keep reading.
+                    view.release()
+                    buffer.extend(bytes(len(buffer)))
+                    view = memoryview(buffer)
+                carry = filled
+                continue
+            block = view[:cut + 1]
+            yield block
+            block.release()
+            carry = filled - (cut + 1)
+            buffer[:carry] = buffer[cut + 1:filled]
+        if carry:
+            block = view[:carry]
+            yield block
+            block.release()
+    finally:
+        view.release()
+
+
+def _scan_allocations(buffer, memory: SeriesDownsampler) -> None:
+    for match in _ALLOCATION.finditer(buffer):
+        memory.add(int(match.group(1)), int(match.group(2)) / BYTES_PER_MB)
+
+
+def analyze_telemetry(path: Path, prefixes: tuple[str, ...] = DEFAULT_PREFIXES,
+                      use_mmap: bool = False, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                      memory_points: int = 0) -> dict:
+    """Stream a telemetry ndjson file and return per-metric summaries.
+
+    With memory_points > 0 the allocation records are also collected into a
+    downsampled (tick, totalAllocated MB) series of at most that many points.
+    """
+    patterns = compile_patterns(prefixes)
+    memory = SeriesDownsampler(memory_points) if memory_points > 0 else None
+    metrics: dict[str, MetricStats] = {}
+    key_cache: dict = {}
+    truncated = False
+    started = time.perf_counter()
+    size = path.stat().st_size
+
+    with open(path, "rb") as handle:
+        if use_mmap and size > 0:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                _scan(mapped, patterns, metrics, key_cache)
+                if memory is not None:
+                    _scan_allocations(mapped, memory)
+                truncated = mapped.find(_TRUNCATED) >= 0
+        else:
+            for block in iter_line_blocks(handle, chunk_bytes):
+                _scan(block, patterns, metrics, key_cache)
+                if memory is not None:
+                    _scan_allocations(block, memory)
+                if not truncated and _TRUNCATED_PATTERN.search(block):
+                    truncated = True
+
+    elapsed = time.perf_counter() - started
+    result = {
+        "path": str(path),
+        "bytes": size,
+        "seconds": round(elapsed, 3),
+        "mbPerSecond": round(size / (1024 * 1024) / elapsed, 1) if elapsed > 0 else None,
+        "truncated": truncated,
+        "metrics": {key: metrics[key].summary() for key in sorted(metrics)},
+    }
+    if memory is not None:
+        result["memorySeries"] = memory.points()
+    return result
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.3f}"
+
+
+def print_summary(result: dict) -> None:
+    print("=" * 60)
+    print(f"Telemetry: {result['path']}")
+    print(f"  {result['bytes'] / (1024 * 1024):.1f} MB in {result['seconds']:.2f}s"
+          + (" (TRUNCATED at cap)" if result["truncated"] else ""))
+    print("=" * 60)
+    header = f"{'metric':<40} {'count':>9} {'min':>10} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for key, stats in result["metrics"].items():
+        print(f"{key:<40} {stats['count']:>9} {_fmt(stats['min']):>10} {_fmt(stats['mean']):>10} "
+              f"{_fmt(stats['p50']):>10} {_fmt(stats['p95']):>10} {_fmt(stats['p99']):>10} {_fmt(stats['max']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize PureDOTS telemetry ndjson in constant memory.")
+    parser.add_argument("telemetry", type=Path)
+    parser.add_argument("--prefix", action="append",
+                        help="Metric key prefix to include (repeatable; default: time., rewind., scenario.; "
+                             "use frameTiming. for per-group frame timings)")
+    parser.add_argument("--json", action="store_true", help="Emit the summary as JSON")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the file instead of chunked reads")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024))
+    args = parser.parse_args()
+
+    if not args.telemetry.exists():
+        print(f"Telemetry file not found: {args.telemetry}")
+        sys.exit(1)
+
+    prefixes = tuple(args.prefix) if args.prefix else DEFAULT_PREFIXES
+    result = analyze_telemetry(args.telemetry, prefixes, use_mmap=args.mmap,
+                               chunk_bytes=max(1, args.chunk_mb) * 1024 * 1024)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_summary(result)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
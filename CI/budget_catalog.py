@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Performance budgets compiled from scenario files.
+Usage: python budget_catalog.py [scenarioId ...] [--scenarios DIR] [--rebuild] [--json]
+
+Every scenario JSON with a performanceTargets block becomes one budget. Besides
+maxTickTimeMs / maxMemoryMB / targetFPS a block may carry:
+
+  "tickPercentilesMs": {"p95": 20.0, "p99": 25.0, "p99.9": 33.3}   absolute limits
+  "maxEntities": 20000                       default: 10x the scenario's entityCounts
+  "subsystemsMs": {"Movement": 5.0, ...}     per system/group mean ms per tick
+  "tiersMs": {"hot": 8.0, "warm": 5.0}       per heat tier (system_timings.py)
+  "extends": "scale_stress_100k"             inherit every field not set here
+  "scaleWithEntities": {"maxTickTimeMs": 1.0, "subsystemsMs": 1.0}
+
+scaleWithEntities gives per-field exponents: an inherited value is multiplied
+by (entities / parent entities) ** exponent, where entities is the sum of each
+scenario's entityCounts. Budgets are matched on the exact scenarioId only.
+
+Scenarios are scanned from the Samples directory plus PUREDOTS_SCENARIO_DIRS
+(os.pathsep separated, later directories win). The compiled catalog is pickled
+to PUREDOTS_BUDGET_CACHE (default CI/.cache/budget_catalog.pickle) keyed by
+every scenario file's mtime and size, and memoized per process, so validating
+hundreds of reports parses the scenarios at most once.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLES_PATH = REPO_ROOT / "Packages/com.moni.puredots/Runtime/Runtime/Scenarios/Samples"
+DEFAULT_CACHE = Path(os.environ.get("PUREDOTS_BUDGET_CACHE", Path(__file__).resolve().parent / ".cache" / "budget_catalog.pickle"))
+CATALOG_VERSION = 1
+DEFAULT_ENTITY_HEADROOM = 10
+BUDGET_FIELDS = ("maxTickTimeMs", "maxMemoryMB", "targetFPS", "tickPercentilesMs", "subsystemsMs", "tiersMs",
+                 "scaleWithEntities")
+REQUIRED_FIELDS = ("maxTickTimeMs", "maxMemoryMB")
+
+_MEMO = {}
+
+
+def scenario_dirs(extra=()) -> list[Path]:
+    """Samples first, then PUREDOTS_SCENARIO_DIRS, then explicit directories."""
+    dirs = [SAMPLES_PATH]
+    dirs += [Path(p) for p in os.environ.get("PUREDOTS_SCENARIO_DIRS", "").split(os.pathsep) if p]
+    dirs += [Path(p) for p in extra]
+    return dirs
+
+
+def scan_signature(dirs: list[Path], builtins: dict) -> tuple:
+    """(path, mtime_ns, size) for every scenario file; cheap, no parsing."""
+    entries = []
+    for directory in dirs:
+        try:
+            with os.scandir(directory) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            continue
+    return CATALOG_VERSION, tuple(entries), repr(sorted(builtins.items()))
+
+
+def planned_entities(data: dict) -> int:
+    return sum(int(row.get("count", 0)) for row in data.get("entityCounts") or [] if isinstance(row, dict))
+
+
+def scale_value(value, factor: float):
+    if isinstance(value, dict):
+        return {key: scale_value(item, factor) for key, item in value.items()}
+    return round(value * factor, 3)
+
+
+def resolve(scenario_id: str, raw: dict, resolved: dict, problems: list[str], chain=()) -> Optional[dict]:
+    """Resolve one scenario's budget, following extends (parents first)."""
+    if scenario_id in resolved:
+        return resolved[scenario_id]
+    if scenario_id in chain:
+        problems.append(f"{scenario_id}: extends cycle {' -> '.join(chain + (scenario_id,))}")
+        return None
+    entry = raw[scenario_id]
+    targets = entry["targets"]
+    budget = {"scenarioId": scenario_id, "source": entry["source"], "entities": entry["entities"], "extends": []}
+
+    parent_id = targets.get("extends")
+    if parent_id:
+        parent = resolve(parent_id, raw, resolved, problems, chain + (scenario_id,)) if parent_id in raw else None
+        if parent is None:
+            problems.append(f"{scenario_id}: extends unknown or invalid budget {parent_id}")
+            resolved[scenario_id] = None
+            return None
+        rules = targets.get("scaleWithEntities", parent.get("scaleWithEntities")) or {}
+        ratio = budget["entities"] / parent["entities"] if budget["entities"] and parent["entities"] else 1.0
+        for field in BUDGET_FIELDS:
+            if field in parent and field not in targets:
+                exponent = rules.get(field) if field != "scaleWithEntities" else None
+                budget[field] = scale_value(parent[field], ratio ** exponent) if exponent else parent[field]
+        budget["extends"] = [parent_id] + parent["extends"]
+
+    for field in BUDGET_FIELDS:
+        if field in targets:
+            budget[field] = targets[field]
+    budget["maxEntities"] = targets.get("maxEntities") or (budget["entities"] * DEFAULT_ENTITY_HEADROOM or None)
+
+    missing = [field for field in REQUIRED_FIELDS if not budget.get(field)]
+    if missing:
+        problems.append(f"{scenario_id}: budget missing {', '.join(missing)}")
+        budget = None
+    resolved[scenario_id] = budget
+    return budget
+
+
+def compile_catalog(files: list[str], builtins: dict) -> tuple[dict, list[str]]:
+    """Parse scenario files once and resolve inheritance: ({scenarioId: budget}, problems)."""
+    raw = {}
+    problems = []
+    for scenario_id, targets in builtins.items():
+        raw[scenario_id] = {"targets": dict(targets), "entities": 0, "source": "builtin"}
+    for path in files:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            problems.append(f"{path}: {e}")
+            continue
+        scenario_id = data.get("scenarioId") if isinstance(data, dict) else None
+        targets = data.get("performanceTargets") if scenario_id else None
+        if not isinstance(targets, dict):
+            continue
+        raw[scenario_id] = {"targets": {**builtins.get(scenario_id, {}), **targets},
+                            "entities": planned_entities(data), "source": path}
+
+    resolved = {}
+    for scenario_id in raw:
+        resolve(scenario_id, raw, resolved, problems)
+    return {key: value for key, value in resolved.items() if value is not None}, problems
+
+
+def load_catalog(builtins: Optional[dict] = None, extra_dirs=(), cache: Optional[Path] = DEFAULT_CACHE,
+                 refresh: bool = False) -> dict:
+    """The compiled catalog, from the process memo, the pickle cache, or a fresh compile."""
+    builtins = builtins or {}
+    memo_key = (tuple(str(d) for d in scenario_dirs(extra_dirs)), repr(sorted(builtins.items())))
+    if not refresh and memo_key in _MEMO:
+        return _MEMO[memo_key]
+
+    signature = scan_signature(scenario_dirs(extra_dirs), builtins)
+    catalog = None
+    if cache and not refresh:
+        try:
+            with open(cache, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("signature") == signature:
+                catalog = cached
+        except (OSError, pickle.PickleError, EOFError, AttributeError, TypeError):
+            catalog = None
+    if catalog is None:
+        budgets, problems = compile_catalog([path for path, _, _ in signature[1]], builtins)
+        catalog = {"signature": signature, "budgets": budgets, "problems": problems}
+        if cache:
+            try:
+                cache.parent.mkdir(parents=True, exist_ok=True)
+                tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+                with open(tmp, "wb") as f:
+                    pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, cache)
+            except OSError:
+                pass  # read-only checkout: the process memo still saves the re-parse
+    _MEMO[memo_key] = catalog
+    return catalog
+
+
+def lookup(scenario_id: str, builtins: Optional[dict] = None) -> Optional[dict]:
+    """Exact-match budget for a scenario, or None."""
+    return load_catalog(builtins)["budgets"].get(scenario_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the performance budget catalog compiled from scenario files.")
+    parser.add_argument("scenario_ids", nargs="*", help="Only show these scenarios")
+    parser.add_argument("--scenarios", action="append", default=[], help="Extra scenario directory (repeatable)")
+    parser.add_argument("--cache", type=Path, default=DEFAULT_CACHE)
+    parser.add_argument("--no-cache", action="store_true", help="Compile without reading or writing the cache")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the cache and recompile")
+    parser.add_argument("--json", action="store_true", help="Print the budgets as JSON")
+    args = parser.parse_args()
+
+    from validate_metrics import BUDGETS
+    catalog = load_catalog(BUDGETS, args.scenarios, None if args.no_cache else args.cache, args.rebuild)
+    budgets = catalog["budgets"]
+    missing = [scenario_id for scenario_id in args.scenario_ids if scenario_id not in budgets]
+    if args.scenario_ids:
+        budgets = {key: budgets[key] for key in args.scenario_ids if key in budgets}
+
+    if args.json:
+        print(json.dumps({"budgets": budgets, "problems": catalog["problems"], "missing": missing}, indent=2))
+    else:
+        for scenario_id in sorted(budgets):
+            budget = budgets[scenario_id]
+            line = (f"{scenario_id}: tick {budget['maxTickTimeMs']}ms, memory {budget['maxMemoryMB']}MB, "
+                    f"entities {budget['maxEntities'] or '-'}")
+            if budget.get("tickPercentilesMs"):
+                line += ", " + ", ".join(f"{k} {v}ms" for k, v in budget["tickPercentilesMs"].items())
+            if budget.get("subsystemsMs"):
+                line += f", {len(budget['subsystemsMs'])} subsystem budgets"
+            if budget["extends"]:
+                line += f" (extends {' -> '.join(budget['extends'])})"
+            print(line)
+        for problem in catalog["problems"]:
+            print(f"WARNING: {problem}")
+        for scenario_id in missing:
+            print(f"No budget defined for scenario: {scenario_id}")
+    sys.exit(1 if missing else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Columnar export of scale reports and their telemetry for offline queries.
+Usage: python columnar_export.py export <reports_directory> [--out CI/Columnar] [--format auto|parquet|raw] [--jobs N]
+       python columnar_export.py query <root> [--key ticks.ms] [--scenario scale_stress_100k] [--since 2026-10-10] [--json]
+
+Each report (and the telemetry ndjson next to it, found the same way as the
+validator does) becomes one run under a hive-style partition:
+
+  <root>/scenario=<id>/commit=<sha>/seed=<n>/<run>.run.json       report scalars, key dictionary, row counts
+  <root>/scenario=<id>/commit=<sha>/seed=<n>/<run>.metrics.parquet   tick, key, value
+  <root>/scenario=<id>/commit=<sha>/seed=<n>/<run>.ticks.parquet     tick, ms (report tickTimesMs)
+
+Parquet is written with pyarrow when it is installed. Otherwise each column is
+a raw little-endian file (<run>.metrics.tick.i64, .key.i32, .value.f64,
+<run>.ticks.ms.f32) that np.memmap / np.fromfile or array.fromfile read
+directly; keys are dictionary-encoded through run.json. Telemetry is streamed
+with the analyze_telemetry chunk reader, so memory stays bounded. A run whose
+source files are unchanged is skipped, and run.json is written last, so a
+partition without it is an interrupted export.
+
+query defaults to ticks.ms, the report's per-tick durations; frameTiming.<group>
+keys are per-group durations. The telemetry time.tick metric is the tick
+counter, not a duration.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from analyze_telemetry import DEFAULT_CHUNK_BYTES, compile_patterns, iter_line_blocks
+import perf_history
+from validate_metrics import find_telemetry
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # raw column files below
+    pa = None
+    pq = None
+
+try:
+    import numpy as np
+except ImportError:  # array.fromfile below
+    np = None
+
+DEFAULT_ROOT = Path(__file__).resolve().parent / "Columnar"
+EXPORT_VERSION = 1
+ALL_PREFIXES = ("", "frameTiming.")
+REPORT_FIELDS = ("scenarioId", "seed", "timestamp", "runTicks", "targetTickTimeMs", "averageTickTimeMs",
+                 "maxTickTimeMs", "p95TickTimeMs", "peakMemoryMB", "totalEntities", "fixedDeltaTime")
+RAW_COLUMNS = {"tick": ("q", "i64"), "key": ("i", "i32"), "value": ("d", "f64")}
+QUERY_PERCENTILES = (("p50", 50.0), ("p95", 95.0), ("p99", 99.0), ("p99.9", 99.9))
+
+
+def partition_value(value) -> str:
+    """Path-safe partition value (hive style key=value directories)."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", str(value)) if value not in (None, "") else "unknown"
+
+
+def run_id(report_path: Path, report: dict) -> str:
+    digits = re.sub(r"[^0-9T]", "", str(report.get("timestamp") or ""))[:15]
+    return digits or partition_value(report_path.stem)
+
+
+def source_stamp(paths) -> list:
+    return [[str(path), path.stat().st_mtime_ns, path.stat().st_size] for path in paths]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class ColumnSink:
+    """Appends (tick, key id, value) blocks to parquet or raw column files."""
+
+    def __init__(self, base: Path, use_parquet: bool):
+        self.base = base
+        self.use_parquet = use_parquet
+        self.rows = 0
+        self.paths = []
+        self.tmp_suffix = f".{os.getpid()}.tmp"
+        if use_parquet:
+            self.path = base.with_name(base.name + ".metrics.parquet")
+            self.schema = pa.schema([("tick", pa.int64()), ("key", pa.string()), ("value", pa.float64())])
+            self.writer = pq.ParquetWriter(str(self.path) + self.tmp_suffix, self.schema, compression="zstd")
+            self.paths.append(self.path)
+        else:
+            self.handles = {}
+            for column, (_, suffix) in RAW_COLUMNS.items():
+                path = base.with_name(f"{base.name}.metrics.{column}.{suffix}")
+                self.handles[column] = open(str(path) + self.tmp_suffix, "wb")
+                self.paths.append(path)
+
+    def write(self, ticks: array, keys: array, values: array, key_names: list[str]) -> None:
+        if not ticks:
+            return
+        self.rows += len(ticks)
+        if self.use_parquet:
+            self.writer.write_table(pa.table({
+                "tick": pa.array(ticks, pa.int64()),
+                "key": pa.DictionaryArray.from_arrays(pa.array(keys, pa.int32()),
+                                                      pa.array(key_names)).cast(pa.string()),
+                "value": pa.array(values, pa.float64()),
+            }, schema=self.schema))
+        else:
+            for column, data in (("tick", ticks), ("key", keys), ("value", values)):
+                if sys.byteorder != "little":
+                    data = array(data.typecode, data)
+                    data.byteswap()
+                data.tofile(self.handles[column])
+
+    def close(self) -> None:
+        if self.use_parquet:
+            self.writer.close()
+        else:
+            for handle in self.handles.values():
+                handle.close()
+        for path in self.paths:
+            os.replace(str(path) + self.tmp_suffix, path)
+
+
+def export_telemetry(telemetry_path: Path, base: Path, use_parquet: bool,
+                     chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> dict:
+    """Stream metric and frameTiming records into columns, one block at a time."""
+    patterns = compile_patterns(ALL_PREFIXES)
+    key_ids = {}
+    key_names = []
+    sink = ColumnSink(base, use_parquet)
+    truncated = False
+    with open(telemetry_path, "rb") as handle:
+        for block in iter_line_blocks(handle, chunk_bytes):
+            ticks, keys, values = array("q"), array("i"), array("d")
+            for pattern, key_prefix in patterns:
+                for match in pattern.finditer(block):
+                    raw_key = (key_prefix, match.group(2))
+                    key_id = key_ids.get(raw_key)
+                    if key_id is None:
+                        key_id = key_ids[raw_key] = len(key_names)
+                        key_names.append(key_prefix + match.group(2).decode("utf-8", "replace"))
+                    ticks.append(int(match.group(1)))
+                    keys.append(key_id)
+                    values.append(float(match.group(3)))
+            sink.write(ticks, keys, values, key_names)
+            if not truncated and b'"type":"telemetryTruncated"' in block:
+                truncated = True
+    sink.close()
+    return {"rows": sink.rows, "keys": key_names, "truncated": truncated, "files": [p.name for p in sink.paths]}
+
+
+def export_ticks(samples: list, base: Path, use_parquet: bool) -> list[str]:
+    """Report tickTimesMs as its own (tick, ms) table."""
+    if use_parquet:
+        path = base.with_name(base.name + ".ticks.parquet")
+        table = pa.table({"tick": pa.array(range(len(samples)), pa.int64()), "ms": pa.array(samples, pa.float32())})
+        tmp = str(path) + f".{os.getpid()}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+    else:
+        path = base.with_name(base.name + ".ticks.ms.f32")
+        data = array("f", samples)
+        if sys.byteorder != "little":
+            data.byteswap()
+        _write_atomic(path, data.tobytes())
+    return [path.name]
+
+
+def export_run(report_path: Path, root: Path = DEFAULT_ROOT, fmt: str = "auto", project: str = None,
+               state_dir: Path = None, force: bool = False) -> dict:
+    """Export one report (and its telemetry) into its partition; safe to call from a worker process."""
+    started = time.perf_counter()
+    try:
+        with open(report_path, "r") as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        return {"report": report_path.name, "error": f"Failed to read report: {e}"}
+    use_parquet = pq is not None if fmt == "auto" else fmt == "parquet"
+    if use_parquet and pq is None:
+        return {"report": report_path.name, "error": "pyarrow is not installed (use --format raw)"}
+
+    commit = perf_history.resolve_build_commit(report, project, state_dir)
+    partition = (root / f"scenario={partition_value(report.get('scenarioId'))}"
+                 / f"commit={partition_value(commit)}" / f"seed={partition_value(report.get('seed'))}")
+    base = partition / run_id(report_path, report)
+    meta_path = base.with_name(base.name + ".run.json")
+    telemetry_path = find_telemetry(report_path, report)
+    sources = source_stamp([report_path] + ([telemetry_path] if telemetry_path else []))
+    if not force and meta_path.is_file():
+        try:
+            previous = json.loads(meta_path.read_text(encoding="utf-8"))
+            if previous.get("sources") == sources and previous.get("version") == EXPORT_VERSION \
+                    and previous.get("format") == ("parquet" if use_parquet else "raw"):
+                return {"report": report_path.name, "partition": str(partition), "skipped": True}
+        except (OSError, json.JSONDecodeError):
+            pass
+
+    partition.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "version": EXPORT_VERSION,
+        "format": "parquet" if use_parquet else "raw",
+        "buildCommit": commit,
+        "report": {key: report[key] for key in REPORT_FIELDS if key in report},
+        "sources": sources,
+        "files": [],
+    }
+    samples, skipped = perf_history.tick_samples(report)
+    if samples:
+        meta["files"] += export_ticks(samples, base, use_parquet)
+        meta["tickRows"] = len(samples)
+    if skipped:
+        meta["skippedTicks"] = skipped
+    if telemetry_path:
+        telemetry = export_telemetry(telemetry_path, base, use_parquet)
+        meta["files"] += telemetry.pop("files")
+        meta["metricRows"] = telemetry["rows"]
+        meta["keys"] = telemetry["keys"]
+        meta["truncated"] = telemetry["truncated"]
+    _write_atomic(meta_path, (json.dumps(meta, indent=2) + "\n").encode("utf-8"))
+    return {"report": report_path.name, "partition": str(partition), "rows": meta.get("metricRows", 0),
+            "skippedTicks": skipped, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def iter_runs(root: Path, scenario: str = None, commit: str = None, since: str = None, until: str = None):
+    """(run.json path, meta) for every exported run, pruned by partition directory first."""
+    scenario_glob = f"scenario={partition_value(scenario)}" if scenario else "scenario=*"
+    commit_glob = f"commit={partition_value(commit)}" if commit else "commit=*"
+    for meta_path in sorted(root.glob(f"{scenario_glob}/{commit_glob}/seed=*/*.run.json")):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        timestamp = str(meta["report"].get("timestamp") or "")
+        if (since and timestamp < since) or (until and timestamp >= until):
+            continue
+        yield meta_path, meta
+
+
+def read_raw(path: Path, typecode: str):
+    if np is not None:
+        return np.fromfile(path, dtype={"q": "<i8", "i": "<i4", "d": "<f8", "f": "<f4"}[typecode])
+    data = array(typecode)
+    with open(path, "rb") as f:
+        data.frombytes(f.read())
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+
+def load_metric(meta_path: Path, meta: dict, key: str) -> list[float]:
+    """Values of one metric key from a run, reading only the key and value columns."""
+    base = meta_path.with_name(meta_path.name[:-len(".run.json")])
+    if key == "ticks.ms":
+        if not meta.get("tickRows"):
+            return []
+        if meta["format"] == "parquet":
+            return pq.read_table(str(base) + ".ticks.parquet", columns=["ms"]).column("ms").to_pylist()
+        return list(read_raw(Path(str(base) + ".ticks.ms.f32"), "f"))
+    if key not in (meta.get("keys") or []):
+        return []
+    if meta["format"] == "parquet":
+        table = pq.read_table(str(base) + ".metrics.parquet", columns=["value"], filters=[("key", "=", key)])
+        return table.column("value").to_pylist()
+    key_id = meta["keys"].index(key)
+    keys = read_raw(Path(str(base) + ".metrics.key.i32"), "i")
+    values = read_raw(Path(str(base) + ".metrics.value.f64"), "d")
+    if np is not None:
+        return values[keys == key_id].tolist()
+    return [value for key_value, value in zip(keys, values) if key_value == key_id]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    position = (len(sorted_values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    result = {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 4), "max": round(ordered[-1], 4)}
+    for name, q in QUERY_PERCENTILES:
+        result[name] = round(percentile(ordered, q), 4)
+    return result
+
+
+def query(root: Path, key: str, scenario: str = None, commit: str = None, since: str = None,
+          until: str = None) -> dict:
+    """Per-run and pooled statistics of one metric key across matching runs."""
+    runs = []
+    pooled = []
+    for meta_path, meta in iter_runs(root, scenario, commit, since, until):
+        values = load_metric(meta_path, meta, key)
+        if not values:
+            continue
+        pooled.extend(values)
+        runs.append({"scenario": meta["report"].get("scenarioId"), "commit": meta.get("buildCommit"),
+                     "seed": meta["report"].get("seed"), "timestamp": meta["report"].get("timestamp"),
+                     **summarize(values)})
+    return {"key": key, "runs": runs, "pooled": summarize(pooled)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar export and queries for scale reports and telemetry.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Transcode reports and their telemetry")
+    export_parser.add_argument("reports_dir", type=Path)
+    export_parser.add_argument("--out", type=Path, default=DEFAULT_ROOT)
+    export_parser.add_argument("--format", choices=("auto", "parquet", "raw"), default="auto")
+    export_parser.add_argument("--jobs", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    export_parser.add_argument("--project", help="Project whose current_<project>.json supplies build_commit")
+    export_parser.add_argument("--state-dir", type=Path)
+    export_parser.add_argument("--force", action="store_true", help="Re-export runs whose sources are unchanged")
+
+    query_parser = subparsers.add_parser("query", help="Statistics of one metric key across exported runs")
+    query_parser.add_argument("root", type=Path)
+    query_parser.add_argument("--key", default="ticks.ms",
+                              help="ticks.ms for report tickTimesMs (default), frameTiming.<group> for group durationMs, "
+                                   "or a telemetry metric key (time.tick is the tick counter, not a duration)")
+    query_parser.add_argument("--scenario")
+    query_parser.add_argument("--commit")
+    query_parser.add_argument("--since", help="Report timestamp lower bound (ISO, inclusive)")
+    query_parser.add_argument("--until", help="Report timestamp upper bound (ISO, exclusive)")
+    query_parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "query":
+        result = query(args.root, args.key, args.scenario, args.commit, args.since, args.until)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            for run in result["runs"]:
+                print(f"{run['scenario']}  {(run['commit'] or '-')[:12]:<12}  seed={run['seed']}  {run['timestamp']}  "
+                      f"n={run['count']}  p50={run['p50']:.3f}  p99={run['p99']:.3f}  max={run['max']:.3f}")
+            pooled = result["pooled"]
+            if pooled["count"]:
+                print(f"\n{args.key}: {len(result['runs'])} runs, n={pooled['count']}, mean={pooled['mean']:.3f}, "
+                      + ", ".join(f"{name}={pooled[name]:.3f}" for name, _ in QUERY_PERCENTILES))
+            else:
+                print(f"No values for {args.key}")
+        sys.exit(0)
+
+    report_files = sorted(args.reports_dir.glob("*.json")) if args.reports_dir.is_dir() else [args.reports_dir]
+    if not report_files:
+        print(f"No JSON reports found in {args.reports_dir}")
+        sys.exit(0)
+    options = (args.out, args.format, args.project, args.state_dir, args.force)
+    jobs = min(args.jobs if args.jobs > 0 else (os.cpu_count() or 1), len(report_files))
+    started = time.perf_counter()
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(export_run, report_files, *([option] * len(report_files) for option in options)))
+    else:
+        results = [export_run(path, *options) for path in report_files]
+    failed = 0
+    for result in results:
+        if result.get("error"):
+            failed += 1
+            print(f"FAILED  {result['report']}: {result['error']}")
+        elif result.get("skipped"):
+            print(f"skip    {result['report']} (unchanged)")
+        else:
+            print(f"ok      {result['report']} -> {result['partition']} ({result['rows']} rows, {result['seconds']:.2f}s)")
+            if result["skippedTicks"]:
+                print(f"        skipped {result['skippedTicks']} non-numeric tickTimesMs samples")
+    print(f"\nExported {len(results) - failed} of {len(results)} reports to {args.out} "
+          f"({'parquet' if (args.format == 'parquet' or (args.format == 'auto' and pq)) else 'raw'}, "
+          f"{time.perf_counter() - started:.2f}s)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
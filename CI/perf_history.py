@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Append-only performance history for scale test reports, with regression detection.
+Usage: python perf_history.py ingest <report.json>... [--db history.sqlite] [--project space4x]
+       python perf_history.py check <report.json> [--db history.sqlite]
+       python perf_history.py show <scenarioId> [--db history.sqlite]
+
+Every validated report is recorded once, keyed by scenario, build commit, seed
+and timestamp. A new run is compared to a rolling baseline of earlier passing
+runs of the same scenario: a one-sided Mann-Whitney U test on per-tick samples
+when both sides have them, otherwise a z-score on run averages, plus a peak
+memory growth check. A single change-point scan over the run averages reports
+when a step change happened. Per-system timings are kept per run so the next
+report's systems can be compared to the previous accepted run.
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import statistics
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+import system_timings
+
+DEFAULT_DB = Path(os.environ.get("PUREDOTS_PERF_HISTORY", Path(__file__).resolve().parent / "History" / "perf_history.sqlite"))
+BASELINE_RUNS = 10
+MIN_BASELINE_RUNS = 3
+MAX_TEST_SAMPLES = 5000
+ALPHA = 0.01
+MIN_SLOWDOWN = 0.05          # median/average tick time growth that counts as a regression
+MIN_AVERAGE_Z = 3.0
+MAX_MEMORY_GROWTH = 0.10
+CHANGE_POINT_SCORE = 4.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    scenario TEXT NOT NULL,
+    build_commit TEXT,
+    seed INTEGER,
+    timestamp TEXT NOT NULL,
+    report TEXT,
+    average_tick_ms REAL,
+    p95_tick_ms REAL,
+    max_tick_ms REAL,
+    peak_memory_mb REAL,
+    total_entities INTEGER,
+    passed INTEGER NOT NULL,
+    ingested_utc TEXT NOT NULL,
+    UNIQUE (scenario, build_commit, seed, timestamp)
+);
+CREATE INDEX IF NOT EXISTS runs_by_scenario ON runs (scenario, timestamp);
+CREATE TABLE IF NOT EXISTS tick_samples (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id),
+    samples BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS system_timings (
+    run_id INTEGER PRIMARY KEY REFERENCES runs (id),
+    timings TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS runs_no_update BEFORE UPDATE ON runs
+BEGIN SELECT RAISE(ABORT, 'perf history is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS runs_no_delete BEFORE DELETE ON runs
+BEGIN SELECT RAISE(ABORT, 'perf history is append-only'); END;
+"""
+
+
+RUN_IDENTITY = "scenario, COALESCE(build_commit, ''), COALESCE(seed, -1), timestamp"
+RUN_IDENTITY_INDEX = f"CREATE UNIQUE INDEX IF NOT EXISTS runs_identity ON runs ({RUN_IDENTITY})"
+
+
+def open_history(db_path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the history database."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    try:
+        # The table's UNIQUE constraint treats NULL seed/build_commit as distinct; this one does not
+        conn.execute(RUN_IDENTITY_INDEX)
+    except sqlite3.IntegrityError:
+        pass  # an older database already holds duplicates; ingest() still refuses new ones
+    return conn
+
+
+def resolve_build_commit(report: dict, project: str = None, state_dir: Path = None):
+    """Build commit from the report, else from builds/current_<project>.json in the tri state dir."""
+    if report.get("buildCommit"):
+        return report["buildCommit"]
+    project = project or report.get("project")
+    state_dir = state_dir or (Path(os.environ["TRI_STATE_DIR"]) if os.environ.get("TRI_STATE_DIR") else None)
+    if not project or not state_dir:
+        return None
+    try:
+        with open(state_dir / "builds" / f"current_{project.lower()}.json", "r") as f:
+            return json.load(f).get("build_commit") or None
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+# Report fields run_key(), resolve_build_commit(), tick_samples() and system_timings.timing_map() read
+HISTORY_FIELDS = ("scenarioId", "seed", "timestamp", "buildCommit", "project", "averageTickTimeMs",
+                  "p95TickTimeMs", "maxTickTimeMs", "peakMemoryMB", "totalEntities", "tickTimesMs",
+                  "systemTimings", "systemTimingsMs")
+
+
+def run_key(report_path: Path, report: dict, build_commit) -> dict:
+    """Identity and headline numbers for one report row."""
+    timestamp = report.get("timestamp")
+    if not timestamp:
+        timestamp = datetime.fromtimestamp(report_path.stat().st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "scenario": report.get("scenarioId", "unknown"),
+        "build_commit": build_commit,
+        "seed": report.get("seed"),
+        "timestamp": timestamp,
+        "report": report_path.name,
+        "average_tick_ms": report.get("averageTickTimeMs"),
+        "p95_tick_ms": report.get("p95TickTimeMs"),
+        "max_tick_ms": report.get("maxTickTimeMs"),
+        "peak_memory_mb": report.get("peakMemoryMB"),
+        "total_entities": report.get("totalEntities"),
+    }
+
+
+def ingest(conn: sqlite3.Connection, row: dict, samples, passed: bool, timings=None) -> bool:
+    """Append one run; returns False when that exact run was already recorded."""
+    columns = list(row) + ["passed", "ingested_utc"]
+    values = list(row.values()) + [int(passed), datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")]
+    with conn:
+        if conn.execute(f"SELECT 1 FROM runs WHERE ({RUN_IDENTITY}) = (?, COALESCE(?, ''), COALESCE(?, -1), ?)",
+                        (row["scenario"], row["build_commit"], row["seed"], row["timestamp"])).fetchone():
+            return False
+        cursor = conn.execute(
+            f"INSERT OR IGNORE INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+        if cursor.rowcount == 0:
+            return False
+        if samples:
+            conn.execute("INSERT INTO tick_samples (run_id, samples) VALUES (?, ?)",
+                         (cursor.lastrowid, array("f", samples).tobytes()))
+        if timings:
+            conn.execute("INSERT INTO system_timings (run_id, timings) VALUES (?, ?)",
+                         (cursor.lastrowid, json.dumps(timings, separators=(",", ":"))))
+    return True
+
+
+def previous_system_timings(conn: sqlite3.Connection, row: dict):
+    """{system: mean ms} of the latest passing run of the scenario before this one, or None."""
+    found = conn.execute(
+        "SELECT t.timings FROM runs r JOIN system_timings t ON t.run_id = r.id "
+        "WHERE r.scenario = ? AND r.passed = 1 AND r.timestamp < ? ORDER BY r.timestamp DESC LIMIT 1",
+        (row["scenario"], row["timestamp"])).fetchone()
+    return json.loads(found[0]) if found else None
+
+
+def load_baseline(conn: sqlite3.Connection, row: dict, limit: int = BASELINE_RUNS) -> list[dict]:
+    """Most recent passing runs of the scenario before this one, excluding the same build commit."""
+    query = ("SELECT r.id, r.build_commit, r.timestamp, r.average_tick_ms, r.peak_memory_mb, s.samples "
+             "FROM runs r LEFT JOIN tick_samples s ON s.run_id = r.id "
+             "WHERE r.scenario = ? AND r.passed = 1 AND r.timestamp < ?")
+    params = [row["scenario"], row["timestamp"]]
+    if row["build_commit"]:
+        query += " AND (r.build_commit IS NULL OR r.build_commit != ?)"
+        params.append(row["build_commit"])
+    query += " ORDER BY r.timestamp DESC LIMIT ?"
+    params.append(limit)
+    runs = []
+    for run_id, commit, timestamp, average, memory, blob in conn.execute(query, params):
+        samples = None
+        if blob:
+            samples = array("f")
+            samples.frombytes(blob)
+        runs.append({"id": run_id, "build_commit": commit, "timestamp": timestamp,
+                     "average_tick_ms": average, "peak_memory_mb": memory, "samples": samples})
+    runs.reverse()
+    return runs
+
+
+def _thin(samples, limit: int = MAX_TEST_SAMPLES) -> list[float]:
+    """Deterministic even-stride subsample so the rank test stays O(n log n) on long runs."""
+    if len(samples) <= limit:
+        return list(samples)
+    step = len(samples) / limit
+    return [samples[int(i * step)] for i in range(limit)]
+
+
+def mann_whitney_greater(new: list[float], baseline: list[float]) -> float:
+    """One-sided Mann-Whitney U p-value for 'new is stochastically greater' (normal approximation)."""
+    n1, n2 = len(new), len(baseline)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(value, 0) for value in new] + [(value, 1) for value in baseline])
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        average_rank = (i + j + 2) / 2.0
+        rank_sum += average_rank * sum(1 for k in range(i, j + 1) if combined[k][1] == 0)
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+    n = n1 + n2
+    u = rank_sum - n1 * (n1 + 1) / 2.0
+    variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def change_point(series: list[float]):
+    """Best single mean-shift split of a series: (index, before, after, score) or None."""
+    n = len(series)
+    if n < 6:
+        return None
+    best = None
+    for k in range(3, n - 2):
+        left, right = series[:k], series[k:]
+        spread = statistics.pstdev(left) ** 2 * len(left) + statistics.pstdev(right) ** 2 * len(right)
+        pooled = math.sqrt(spread / (n - 2)) or 1e-9
+        score = abs(statistics.fmean(right) - statistics.fmean(left)) / pooled * math.sqrt(len(left) * len(right) / n)
+        if best is None or score > best[3]:
+            best = (k, statistics.fmean(left), statistics.fmean(right), score)
+    return best
+
+
+def detect_regressions(row: dict, samples, baseline: list[dict]) -> tuple[list[str], list[str]]:
+    """Compare a run to its rolling baseline; errors use the validator's 'exceeds' wording."""
+    errors = []
+    warnings = []
+    if len(baseline) < MIN_BASELINE_RUNS:
+        warnings.append(f"History baseline has {len(baseline)} runs (need {MIN_BASELINE_RUNS}); regression check skipped")
+        return errors, warnings
+
+    baseline_samples = [run["samples"] for run in baseline if run["samples"]]
+    if samples and baseline_samples:
+        per_run = max(1, MAX_TEST_SAMPLES // len(baseline_samples))
+        pooled = [value for run_samples in baseline_samples for value in _thin(run_samples, per_run)]
+        new = _thin(samples)
+        p_value = mann_whitney_greater(new, pooled)
+        new_median, base_median = statistics.median(new), statistics.median(pooled)
+        slowdown = new_median / base_median - 1 if base_median > 0 else 0.0
+        if p_value < ALPHA and slowdown > MIN_SLOWDOWN:
+            errors.append(f"Median tick time {new_median:.2f}ms exceeds baseline {base_median:.2f}ms "
+                          f"by {slowdown:.0%} (Mann-Whitney p={p_value:.2g}, {len(baseline_samples)} runs)")
+    else:
+        averages = [run["average_tick_ms"] for run in baseline if run["average_tick_ms"] is not None]
+        average = row.get("average_tick_ms")
+        if average is not None and len(averages) >= MIN_BASELINE_RUNS:
+            mean = statistics.fmean(averages)
+            spread = max(statistics.pstdev(averages), mean * 0.01)
+            slowdown = average / mean - 1 if mean > 0 else 0.0
+            z = (average - mean) / spread if spread > 0 else 0.0
+            if slowdown > MIN_SLOWDOWN and z > MIN_AVERAGE_Z:
+                errors.append(f"Average tick time {average:.2f}ms exceeds baseline {mean:.2f}ms "
+                              f"by {slowdown:.0%} (z={z:.1f}, {len(averages)} runs)")
+
+    memories = [run["peak_memory_mb"] for run in baseline if run["peak_memory_mb"]]
+    memory = row.get("peak_memory_mb")
+    if memory and memories:
+        base_memory = statistics.median(memories)
+        growth = memory / base_memory - 1
+        if growth > MAX_MEMORY_GROWTH:
+            errors.append(f"Peak memory {memory:.0f}MB exceeds baseline {base_memory:.0f}MB by {growth:.0%}")
+
+    series = [run["average_tick_ms"] for run in baseline if run["average_tick_ms"] is not None]
+    if row.get("average_tick_ms") is not None:
+        series.append(row["average_tick_ms"])
+    found = change_point(series)
+    if found and found[3] > CHANGE_POINT_SCORE and found[2] > found[1] * (1 + MIN_SLOWDOWN):
+        runs_ago = len(series) - found[0]
+        warnings.append(f"Change point: average tick time stepped from {found[1]:.2f}ms to {found[2]:.2f}ms "
+                        f"{runs_ago} run{'s' if runs_ago != 1 else ''} ago")
+    return errors, warnings
+
+
+def tick_samples(report: dict) -> tuple[list[float], int]:
+    """Finite tickTimesMs entries as floats, and how many entries were skipped."""
+    raw = report.get("tickTimesMs")
+    if not isinstance(raw, list):
+        return [], 0
+    samples = [number for number in map(system_timings.finite_number, raw) if number is not None]
+    return samples, len(raw) - len(samples)
+
+
+def history_fields(report: dict) -> dict:
+    """The part of a report record_report() reads, small enough to hand back from a worker process."""
+    return {key: report[key] for key in HISTORY_FIELDS if key in report}
+
+
+def record_report(conn: sqlite3.Connection, report_path: Path, passed: bool, project: str = None,
+                  state_dir: Path = None, systems: list = None, report: dict = None) -> tuple[list[str], list[str]]:
+    """Check a report against history, then append it. Returns (errors, warnings).
+
+    systems, a system_timings.breakdown() list, gets deltas against the previous accepted run.
+    report, when given (or its history_fields()), saves parsing report_path again.
+    """
+    if report is None:
+        try:
+            with open(report_path, "r") as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return [], []
+    if not isinstance(report, dict):
+        return [], []
+    row = run_key(report_path, report, resolve_build_commit(report, project, state_dir))
+    samples, skipped = tick_samples(report)
+    errors, warnings = detect_regressions(row, samples, load_baseline(conn, row))
+    if skipped:
+        warnings.append(f"History: skipped {skipped} non-numeric tickTimesMs samples")
+    if systems:
+        previous = previous_system_timings(conn, row)
+        if previous:
+            warnings += system_timings.apply_previous(systems, previous)
+    ingest(conn, row, samples, passed and not errors, system_timings.timing_map(report))
+    return errors, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale test performance history and regression detection.")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Check reports against history and append them")
+    ingest_parser.add_argument("reports", type=Path, nargs="+")
+    ingest_parser.add_argument("--project", help="Project whose current_<project>.json supplies build_commit")
+    ingest_parser.add_argument("--state-dir", type=Path)
+
+    check_parser = subparsers.add_parser("check", help="Check a report against history without recording it")
+    check_parser.add_argument("report", type=Path)
+    check_parser.add_argument("--project")
+    check_parser.add_argument("--state-dir", type=Path)
+
+    show_parser = subparsers.add_parser("show", help="List recorded runs for a scenario")
+    show_parser.add_argument("scenario")
+    show_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = open_history(args.db)
+    failed = False
+    if args.command == "show":
+        rows = conn.execute(
+            "SELECT timestamp, build_commit, seed, average_tick_ms, peak_memory_mb, passed FROM runs "
+            "WHERE scenario = ? ORDER BY timestamp DESC LIMIT ?", (args.scenario, args.limit)).fetchall()
+        for timestamp, commit, seed, average, memory, passed in reversed(rows):
+            average_text = f"{average:.2f}ms" if average is not None else "-"
+            memory_text = f"{memory:.0f}MB" if memory is not None else "-"
+            print(f"{timestamp}  {(commit or '-')[:12]:<12}  seed={seed}  avg={average_text}  "
+                  f"mem={memory_text}  {'PASS' if passed else 'FAIL'}")
+    elif args.command == "check":
+        try:
+            with open(args.report, "r") as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            report = None
+            errors, warnings = [f"Failed to read report: {e}"], []
+        if report is not None and not isinstance(report, dict):
+            report = None
+            errors, warnings = ["Report is not a JSON object"], []
+        if report is not None:
+            row = run_key(args.report, report, resolve_build_commit(report, args.project, args.state_dir))
+            samples, skipped = tick_samples(report)
+            errors, warnings = detect_regressions(row, samples, load_baseline(conn, row))
+            if skipped:
+                warnings.append(f"History: skipped {skipped} non-numeric tickTimesMs samples")
+        for msg in errors:
+            print(f"ERROR: {msg}")
+        for msg in warnings:
+            print(f"WARNING: {msg}")
+        failed = bool(errors)
+    else:
+        from validate_metrics import is_error, validate_report
+        for report_path in args.reports:
+            # Only runs that meet their budget may become baseline (passed = 1)
+            passed, budget_messages = validate_report(report_path)
+            errors, warnings = record_report(conn, report_path, passed, args.project, args.state_dir)
+            errors = [msg for msg in budget_messages if is_error(msg)] + errors
+            warnings = [msg for msg in budget_messages if not is_error(msg)] + warnings
+            print(f"{report_path.name}: {'FAILED' if not passed else 'REGRESSED' if errors else 'ok'}")
+            for msg in errors:
+                print(f"  ERROR: {msg}")
+            for msg in warnings:
+                print(f"  WARNING: {msg}")
+            failed = failed or bool(errors)
+    conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Deterministic replay comparison of two telemetry streams from same-seed runs.
+Usage: python replay_diff.py <a.ndjson|run_dir> <b.ndjson|run_dir> [--chunk-ticks 1024] [--ignore time.] [--json] [--no-cache]
+
+Metric records are grouped by their tick. Each tick's metric vector (sorted
+key=value pairs, values compared as written) is hashed, and every
+--chunk-ticks ticks fold into a chunk digest plus a running cumulative digest,
+kept with the chunk's byte range. Building that index is one streaming pass
+per file, holding one tick's records at a time, and it is cached next to the
+file (<file>.replay-index.json, keyed by size and mtime) so a reference run
+is hashed once.
+
+Equal cumulative digests at chunk i mean every chunk up to i matched, so a
+binary search over them finds the first divergent chunk. Only that chunk's
+byte range is then re-read from both files and walked tick by tick in
+lockstep to name the first divergent tick and the metrics that differ.
+A scheduled run directory (schedule_scenarios.py output) can stand in for
+either file; its single telemetry/*.ndjson stream is compared.
+Wall-clock, memory, telemetry and presentation metrics are not deterministic
+and are ignored by default (see Docs/Architecture/Save_Load_Determinism.md).
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from analyze_telemetry import DEFAULT_CHUNK_BYTES, iter_line_blocks
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".replay-index.json"
+DEFAULT_CHUNK_TICKS = 1024
+DEFAULT_IGNORE = ("time.", "memory.", "telemetry.", "presentation.")
+DEFAULT_MAX_METRICS = 20
+
+# Anchored at the line start so match.start() is a seekable record offset
+_METRIC = re.compile(rb'(?m)^[^\n]*?"type":"metric"[^\n]*?"tick":(\d+)[^\n]*?"key":"([^"\n]*)","value":([^,}\n]*)')
+
+
+def iter_ticks(handle, ignore: tuple[str, ...], base_offset: int = 0, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """Yield (tick, offset of its first record, [(key, raw value)]) per run of records sharing a tick."""
+    ignored = {}
+    offset = base_offset
+    current = None
+    start = 0
+    pairs = []
+    for block in iter_line_blocks(handle, chunk_bytes):
+        for match in _METRIC.finditer(block):
+            raw_key = match.group(2)
+            skip = ignored.get(raw_key)
+            if skip is None:
+                skip = ignored[raw_key] = raw_key.decode("utf-8", "replace").startswith(ignore) if ignore else False
+            if skip:
+                continue
+            tick = int(match.group(1))
+            if tick != current:
+                if current is not None:
+                    yield current, start, pairs
+                current, start, pairs = tick, offset + match.start(), []
+            pairs.append((raw_key, match.group(3).strip()))
+        offset += len(block)
+    if current is not None:
+        yield current, start, pairs
+
+
+def tick_digest(tick: int, pairs: list) -> bytes:
+    digest = hashlib.blake2b(str(tick).encode("ascii"), digest_size=8)
+    for key, value in sorted(pairs):
+        digest.update(b"\0" + key + b"=" + value)
+    return digest.digest()
+
+
+def build_index(path: Path, chunk_ticks: int = DEFAULT_CHUNK_TICKS, ignore: tuple[str, ...] = DEFAULT_IGNORE) -> dict:
+    """One streaming pass: [first tick, last tick, start, end, chunk digest, cumulative digest] per chunk."""
+    chunks = []
+    ticks = 0
+    records = 0
+    cumulative = b""
+    chunk = None
+    with open(path, "rb") as handle:
+        for tick, offset, pairs in iter_ticks(handle, ignore):
+            if chunk is None:
+                chunk = [tick, tick, offset, hashlib.blake2b(digest_size=16), 0]
+            elif chunk[4] == chunk_ticks:
+                cumulative = _close_chunk(chunks, chunk, offset, cumulative)
+                chunk = [tick, tick, offset, hashlib.blake2b(digest_size=16), 0]
+            chunk[1] = tick
+            chunk[3].update(tick_digest(tick, pairs))
+            chunk[4] += 1
+            ticks += 1
+            records += len(pairs)
+    size = path.stat().st_size
+    if chunk is not None:
+        _close_chunk(chunks, chunk, size, cumulative)
+    return {"ticks": ticks, "records": records, "chunks": chunks}
+
+
+def _close_chunk(chunks: list, chunk: list, end: int, cumulative: bytes) -> bytes:
+    digest = chunk[3].digest()
+    cumulative = hashlib.blake2b(cumulative + digest, digest_size=16).digest()
+    chunks.append([chunk[0], chunk[1], chunk[2], end, digest.hex(), cumulative.hex()])
+    return cumulative
+
+
+def load_index(path: Path, chunk_ticks: int = DEFAULT_CHUNK_TICKS, ignore: tuple[str, ...] = DEFAULT_IGNORE,
+               cache: bool = True) -> dict:
+    """The file's chunk index, from its sidecar cache when size, mtime and options match."""
+    stat = path.stat()
+    key = {"version": INDEX_VERSION, "size": stat.st_size, "mtimeNs": stat.st_mtime_ns,
+           "chunkTicks": chunk_ticks, "ignore": list(ignore)}
+    sidecar = path.with_name(path.name + INDEX_SUFFIX)
+    if cache:
+        try:
+            cached = json.loads(sidecar.read_text(encoding="utf-8"))
+            if all(cached.get(name) == value for name, value in key.items()):
+                return cached
+        except (OSError, json.JSONDecodeError):
+            pass
+    index = dict(key, **build_index(path, chunk_ticks, ignore))
+    if cache:
+        try:
+            tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(index, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, sidecar)
+        except OSError:
+            pass  # read-only run directory: the comparison still works, just uncached
+    return index
+
+
+def first_divergent_chunk(chunks_a: list, chunks_b: list):
+    """Binary search over cumulative digests; None when both streams match completely."""
+    low, high = 0, min(len(chunks_a), len(chunks_b))
+    while low < high:
+        mid = (low + high) // 2
+        if chunks_a[mid][5] == chunks_b[mid][5]:
+            low = mid + 1
+        else:
+            high = mid
+    if low == len(chunks_a) == len(chunks_b):
+        return None
+    return low
+
+
+def read_chunk(path: Path, chunk, ignore: tuple[str, ...]) -> list:
+    """[(tick, pairs)] for one chunk's byte range (empty past the end of the stream)."""
+    if chunk is None:
+        return []
+    with open(path, "rb") as handle:
+        handle.seek(chunk[2])
+        data = handle.read(chunk[3] - chunk[2])
+    return [(tick, pairs) for tick, _, pairs in iter_ticks(io.BytesIO(data), ignore)]
+
+
+def diff_tick(pairs_a: list, pairs_b: list, limit: int) -> list[dict]:
+    """Metrics whose values differ between the two sides of one tick."""
+    values_a = {}
+    values_b = {}
+    for key, value in pairs_a:
+        values_a.setdefault(key, []).append(value)
+    for key, value in pairs_b:
+        values_b.setdefault(key, []).append(value)
+    differences = []
+    for key in sorted(set(values_a) | set(values_b)):
+        a = sorted(values_a.get(key, []))
+        b = sorted(values_b.get(key, []))
+        if a != b:
+            differences.append({"key": key.decode("utf-8", "replace"),
+                                "a": [v.decode("utf-8", "replace") for v in a] or None,
+                                "b": [v.decode("utf-8", "replace") for v in b] or None})
+            if len(differences) >= limit:
+                break
+    return differences
+
+
+def compare(path_a: Path, path_b: Path, chunk_ticks: int = DEFAULT_CHUNK_TICKS,
+            ignore: tuple[str, ...] = DEFAULT_IGNORE, cache: bool = True,
+            max_metrics: int = DEFAULT_MAX_METRICS) -> dict:
+    """Compare two telemetry streams; result["identical"] is False with the first divergence located."""
+    started = time.perf_counter()
+    index_a = load_index(path_a, chunk_ticks, ignore, cache)
+    index_b = load_index(path_b, chunk_ticks, ignore, cache)
+    result = {
+        "a": str(path_a),
+        "b": str(path_b),
+        "ticks": [index_a["ticks"], index_b["ticks"]],
+        "records": [index_a["records"], index_b["records"]],
+        "chunkTicks": chunk_ticks,
+        "ignore": list(ignore),
+        "identical": True,
+    }
+    chunks_a, chunks_b = index_a["chunks"], index_b["chunks"]
+    found = first_divergent_chunk(chunks_a, chunks_b)
+    if found is not None:
+        result["identical"] = False
+        result["chunk"] = found
+        result["divergentChunks"] = sum(1 for a, b in zip(chunks_a, chunks_b) if a[4] != b[4]) \
+            + abs(len(chunks_a) - len(chunks_b))
+        ticks_a = read_chunk(path_a, chunks_a[found] if found < len(chunks_a) else None, ignore)
+        ticks_b = read_chunk(path_b, chunks_b[found] if found < len(chunks_b) else None, ignore)
+        for position in range(max(len(ticks_a), len(ticks_b))):
+            tick_a = ticks_a[position] if position < len(ticks_a) else None
+            tick_b = ticks_b[position] if position < len(ticks_b) else None
+            if tick_a is None or tick_b is None:
+                present = tick_a or tick_b
+                result["tick"] = present[0]
+                result["reason"] = f"stream {'b' if tick_b is None else 'a'} ends before tick {present[0]}"
+                break
+            if tick_a[0] != tick_b[0]:
+                result["tick"] = min(tick_a[0], tick_b[0])
+                result["reason"] = f"tick sequence differs (a at tick {tick_a[0]}, b at tick {tick_b[0]})"
+                break
+            differences = diff_tick(tick_a[1], tick_b[1], max_metrics)
+            if differences:
+                result["tick"] = tick_a[0]
+                result["reason"] = f"{len(differences)}{'+' if len(differences) >= max_metrics else ''} metrics differ"
+                result["metrics"] = differences
+                break
+        else:
+            result["reason"] = "chunk digests differ but no tick-level difference was found (hash collision?)"
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def find_run_telemetry(run_dir: Path):
+    """The telemetry stream of a scheduled run directory (telemetry/*.ndjson), if exactly one."""
+    candidates = sorted((run_dir / "telemetry").glob("*.ndjson"))
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Locate the first tick where two same-seed telemetry streams diverge.")
+    parser.add_argument("a", type=Path)
+    parser.add_argument("b", type=Path)
+    parser.add_argument("--chunk-ticks", type=int, default=DEFAULT_CHUNK_TICKS)
+    parser.add_argument("--ignore", action="append", default=None,
+                        help=f"Metric key prefix to leave out (repeatable; default: {', '.join(DEFAULT_IGNORE)})")
+    parser.add_argument("--compare-all", action="store_true", help="Do not ignore any metrics")
+    parser.add_argument("--max-metrics", type=int, default=DEFAULT_MAX_METRICS)
+    parser.add_argument("--no-cache", action="store_true", help=f"Do not read or write {INDEX_SUFFIX} sidecars")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    for name in ("a", "b"):
+        path = getattr(args, name)
+        if path.is_dir():
+            stream = find_run_telemetry(path)
+            if stream is None:
+                print(f"No single telemetry/*.ndjson stream in run directory: {path}")
+                sys.exit(2)
+            setattr(args, name, stream)
+        elif not path.is_file():
+            print(f"Telemetry file not found: {path}")
+            sys.exit(2)
+    ignore = () if args.compare_all else tuple(args.ignore or DEFAULT_IGNORE)
+    result = compare(args.a, args.b, args.chunk_ticks, ignore, not args.no_cache, args.max_metrics)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif result["identical"]:
+        print(f"IDENTICAL  {result['ticks'][0]} ticks, {result['records'][0]} metric records "
+              f"({result['seconds']:.2f}s)")
+    else:
+        print(f"DIVERGED   at tick {result.get('tick', '?')}: {result['reason']}")
+        print(f"  first divergent chunk {result['chunk']} ({result['chunkTicks']} ticks each), "
+              f"{result['divergentChunks']} divergent chunks; ticks a={result['ticks'][0]} b={result['ticks'][1]}")
+        for metric in result.get("metrics", []):
+            print(f"  {metric['key']}: a={metric['a']} b={metric['b']}")
+    sys.exit(0 if result["identical"] else 1)
+
+
+if __name__ == "__main__":
+    main()
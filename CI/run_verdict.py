@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Applies the headless runbook PASS/FAIL contract to run logs.
+Usage: python run_verdict.py <stdout.log | run dir | runs/YYYY-MM-DD> [--expect P0.TIME_REWIND_MICRO] [--jobs N]
+
+Each log is scanned once, in fixed-size chunks, with a single precompiled
+pattern that picks out BANK:<testId>:PASS|FAIL and TELEMETRY_OUT:<path> lines.
+A run is PASS only when the exit code is 0, every BANK line passes and carries
+tickTime/scenarioTick/delta, there is exactly one TELEMETRY_OUT line, and that
+telemetry file exists, is fresh and is within PUREDOTS_TELEMETRY_MAX_BYTES.
+One verdict.json is written next to each log.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from analyze_telemetry import DEFAULT_CHUNK_BYTES, iter_line_blocks
+
+DEFAULT_TELEMETRY_MAX_BYTES = 524288000
+STALE_SECONDS = 3600
+VERDICT_NAME = "verdict.json"
+LOG_NAMES = ("stdout.log", "player.log")
+
+_MARKERS = re.compile(
+    rb"BANK:(?P<test_id>[^:\s]+):(?P<status>PASS|FAIL)(?P<fields>[^\r\n]*)"
+    rb"|TELEMETRY_OUT:(?P<telemetry>[^\r\n]+)"
+)
+_FIELD = re.compile(r"(\w+)=(.*?)(?=\s+\w+=|\s*$)")
+REQUIRED_FIELDS = ("tickTime", "scenarioTick", "delta")
+
+
+def scan_log(log_path: Path, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> tuple[list[dict], list[str], int]:
+    """Single streaming pass: (BANK rows, TELEMETRY_OUT paths, bytes scanned)."""
+    banks = []
+    telemetry = []
+    offset = 0
+    with open(log_path, "rb") as handle:
+        for block in iter_line_blocks(handle, chunk_bytes):
+            for match in _MARKERS.finditer(block):
+                if match.group("test_id") is not None:
+                    row = {
+                        "testId": match.group("test_id").decode("utf-8", "replace"),
+                        "status": match.group("status").decode("ascii"),
+                        "offset": offset + match.start(),
+                    }
+                    fields = match.group("fields").decode("utf-8", "replace")
+                    for key, value in _FIELD.findall(fields):
+                        row[key] = int(value) if re.fullmatch(r"-?\d+", value) else value
+                    banks.append(row)
+                else:
+                    telemetry.append(match.group("telemetry").decode("utf-8", "replace").strip())
+            offset += len(block)
+    return banks, telemetry, offset
+
+
+def resolve_telemetry_path(raw: str, log_path: Path) -> Path:
+    """TELEMETRY_OUT paths may be relative to the log or Windows paths seen from WSL."""
+    match = re.match(r"^([A-Za-z]):[\\/](.*)$", raw)
+    if match and os.name != "nt":
+        path = Path("/mnt") / match.group(1).lower() / match.group(2).replace("\\", "/")
+    else:
+        path = Path(raw)
+    if not path.is_absolute():
+        path = log_path.parent / path
+    return path
+
+
+def read_exit_code(run_dir: Path):
+    try:
+        return int((run_dir / "exit_code").read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def judge_run(log_path: Path, expect: tuple[str, ...] = (), max_bytes: int = DEFAULT_TELEMETRY_MAX_BYTES,
+              allow_oversize: bool = False, write: bool = True) -> dict:
+    """Build (and by default write) the verdict for one run log."""
+    started = time.perf_counter()
+    run_dir = log_path.parent
+    failures = []
+    notes = []
+
+    banks, telemetry_lines, scanned = scan_log(log_path)
+
+    exit_code = read_exit_code(run_dir)
+    if exit_code is None:
+        notes.append("exit code not recorded")
+    elif exit_code != 0:
+        failures.append(f"exit code {exit_code}")
+
+    passed_ids = {row["testId"] for row in banks if row["status"] == "PASS"}
+    for row in banks:
+        if row["status"] == "FAIL":
+            failures.append(f"BANK:{row['testId']}:FAIL" + (f" reason={row['reason']}" if "reason" in row else ""))
+        missing = [key for key in REQUIRED_FIELDS if key not in row]
+        if missing:
+            failures.append(f"BANK:{row['testId']} missing {', '.join(missing)}")
+        elif all(isinstance(row[key], int) for key in REQUIRED_FIELDS) \
+                and row["delta"] != row["tickTime"] - row["scenarioTick"]:
+            failures.append(f"BANK:{row['testId']} delta={row['delta']} != tickTime-scenarioTick")
+    if not passed_ids:
+        failures.append("no BANK PASS line")
+    for test_id in expect:
+        if test_id not in passed_ids:
+            failures.append(f"expected BANK:{test_id}:PASS not found")
+
+    telemetry = None
+    if len(telemetry_lines) != 1:
+        failures.append(f"expected exactly one TELEMETRY_OUT line, found {len(telemetry_lines)}")
+    if telemetry_lines:
+        path = resolve_telemetry_path(telemetry_lines[-1], log_path)
+        telemetry = {"path": str(path), "exists": path.is_file()}
+        if not telemetry["exists"]:
+            failures.append(f"telemetry missing: {path}")
+        else:
+            stat = path.stat()
+            marker = run_dir / "run.started"
+            if marker.exists():
+                fresh = stat.st_mtime >= marker.stat().st_mtime - 2
+            else:
+                fresh = stat.st_mtime >= log_path.stat().st_mtime - STALE_SECONDS
+            telemetry.update({"bytes": stat.st_size, "fresh": fresh, "withinCap": stat.st_size <= max_bytes})
+            if not fresh:
+                failures.append("telemetry is stale (older than this run)")
+            if not telemetry["withinCap"]:
+                message = f"telemetry {stat.st_size} bytes exceeds cap {max_bytes}"
+                if allow_oversize:
+                    notes.append(message + " (allowed)")
+                else:
+                    failures.append(message)
+
+    verdict = {
+        "run": str(run_dir),
+        "log": str(log_path),
+        "verdict": "FAIL" if failures else "PASS",
+        "failures": failures,
+        "notes": notes,
+        "exitCode": exit_code,
+        "banks": banks,
+        "telemetry": telemetry,
+        "bytesScanned": scanned,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    if write:
+        (run_dir / VERDICT_NAME).write_text(json.dumps(verdict, indent=2) + "\n", encoding="utf-8")
+    return verdict
+
+
+def find_logs(target: Path) -> list[Path]:
+    """A log file, a run directory, or a tree of runs (e.g. runs/YYYY-MM-DD)."""
+    if target.is_file():
+        return [target]
+    logs = []
+    for name in LOG_NAMES:
+        logs.extend(target.rglob(name))
+    # One log per run directory, preferring stdout (the harness source of truth)
+    by_dir = {}
+    for log in sorted(logs, key=lambda p: (str(p.parent), LOG_NAMES.index(p.name))):
+        by_dir.setdefault(log.parent, log)
+    return [by_dir[run_dir] for run_dir in sorted(by_dir)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the headless BANK/TELEMETRY_OUT contract to run logs.")
+    parser.add_argument("target", type=Path, help="Log file, run directory, or runs/YYYY-MM-DD tree")
+    parser.add_argument("--expect", action="append", default=[], help="testId that must PASS (repeatable)")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes (0 = one per CPU)")
+    parser.add_argument("--max-bytes", type=int,
+                        default=int(os.environ.get("PUREDOTS_TELEMETRY_MAX_BYTES", DEFAULT_TELEMETRY_MAX_BYTES)))
+    parser.add_argument("--allow-oversize", action="store_true", help="Deep-dive run: telemetry over the cap is not a failure")
+    parser.add_argument("--no-write", action="store_true", help=f"Do not write {VERDICT_NAME} files")
+    parser.add_argument("--json", action="store_true", help="Print every verdict as one JSON line")
+    args = parser.parse_args()
+
+    if not args.target.exists():
+        print(f"Not found: {args.target}")
+        sys.exit(1)
+    logs = find_logs(args.target)
+    if not logs:
+        print(f"No run logs found in {args.target}")
+        sys.exit(0)
+
+    options = (tuple(args.expect), args.max_bytes, args.allow_oversize, not args.no_write)
+    jobs = min(args.jobs if args.jobs > 0 else (os.cpu_count() or 1), len(logs))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            verdicts = list(pool.map(judge_run, logs, *([option] * len(logs) for option in options)))
+    else:
+        verdicts = [judge_run(log, *options) for log in logs]
+
+    for verdict in verdicts:
+        if args.json:
+            print(json.dumps(verdict, separators=(",", ":")))
+            continue
+        banks = ", ".join(f"{row['testId']}:{row['status']}" for row in verdict["banks"]) or "no BANK lines"
+        print(f"{verdict['verdict']}  {verdict['log']}  ({banks})")
+        for failure in verdict["failures"]:
+            print(f"  FAIL: {failure}")
+        for note in verdict["notes"]:
+            print(f"  NOTE: {note}")
+
+    failed = sum(1 for verdict in verdicts if verdict["verdict"] == "FAIL")
+    if not args.json:
+        print(f"\nSummary: {len(verdicts)} runs, {len(verdicts) - failed} PASS, {failed} FAIL")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
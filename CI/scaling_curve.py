@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Scaling-curve analysis across the scale ladder (10k / 100k / 1M entities).
+Usage: python scaling_curve.py <reports_dir | report.json>... [--project space4x] [--max-exponent 1.15] [--fps 60,30,10] [--json]
+       python scaling_curve.py --db CI/History/perf_history.sqlite [--commit abc123]
+
+Only the ladder scenarios (--ladder, default the three scale_* runs) are
+used. Reports are joined by build commit: the report's buildCommit, else the
+build_commit file a scheduled run leaves next to report.json, else (only with
+--project/--state-dir) the ops bus current_<project>.json. Reports with none of
+these are fitted together under one unnamed commit, with a warning. Repeated
+seeds of one scenario collapse to their median. For each commit with at least two entity counts, tick time and peak
+memory are fitted against totalEntities on a log-log scale: the slope is the
+scaling exponent (1.0 = linear) and cost per entity is reported per point.
+A slope above --max-exponent fails. The tick fit is solved for the largest
+entity count that still fits each FPS target's tick budget.
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+from pathlib import Path
+
+import perf_history
+
+LADDER = ("scale_baseline_10k", "scale_stress_100k", "scale_extreme_1m")
+DEFAULT_MAX_EXPONENT = 1.15
+DEFAULT_MAX_MEMORY_EXPONENT = 1.10
+DEFAULT_FPS_TARGETS = (60, 30, 10)
+EXTRAPOLATION_LIMIT = 10     # predictions past this multiple of the largest measured count are flagged
+
+
+def loglog_fit(points: list[tuple[float, float]]):
+    """Least-squares fit of ln(y) = a + b ln(x): (a, b, r2), or None without two distinct x."""
+    pairs = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if len({lx for lx, _ in pairs}) < 2:
+        return None
+    mean_x = statistics.fmean(lx for lx, _ in pairs)
+    mean_y = statistics.fmean(ly for _, ly in pairs)
+    sxx = sum((lx - mean_x) ** 2 for lx, _ in pairs)
+    sxy = sum((lx - mean_x) * (ly - mean_y) for lx, ly in pairs)
+    syy = sum((ly - mean_y) ** 2 for _, ly in pairs)
+    slope = sxy / sxx
+    intercept = mean_y - slope * mean_x
+    r2 = (sxy * sxy) / (sxx * syy) if syy > 0 else 1.0
+    return intercept, slope, r2
+
+
+def max_entities_for(fit, tick_budget_ms: float):
+    """Entity count at which the fitted tick time reaches tick_budget_ms."""
+    intercept, slope, _ = fit
+    if slope <= 0:
+        return None
+    return int(math.exp((math.log(tick_budget_ms) - intercept) / slope))
+
+
+def run_dir_commit(report_path: Path):
+    """The build_commit file schedule_scenarios.py writes into each run directory, or None."""
+    try:
+        return (Path(report_path).parent / "build_commit").read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def load_points(report_paths: list[Path], ladder=LADDER, project: str = None,
+                state_dir: Path = None) -> tuple[dict, list[str]]:
+    """({commit: {scenario: [(entities, average tick ms, peak memory MB), ...]}}, warnings) from report files.
+
+    Reports with no resolvable commit share the unnamed commit "".
+    """
+    commits = {}
+    unattributed = []
+    for path in report_paths:
+        try:
+            with open(path, "r") as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if not isinstance(report, dict) or report.get("scenarioId") not in ladder \
+                or not report.get("totalEntities") or not report.get("averageTickTimeMs"):
+            continue
+        commit = report.get("buildCommit") or run_dir_commit(path)
+        if not commit and (project or state_dir):
+            commit = perf_history.resolve_build_commit(report, project, state_dir)
+        if not commit:
+            unattributed.append(Path(path).name)
+            commit = ""
+        commits.setdefault(commit, {}).setdefault(report["scenarioId"], []).append(
+            (report["totalEntities"], report["averageTickTimeMs"], report.get("peakMemoryMB")))
+    warnings = []
+    if unattributed:
+        shown = ", ".join(unattributed[:5]) + (f" and {len(unattributed) - 5} more" if len(unattributed) > 5 else "")
+        warnings.append(f"Scaling curve fitted {len(unattributed)} ladder reports without a build commit "
+                        f"as one unnamed commit: {shown}")
+    return commits, warnings
+
+
+def load_history_points(db_path: Path, commit: str = None, ladder=LADDER) -> dict:
+    """The same shape from perf history, passing runs only."""
+    conn = perf_history.open_history(db_path)
+    query = ("SELECT build_commit, scenario, total_entities, average_tick_ms, peak_memory_mb FROM runs "
+             "WHERE passed = 1 AND build_commit IS NOT NULL AND total_entities > 0 AND average_tick_ms > 0 "
+             f"AND scenario IN ({', '.join('?' * len(ladder))})")
+    params = list(ladder)
+    if commit:
+        query += " AND build_commit = ?"
+        params.append(commit)
+    commits = {}
+    for build_commit, scenario, entities, average, memory in conn.execute(query, params):
+        commits.setdefault(build_commit, {}).setdefault(scenario, []).append((entities, average, memory))
+    conn.close()
+    return commits
+
+
+def analyze_commit(scenarios: dict, max_exponent: float = DEFAULT_MAX_EXPONENT,
+                   max_memory_exponent: float = DEFAULT_MAX_MEMORY_EXPONENT,
+                   fps_targets=DEFAULT_FPS_TARGETS) -> dict:
+    """Fit one commit's ladder; errors use the validator's 'exceeds' wording."""
+    points = []
+    for scenario, runs in sorted(scenarios.items()):
+        memories = [memory for _, _, memory in runs if memory]
+        points.append({
+            "scenario": scenario,
+            "runs": len(runs),
+            "entities": int(statistics.median(entities for entities, _, _ in runs)),
+            "tickMs": round(statistics.median(tick for _, tick, _ in runs), 4),
+            "memoryMB": round(statistics.median(memories), 2) if memories else None,
+        })
+    points.sort(key=lambda p: p["entities"])
+    for point in points:
+        point["tickUsPerEntity"] = round(point["tickMs"] * 1000.0 / point["entities"], 4)
+        if point["memoryMB"]:
+            point["kbPerEntity"] = round(point["memoryMB"] * 1024.0 / point["entities"], 3)
+
+    result = {"points": points, "errors": [], "warnings": []}
+    tick_fit = loglog_fit([(p["entities"], p["tickMs"]) for p in points])
+    if tick_fit is None:
+        result["warnings"].append("Scaling curve needs reports at two or more entity counts")
+        return result
+    span = f"{points[0]['entities']}-{points[-1]['entities']} entities"
+    result["tickExponent"] = round(tick_fit[1], 3)
+    result["tickFitR2"] = round(tick_fit[2], 3)
+    if tick_fit[1] > max_exponent:
+        result["errors"].append(f"Tick time scales as N^{tick_fit[1]:.2f} across {span}, "
+                                f"exceeds exponent limit {max_exponent:.2f}")
+
+    memory_fit = loglog_fit([(p["entities"], p["memoryMB"]) for p in points if p["memoryMB"]])
+    if memory_fit:
+        result["memoryExponent"] = round(memory_fit[1], 3)
+        if memory_fit[1] > max_memory_exponent:
+            result["errors"].append(f"Peak memory scales as N^{memory_fit[1]:.2f} across {span}, "
+                                    f"exceeds exponent limit {max_memory_exponent:.2f}")
+
+    # Step-wise exponents show where the curve bends, not just its average
+    result["segments"] = []
+    for low, high in zip(points, points[1:]):
+        step = loglog_fit([(low["entities"], low["tickMs"]), (high["entities"], high["tickMs"])])
+        if step:
+            result["segments"].append({"from": low["scenario"], "to": high["scenario"], "tickExponent": round(step[1], 3)})
+
+    result["maxEntities"] = {}
+    for fps in fps_targets:
+        predicted = max_entities_for(tick_fit, 1000.0 / fps)
+        result["maxEntities"][str(fps)] = predicted
+        if predicted and predicted > points[-1]["entities"] * EXTRAPOLATION_LIMIT:
+            result["warnings"].append(f"{fps} FPS prediction ({predicted} entities) extrapolates past "
+                                      f"{EXTRAPOLATION_LIMIT}x the largest measured count")
+    return result
+
+
+def analyze(commits: dict, max_exponent: float = DEFAULT_MAX_EXPONENT,
+            max_memory_exponent: float = DEFAULT_MAX_MEMORY_EXPONENT, fps_targets=DEFAULT_FPS_TARGETS) -> dict:
+    """{commit: analyze_commit(...)} for every commit, in commit order."""
+    return {commit: analyze_commit(scenarios, max_exponent, max_memory_exponent, fps_targets)
+            for commit, scenarios in sorted(commits.items())}
+
+
+def format_analysis(commit: str, result: dict) -> list[str]:
+    """Printable lines for one commit."""
+    lines = [f"Commit {commit[:12] or '(unnamed)'}:"]
+    for point in result["points"]:
+        memory = f"{point['memoryMB']:.0f}MB ({point['kbPerEntity']:.2f}KB/entity)" if point["memoryMB"] else "-"
+        lines.append(f"  {point['scenario']:<24} {point['entities']:>9} entities  {point['tickMs']:>8.2f}ms "
+                     f"({point['tickUsPerEntity']:.3f}us/entity)  {memory}")
+    if "tickExponent" in result:
+        text = f"  Tick exponent {result['tickExponent']:.2f} (r2={result['tickFitR2']:.2f})"
+        if "memoryExponent" in result:
+            text += f", memory exponent {result['memoryExponent']:.2f}"
+        lines.append(text)
+        for segment in result["segments"]:
+            lines.append(f"    {segment['from']} -> {segment['to']}: N^{segment['tickExponent']:.2f}")
+        lines.append("  Max entities: " + ", ".join(
+            f"{fps} FPS ~{count}" if count else f"{fps} FPS n/a" for fps, count in result["maxEntities"].items()))
+    for msg in result["errors"]:
+        lines.append(f"  ERROR: {msg}")
+    for msg in result["warnings"]:
+        lines.append(f"  WARNING: {msg}")
+    return lines
+
+
+def report_files(targets: list[Path]) -> list[Path]:
+    files = []
+    for target in targets:
+        files.extend(sorted(target.glob("*.json")) if target.is_dir() else [target])
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit tick time and memory against entity count across the scale ladder.")
+    parser.add_argument("targets", type=Path, nargs="*", help="Report files or directories")
+    parser.add_argument("--db", type=Path, help="Read passing runs from the perf history database instead")
+    parser.add_argument("--commit", help="Only analyze this build commit")
+    parser.add_argument("--project", help="Project whose current_<project>.json supplies build_commit for reports without one")
+    parser.add_argument("--state-dir", type=Path, help="Tri state dir holding builds/current_<project>.json")
+    parser.add_argument("--ladder", default=",".join(LADDER), help="Comma-separated scenarioIds on the ladder")
+    parser.add_argument("--max-exponent", type=float, default=DEFAULT_MAX_EXPONENT)
+    parser.add_argument("--max-memory-exponent", type=float, default=DEFAULT_MAX_MEMORY_EXPONENT)
+    parser.add_argument("--fps", default=",".join(str(fps) for fps in DEFAULT_FPS_TARGETS),
+                        help="Comma-separated FPS targets to predict max entities for")
+    parser.add_argument("--json", action="store_true", help="Print the analysis as JSON")
+    args = parser.parse_args()
+
+    ladder = tuple(name for name in args.ladder.split(",") if name)
+    skipped = []
+    if args.db:
+        commits = load_history_points(args.db, args.commit, ladder)
+    elif args.targets:
+        commits, skipped = load_points(report_files(args.targets), ladder, args.project, args.state_dir)
+        if args.commit:
+            commits = {key: value for key, value in commits.items() if key == args.commit}
+    else:
+        parser.error("pass report files/directories or --db")
+    for msg in skipped:
+        print(f"WARNING: {msg}")
+    if not commits:
+        print("No ladder reports with totalEntities and averageTickTimeMs found")
+        sys.exit(0)
+
+    fps_targets = tuple(float(value) if "." in value else int(value) for value in args.fps.split(",") if value)
+    results = analyze(commits, args.max_exponent, args.max_memory_exponent, fps_targets)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for commit, result in results.items():
+            print("\n".join(format_analysis(commit, result)))
+    sys.exit(1 if any(result["errors"] for result in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Packs independent scenario x seed headless runs onto the host.
+Usage: python schedule_scenarios.py scale_baseline_10k scale_stress_100k --seeds 1,2 [--cores 8] [--memory-mb 16384]
+       [--project-path /work/slot1 --project-path /work/slot2]
+
+Each run gets its own directory (<out>/<scenario>/seed_<seed>/attempt_<n>/) with
+a seeded copy of the scenario, report.json, the Unity log, exit_code and a
+run.started marker. Runs are started longest-first whenever their declared
+cost fits: one core (or --cpu overrides) and maxMemoryMB from the budget catalog
+(or the scenario's performanceTargets) plus a per-process overhead. Failures are
+re-run under the two-fail rule; --two-green confirms passes the same way, and
+--replay-check also requires the two passing runs' telemetry to match tick for
+tick (replay_diff.py).
+With TRI_STATE_DIR set, new launches pause while the ops bus build lock is held.
+The default command runs RunScaleTest through the Unity editor. The editor locks
+the project it opens, so editor runs (any command using {project_path}) go one at
+a time per project: give one --project-path per parallel slot (separate copies of
+the project) to pack them, or use a --command template around {executable}.
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import replay_diff
+from validate_metrics import scenario_budget, validate_report
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SAMPLES_PATH = REPO_ROOT / "Packages/com.moni.puredots/Runtime/Runtime/Scenarios/Samples"
+sys.path.insert(0, str(REPO_ROOT / "Tools" / "Ops"))
+
+import tri_ops  # noqa: E402
+
+# RunScaleTest is the only code that reads --scenario/--metrics and writes the report, and it is
+# only reachable through -executeMethod, so the editor is the default. The editor opens one
+# project, and Unity locks a project while an editor has it open, so editor runs are never packed
+# in parallel.
+DEFAULT_COMMAND = (
+    "{unity} -batchmode -quit -projectPath {project_path} "
+    "-executeMethod PureDOTS.Runtime.Devtools.ScenarioRunnerEntryPoints.RunScaleTest "
+    "--scenario {scenario_path} --metrics {report} -logFile {log}"
+)
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_OVERHEAD_MB = 1024
+HEARTBEAT_SECONDS = 45
+POLL_SECONDS = 0.25
+
+
+class ScheduledRun:
+    """One attempt of a scenario x seed run."""
+
+    def __init__(self, scenario: str, seed: int, attempt: int, cpu: int, memory_mb: int, estimate: float):
+        self.scenario = scenario
+        self.seed = seed
+        self.attempt = attempt
+        self.cpu = cpu
+        self.memory_mb = memory_mb
+        self.estimate = estimate
+        self.process = None
+        self.project_path = None
+        self.started = None
+        self.seconds = None
+        self.outcome = None
+        self.messages = []
+
+    @property
+    def key(self) -> tuple[str, int]:
+        return self.scenario, self.seed
+
+    def run_dir(self, out_dir: Path) -> Path:
+        return out_dir / self.scenario / f"seed_{self.seed}" / f"attempt_{self.attempt}"
+
+
+def host_memory_mb() -> int:
+    """MemAvailable from /proc/meminfo, else a conservative 8 GB."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 8192
+
+
+def load_scenario(name: str) -> tuple[Path, dict]:
+    path = Path(name) if name.endswith(".json") else SAMPLES_PATH / f"{name}.json"
+    with open(path, "r") as f:
+        return path, json.load(f)
+
+
+def scenario_cost(scenario_id: str, data: dict) -> tuple[int, float]:
+    """(memory MB, estimated seconds) for one run of a scenario."""
+    targets = data.get("performanceTargets", {})
+    budget = scenario_budget(scenario_id) or targets
+    memory = int(budget.get("maxMemoryMB") or targets.get("maxMemoryMB") or DEFAULT_MEMORY_MB)
+    tick_ms = budget.get("maxTickTimeMs") or targets.get("maxTickTimeMs") or 16.67
+    return memory, data.get("runTicks", 1000) * tick_ms / 1000.0
+
+
+def ops(state_dir: str, *argv: str) -> int:
+    """Run a tri_ops subcommand in-process (quietly)."""
+    if not state_dir:
+        return 1
+    parser = tri_ops.build_parser()
+    args = parser.parse_args(["--state-dir", state_dir] + list(argv))
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            return args.func(args)
+        finally:
+            sys.stdout = stdout
+
+
+def current_build(state_dir: str, project: str) -> dict:
+    return tri_ops.read_json(Path(state_dir) / "builds" / f"current_{project.lower()}.json") or {}
+
+
+def launch(run: ScheduledRun, args: argparse.Namespace, scenarios: dict, build: dict) -> None:
+    run_dir = run.run_dir(args.out)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    source_path, data = scenarios[run.scenario]
+    seeded = dict(data, seed=run.seed)
+    scenario_path = run_dir / source_path.name
+    scenario_path.write_text(json.dumps(seeded, indent=2) + "\n", encoding="utf-8")
+    fields = {
+        "unity": os.environ.get("UNITY_PATH", "Unity"),
+        "project_path": run.project_path or os.environ.get("PROJECT_PATH", str(REPO_ROOT)),
+        "executable": build.get("executable") or "",
+        "scenario": run.scenario,
+        "scenario_path": str(scenario_path),
+        "seed": str(run.seed),
+        "report": str(run_dir / "report.json"),
+        "log": str(run_dir / "unity.log"),
+        "out_dir": str(run_dir),
+    }
+    argv = [token.format(**fields) for token in shlex.split(args.command)]
+    env = dict(os.environ, SCENARIO_PATH=fields["scenario_path"], REPORT_PATH=fields["report"],
+               TELEMETRY_DIR=str(run_dir / "telemetry"), EXECUTABLE_PATH=fields["executable"])
+    (run_dir / "telemetry").mkdir(exist_ok=True)
+    (run_dir / "run.started").touch()
+    if build.get("build_commit"):
+        (run_dir / "build_commit").write_text(build["build_commit"] + "\n")
+    if args.verbose:
+        sys.stderr.write(f"start {run.scenario} seed={run.seed} attempt={run.attempt}: {shlex.join(argv)}\n")
+    stdout = open(run_dir / "stdout.log", "wb")
+    try:
+        run.process = subprocess.Popen(argv, stdout=stdout, stderr=subprocess.STDOUT, env=env, cwd=str(run_dir))
+    except OSError as e:
+        run.process = None
+        run.messages.append(f"failed to start: {e}")
+    finally:
+        stdout.close()
+    run.started = time.perf_counter()
+
+
+def finish(run: ScheduledRun, rc: int, out_dir: Path) -> None:
+    run.seconds = time.perf_counter() - run.started
+    run_dir = run.run_dir(out_dir)
+    (run_dir / "exit_code").write_text(f"{rc}\n")
+    if rc != 0:
+        run.outcome = "FAIL"
+        run.messages.append(f"exit code {rc}")
+        return
+    report = run_dir / "report.json"
+    if not report.exists():
+        run.outcome = "FAIL"
+        run.messages.append("report.json not written")
+        return
+    passed, messages = validate_report(report)
+    run.outcome = "PASS" if passed else "FAIL"
+    run.messages += messages
+
+
+def next_attempt(history: list[str], two_green: bool, max_attempts: int):
+    """Whether another attempt is needed under the two-fail / two-green rules."""
+    if len(history) >= max_attempts:
+        return False
+    last = history[-1]
+    if last == "FAIL":
+        return len(history) < 2 or history[-2] != "FAIL"
+    return two_green and (len(history) < 2 or history[-2] != "PASS")
+
+
+def settle(history: list[str]) -> str:
+    """Final status for a scenario x seed from its attempt outcomes."""
+    if history[-2:] == ["FAIL", "FAIL"]:
+        return "FAIL"
+    if "FAIL" in history:
+        return "FLAKY" if history[-1] == "PASS" else "UNSTABLE"
+    return "PASS"
+
+
+def check_replays(completed: list, out_dir: Path) -> dict:
+    """Compare the telemetry of the last two passing attempts of every scenario x seed."""
+    passing = {}
+    for run in sorted(completed, key=lambda r: r.attempt):
+        if run.outcome == "PASS":
+            passing.setdefault(run.key, []).append(run)
+    replays = {}
+    for key, runs in passing.items():
+        if len(runs) < 2:
+            continue
+        streams = [replay_diff.find_run_telemetry(run.run_dir(out_dir)) for run in runs[-2:]]
+        if None in streams:
+            replays[key] = {"identical": None, "reason": "telemetry stream missing"}
+            continue
+        result = replay_diff.compare(*streams)
+        replays[key] = {name: result[name] for name in ("identical", "tick", "reason", "metrics") if name in result}
+    return replays
+
+
+def schedule(args: argparse.Namespace) -> dict:
+    scenarios = {}
+    for name in args.scenarios:
+        path, data = load_scenario(name)
+        scenarios[data.get("scenarioId", path.stem)] = (path, data)
+    build = current_build(args.state_dir, args.project) if args.project else {}
+    if "{executable}" in args.command and not build.get("executable"):
+        raise SystemExit(f"No current build executable for project {args.project!r}")
+
+    pending = deque()
+    for scenario_id, (_, data) in scenarios.items():
+        memory, estimate = scenario_cost(scenario_id, data)
+        seeds = args.seeds or [data.get("seed", 0)]
+        for seed in seeds:
+            pending.append(ScheduledRun(scenario_id, seed, 1, args.cpu.get(scenario_id, 1),
+                                        memory + args.overhead_mb, estimate))
+    # Longest first keeps the tail of the schedule short (LPT packing)
+    pending = deque(sorted(pending, key=lambda run: -run.estimate))
+
+    # Editor commands take a project copy from this pool for the length of a run
+    free_paths = deque(args.project_paths) if args.max_parallel else deque()
+    history = {}
+    completed = []
+    running = []
+    started = time.perf_counter()
+    last_heartbeat = 0.0
+    while pending or running:
+        locked = bool(pending) and args.respect_lock and ops(args.state_dir, "lock_status") == 0
+        if not locked:
+            cores = args.cores - sum(run.cpu for run in running)
+            memory = args.memory_mb - sum(run.memory_mb for run in running)
+            for run in list(pending):
+                fits = run.cpu <= cores and run.memory_mb <= memory
+                if running and args.max_parallel and len(running) >= args.max_parallel:
+                    break
+                # A run larger than the whole host still runs, alone
+                if fits or not running:
+                    pending.remove(run)
+                    if free_paths:
+                        run.project_path = free_paths.popleft()
+                    launch(run, args, scenarios, build)
+                    running.append(run)
+                    cores -= run.cpu
+                    memory -= run.memory_mb
+                    if not fits:
+                        break
+
+        for run in list(running):
+            rc = run.process.poll() if run.process else 1
+            if rc is None:
+                continue
+            running.remove(run)
+            if run.project_path:
+                free_paths.append(run.project_path)
+            finish(run, rc, args.out)
+            completed.append(run)
+            outcomes = history.setdefault(run.key, [])
+            outcomes.append(run.outcome)
+            sys.stdout.write(f"{run.outcome:<5} {run.scenario} seed={run.seed} attempt={run.attempt} "
+                             f"({run.seconds:.1f}s)\n")
+            sys.stdout.flush()
+            if next_attempt(outcomes, args.two_green, args.max_attempts):
+                retry = ScheduledRun(run.scenario, run.seed, run.attempt + 1, run.cpu, run.memory_mb, run.estimate)
+                pending.appendleft(retry)
+
+        now = time.perf_counter()
+        if args.heartbeat and args.state_dir and now - last_heartbeat >= HEARTBEAT_SECONDS:
+            last_heartbeat = now
+            ops(args.state_dir, "heartbeat", "--agent", "scheduler", "--phase", "locked" if locked else "running",
+                "--current-task", f"{len(running)} running, {len(pending)} pending", "--cycle", str(len(completed)))
+        if running or pending:
+            time.sleep(POLL_SECONDS)
+
+    makespan = time.perf_counter() - started
+    serial = sum(run.seconds for run in completed)
+    replays = check_replays(completed, args.out) if args.replay_check else {}
+    results = {}
+    for (scenario, seed), outcomes in sorted(history.items()):
+        result = {"status": settle(outcomes), "attempts": outcomes}
+        if (scenario, seed) in replays:
+            result["replay"] = replays[(scenario, seed)]
+            if result["replay"]["identical"] is False and result["status"] == "PASS":
+                result["status"] = "DIVERGED"
+        results[f"{scenario}:{seed}"] = result
+    return {
+        "runs": [
+            {
+                "scenario": run.scenario,
+                "seed": run.seed,
+                "attempt": run.attempt,
+                "outcome": run.outcome,
+                "seconds": round(run.seconds, 3),
+                "dir": str(run.run_dir(args.out)),
+                "messages": run.messages,
+            }
+            for run in completed
+        ],
+        "results": results,
+        "makespanSeconds": round(makespan, 3),
+        "serialSeconds": round(serial, 3),
+        "speedup": round(serial / makespan, 2) if makespan > 0 else None,
+        "buildCommit": build.get("build_commit"),
+    }
+
+
+def parse_cpu(values: list[str]) -> dict:
+    cpu = {}
+    for value in values:
+        name, _, count = value.partition("=")
+        cpu[name] = int(count)
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack headless scenario runs onto available cores and memory.")
+    parser.add_argument("scenarios", nargs="+", help="Scenario ids from Samples/ or paths to scenario JSON")
+    parser.add_argument("--seeds", type=lambda s: [int(x) for x in s.split(",") if x],
+                        help="Comma-separated seeds (default: each scenario's own seed)")
+    parser.add_argument("--out", type=Path, default=Path("CI/Reports/scheduled"))
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--memory-mb", type=int, default=None, help="Memory to pack into (default: MemAvailable)")
+    parser.add_argument("--overhead-mb", type=int, default=DEFAULT_OVERHEAD_MB,
+                        help="Per-process memory added to each scenario's maxMemoryMB")
+    parser.add_argument("--cpu", action="append", default=[], help="Cores for a scenario, e.g. scale_extreme_1m=4")
+    parser.add_argument("--command", default=DEFAULT_COMMAND,
+                        help="Run command template; fields: {unity} {project_path} {executable} {scenario} "
+                             "{scenario_path} {seed} {report} {log} {out_dir}")
+    parser.add_argument("--project", help="Use builds/current_<project>.json for {executable} and build_commit")
+    parser.add_argument("--project-path", dest="project_paths", action="append", default=[],
+                        help="A Unity project copy for {project_path}; repeat to run that many editor runs in parallel")
+    parser.add_argument("--state-dir", help="Tri state dir (default: TRI_STATE_DIR)")
+    parser.add_argument("--two-green", action="store_true", help="Re-run passes until two consecutive PASS")
+    parser.add_argument("--replay-check", action="store_true",
+                        help="Fail seeds whose two passing runs' telemetry diverges (implies --two-green)")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--no-lock", dest="respect_lock", action="store_false",
+                        help="Ignore the ops bus build lock")
+    parser.add_argument("--heartbeat", action="store_true", help="Publish scheduler heartbeats on the ops bus")
+    parser.add_argument("--json", type=Path, dest="json_out", help="Write the schedule summary to this path")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    args.max_parallel = 0
+    if "{project_path}" in args.command or "-projectPath" in args.command:
+        # One editor per project: a second editor would fail on the project lock, and that false
+        # failure would count toward the two-fail rule.
+        args.max_parallel = len(args.project_paths) or 1
+        if args.max_parallel == 1:
+            print("Editor command: runs are scheduled one at a time (Unity locks the project); "
+                  "pass --project-path once per project copy to run in parallel")
+    args.cpu = parse_cpu(args.cpu)
+    args.two_green = args.two_green or args.replay_check
+    args.state_dir = args.state_dir or os.environ.get("TRI_STATE_DIR")
+    if args.project and not args.state_dir:
+        parser.error("--project needs --state-dir or TRI_STATE_DIR")
+    if args.memory_mb is None:
+        args.memory_mb = host_memory_mb()
+
+    summary = schedule(args)
+    print("=" * 60)
+    for key, result in summary["results"].items():
+        print(f"  {result['status']:<6} {key}  ({' '.join(result['attempts'])})")
+        replay = result.get("replay")
+        if replay and replay["identical"] is not True:
+            print(f"         replay: {replay['reason']}" + (f" at tick {replay['tick']}" if "tick" in replay else ""))
+    print(f"Makespan {summary['makespanSeconds']:.1f}s vs serial {summary['serialSeconds']:.1f}s "
+          f"(x{summary['speedup'] or 0:.2f}) on {args.cores} cores / {args.memory_mb}MB")
+    print("=" * 60)
+    if args.json_out:
+        args.json_out.parent.mkdir(parents=True, exist_ok=True)
+        args.json_out.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    failed = any(result["status"] in ("FAIL", "UNSTABLE", "DIVERGED") for result in summary["results"].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
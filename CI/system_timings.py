@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Per-system timing breakdown for scale test reports.
+Usage: python system_timings.py <report.json> [--previous report.json] [--top N] [--folded out.folded]
+
+Reports may carry one row per ECS system, tagged with its system group path and
+heat tier (Docs/Performance/SystemHeatTierGuidelines.md):
+
+  "systemTimings": [
+    {"name": "MovementSystem", "group": "SimulationSystemGroup/MovementGroup", "tier": "hot", "meanMs": 4.1}
+  ]
+
+A {name: row} object or a flat "systemTimingsMs": {name: ms} map is accepted as
+well. Rows are leaf systems; group times are the sums of their systems. Each
+system gets its share of the average tick, its delta against a previous
+accepted run, and a rank; tiers and named systems/groups are checked against
+their budgets, and folded stacks ("Group;Sub;System <us>") feed flamegraph.pl
+or speedscope directly.
+"""
+
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+
+# Tier budgets as shares of the tick budget, unless the scenario sets tiersMs
+TIER_BUDGET_SHARES = {"hot": 0.5, "warm": 0.3, "cold": 0.1}
+TIERS = tuple(TIER_BUDGET_SHARES)
+DELTA_WARN_SHARE = 0.20      # a system this much slower than the previous accepted run is called out
+DELTA_WARN_MS = 0.5          # ...when it also grew by at least this many ms
+DEFAULT_TOP = 10
+UNATTRIBUTED = "(unattributed)"
+
+
+def finite_number(value):
+    """value as a finite float, or None."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_rows(report: dict) -> tuple[list[dict], list[str]]:
+    """Normalize systemTimings / systemTimingsMs into ([{name, path, tier, meanMs, maxMs}], problems).
+
+    Malformed rows are skipped and described in problems, so one bad entry never
+    aborts a validation run.
+    """
+    section = report.get("systemTimings")
+    if isinstance(section, dict):
+        section = [dict(row, name=name) if isinstance(row, dict) else {"name": name, "meanMs": row}
+                   for name, row in section.items()]
+    if not section:
+        flat = report.get("systemTimingsMs")
+        if flat and not isinstance(flat, dict):
+            return [], [f"Malformed systemTimingsMs: expected an object, got {type(flat).__name__}"]
+        section = [{"name": name, "meanMs": row.get("meanMs") if isinstance(row, dict) else row}
+                   for name, row in (flat or {}).items()]
+    if not isinstance(section, list):
+        return [], [f"Malformed systemTimings: expected a list or object, got {type(section).__name__}"]
+    rows = []
+    problems = []
+    for index, row in enumerate(section):
+        if not isinstance(row, dict) or not row.get("name") or row.get("meanMs") is None:
+            continue
+        name = row["name"]
+        mean_ms = finite_number(row["meanMs"])
+        if not isinstance(name, str) or mean_ms is None:
+            problems.append(f"Malformed systemTimings row {index} ({str(name)[:40]}): "
+                            f"meanMs {str(row['meanMs'])[:40]!r} is not a number")
+            continue
+        tier = str(row.get("tier") or "").lower() or None
+        rows.append({
+            "name": name,
+            "path": [part for part in str(row.get("group") or "").split("/") if part],
+            "tier": tier if tier in TIER_BUDGET_SHARES else None,
+            "meanMs": mean_ms,
+            "maxMs": finite_number(row.get("maxMs")),
+        })
+    return rows, problems
+
+
+def system_rows(report: dict) -> list[dict]:
+    """The well-formed rows of parse_rows()."""
+    return parse_rows(report)[0]
+
+
+def group_totals(rows: list[dict]) -> dict:
+    """Mean ms for every system and every group prefix ("Simulation", "Simulation/Movement")."""
+    totals = {}
+    for row in rows:
+        for depth in range(1, len(row["path"]) + 1):
+            key = "/".join(row["path"][:depth])
+            totals[key] = totals.get(key, 0.0) + row["meanMs"]
+        totals[row["name"]] = totals.get(row["name"], 0.0) + row["meanMs"]
+    return totals
+
+
+def timing_map(report: dict) -> dict:
+    """{system name: mean ms}, the form kept in perf history for later deltas."""
+    return {row["name"]: row["meanMs"] for row in system_rows(report)}
+
+
+def breakdown(report: dict, previous=None) -> list[dict]:
+    """Systems ranked by mean time, with share of the tick (and deltas when previous is given)."""
+    rows = system_rows(report)
+    total = report.get("averageTickTimeMs") or sum(row["meanMs"] for row in rows)
+    ranked = []
+    for rank, row in enumerate(sorted(rows, key=lambda r: (-r["meanMs"], r["name"])), 1):
+        entry = {
+            "rank": rank,
+            "name": row["name"],
+            "group": "/".join(row["path"]),
+            "tier": row["tier"],
+            "meanMs": round(row["meanMs"], 4),
+            "share": round(row["meanMs"] / total, 4) if total else None,
+        }
+        ranked.append(entry)
+    if previous is not None:
+        apply_previous(ranked, previous)
+    return ranked
+
+
+def apply_previous(ranked: list[dict], previous: dict) -> list[str]:
+    """Add deltaMs/deltaShare against a previous run ({name: ms}); returns slowdown warnings."""
+    warnings = []
+    for entry in ranked:
+        before = previous.get(entry["name"])
+        entry["deltaMs"] = round(entry["meanMs"] - before, 4) if before is not None else None
+        entry["deltaShare"] = round(entry["meanMs"] / before - 1, 4) if before else None
+        if entry["deltaMs"] is not None and entry["deltaMs"] >= DELTA_WARN_MS \
+                and (entry["deltaShare"] or 0) >= DELTA_WARN_SHARE:
+            warnings.append(f"{entry['name']} time {entry['meanMs']:.2f}ms is up {entry['deltaMs']:.2f}ms "
+                            f"({entry['deltaShare']:+.0%}) on the previous accepted run")
+    return warnings
+
+
+def validate_systems(report: dict, budget: dict) -> tuple[list[str], list[str]]:
+    """Per-tier budgets and per-system/group budgets (subsystemsMs)."""
+    rows, errors = parse_rows(report)
+    warnings = []
+    if not rows:
+        return errors, warnings
+
+    tick_budget = report.get("targetTickTimeMs") or budget.get("maxTickTimeMs")
+    tier_limits = budget.get("tiersMs") or {}
+    for tier in TIERS:
+        members = sorted((row for row in rows if row["tier"] == tier), key=lambda r: -r["meanMs"])
+        limit = tier_limits.get(tier) or (tick_budget * TIER_BUDGET_SHARES[tier] if tick_budget else None)
+        if not members or not limit:
+            continue
+        spent = sum(row["meanMs"] for row in members)
+        top = ", ".join(f"{row['name']} {row['meanMs']:.2f}ms" for row in members[:3])
+        if spent > limit:
+            errors.append(f"{tier.capitalize()} tier time {spent:.2f}ms exceeds budget {limit:.2f}ms (top: {top})")
+        elif spent > limit * 0.8:
+            warnings.append(f"{tier.capitalize()} tier time {spent:.2f}ms approaching budget {limit:.2f}ms (top: {top})")
+
+    totals = group_totals(rows)
+    for name, limit in sorted((budget.get("subsystemsMs") or {}).items()):
+        mean_ms = totals.get(name)
+        if mean_ms is None:
+            continue
+        if mean_ms > limit:
+            errors.append(f"{name} time {mean_ms:.2f}ms exceeds budget {limit:.2f}ms")
+        elif mean_ms > limit * 0.8:
+            warnings.append(f"{name} time {mean_ms:.2f}ms approaching budget {limit:.2f}ms")
+    return errors, warnings
+
+
+def format_table(ranked: list[dict], top: int = DEFAULT_TOP) -> list[str]:
+    """Top-N hotspot table as printable lines."""
+    with_delta = any("deltaMs" in row for row in ranked)
+    lines = [f"{'#':>3}  {'System':<40} {'Tier':<5} {'Mean ms':>8} {'Share':>6}" + ("  Delta" if with_delta else "")]
+    for row in ranked[:top]:
+        share = f"{row['share']:.0%}" if row["share"] is not None else "-"
+        line = f"{row['rank']:>3}  {row['name'][:40]:<40} {row['tier'] or '-':<5} {row['meanMs']:>8.2f} {share:>6}"
+        if with_delta:
+            delta = row.get("deltaMs")
+            line += f"  {delta:+.2f}ms" if delta is not None else "  new"
+        lines.append(line)
+    return lines
+
+
+def folded_stacks(report: dict) -> list[str]:
+    """Flamegraph folded stacks, one line per system, weights in microseconds per tick."""
+    rows = system_rows(report)
+    root = report.get("scenarioId", "tick")
+    lines = [";".join([root] + row["path"] + [row["name"]]) + f" {round(row['meanMs'] * 1000)}" for row in rows]
+    unattributed = (report.get("averageTickTimeMs") or 0) - sum(row["meanMs"] for row in rows)
+    if rows and unattributed > 0:
+        lines.append(f"{root};{UNATTRIBUTED} {round(unattributed * 1000)}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-system timing breakdown of a scale test report.")
+    parser.add_argument("report", type=Path)
+    parser.add_argument("--previous", type=Path, help="Earlier accepted report to compute deltas against")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP)
+    parser.add_argument("--folded", type=Path, help="Write flamegraph folded stacks to this path ('-' for stdout)")
+    parser.add_argument("--json", action="store_true", help="Print the ranked breakdown as JSON")
+    args = parser.parse_args()
+
+    with open(args.report, "r") as f:
+        report = json.load(f)
+    previous = None
+    if args.previous:
+        with open(args.previous, "r") as f:
+            previous = timing_map(json.load(f))
+    ranked = breakdown(report)
+    warnings = apply_previous(ranked, previous) if previous is not None else []
+    if not ranked:
+        print(f"No system timings in {args.report}")
+        sys.exit(1)
+
+    if args.folded:
+        text = "\n".join(folded_stacks(report)) + "\n"
+        if str(args.folded) == "-":
+            sys.stdout.write(text)
+        else:
+            args.folded.write_text(text, encoding="utf-8")
+    if args.json:
+        print(json.dumps(ranked[:args.top], indent=2))
+    elif str(args.folded) != "-":
+        for line in format_table(ranked, args.top):
+            print(line)
+        for msg in warnings:
+            print(f"WARNING: {msg}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
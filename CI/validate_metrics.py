@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 """
 Validates scale test metrics against performance budgets.
-Usage: python validate_metrics.py <reports_directory>
+Usage: python validate_metrics.py <reports_directory> [--jobs N] [--json out.json] [--junit out.xml] [--scenarios DIR]
+
+Budgets come from budget_catalog.py: each scenario's performanceTargets, matched
+on the exact scenarioId, with BUDGETS below as the fallback.
 """
 
+import argparse
 import json
 import sys
 import os
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-# Performance budgets
+from analyze_telemetry import SeriesDownsampler, analyze_telemetry
+import budget_catalog
+import perf_history
+import scaling_curve
+import system_timings
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below
+    np = None
+
+# Built-in performance budgets; scenario performanceTargets (budget_catalog.py) override them
 BUDGETS = {
     "scale_baseline_10k": {
         "maxTickTimeMs": 16.67,
@@ -28,28 +46,278 @@ BUDGETS = {
     }
 }
 
-def validate_report(report_path: Path) -> tuple[bool, list[str]]:
-    """Validate a single metrics report against its budget."""
+# Distribution budgets, as multiples of the tick budget unless noted.
+# Only checked when a report carries per-tick samples or a histogram.
+DISTRIBUTION_BUDGETS = {
+    "p95": 1.25,
+    "p99": 1.5,
+    "p99.9": 2.0,
+    "jitter": 0.25,          # mean |t[i] - t[i-1]|
+    "overBudgetRun": 100,    # consecutive ticks over budget (absolute)
+    "spikeFactor": 1.5,      # a spike is a tick above this multiple of the median
+    "minPeriodicSpikes": 4,  # spikes needed before periodicity is judged
+    "periodShare": 0.6,      # share of spike gaps that must agree on one period
+}
+DISTRIBUTION_PERCENTILES = (("p95", 95.0), ("p99", 99.0), ("p99.9", 99.9))
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    """Linear-interpolated percentile (matches numpy's default method)."""
+    position = (len(sorted_samples) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def _dominant_period(spike_ticks) -> tuple[int, float]:
+    """Most common gap between spikes and the share of gaps it accounts for."""
+    gaps = [b - a for a, b in zip(spike_ticks, spike_ticks[1:])]
+    if not gaps:
+        return 0, 0.0
+    counts = {}
+    for gap in gaps:
+        # Allow one tick of slop so a 30-tick period with 29/31 gaps still counts
+        counts[gap] = counts.get(gap, 0) + 1
+    best = max(counts, key=lambda gap: (counts[gap] + counts.get(gap - 1, 0) + counts.get(gap + 1, 0), -gap))
+    agreeing = counts[best] + counts.get(best - 1, 0) + counts.get(best + 1, 0)
+    return best, agreeing / len(gaps)
+
+
+def _distribution_python(samples: list[float], budget_ms: float) -> dict:
+    ordered = sorted(samples)
+    stats = {name: _percentile(ordered, q) for name, q in DISTRIBUTION_PERCENTILES}
+    stats["jitter"] = sum(abs(b - a) for a, b in zip(samples, samples[1:])) / max(len(samples) - 1, 1)
+    longest = current = 0
+    for value in samples:
+        current = current + 1 if value > budget_ms else 0
+        longest = max(longest, current)
+    stats["overBudgetRun"] = longest
+    threshold = _percentile(ordered, 50.0) * DISTRIBUTION_BUDGETS["spikeFactor"]
+    stats["spikeTicks"] = [i for i, value in enumerate(samples) if value > threshold]
+    return stats
+
+
+def _distribution_numpy(samples: list[float], budget_ms: float) -> dict:
+    values = np.asarray(samples, dtype=np.float64)
+    stats = dict(zip((name for name, _ in DISTRIBUTION_PERCENTILES),
+                     np.percentile(values, [q for _, q in DISTRIBUTION_PERCENTILES]).tolist()))
+    stats["jitter"] = float(np.abs(np.diff(values)).mean()) if values.size > 1 else 0.0
+    over = np.concatenate(([0], (values > budget_ms).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(over))
+    stats["overBudgetRun"] = int((edges[1::2] - edges[::2]).max()) if edges.size else 0
+    threshold = float(np.median(values)) * DISTRIBUTION_BUDGETS["spikeFactor"]
+    stats["spikeTicks"] = np.flatnonzero(values > threshold).tolist()
+    return stats
+
+
+def tick_distribution(samples: list[float], budget_ms: float) -> dict:
+    """Percentiles, jitter, longest over-budget run and spike periodicity for per-tick samples."""
+    stats = (_distribution_numpy if np is not None else _distribution_python)(samples, budget_ms)
+    # Collapse consecutive spike ticks into one event so sustained overload isn't read as a period of 1
+    ticks = stats.pop("spikeTicks")
+    spike_ticks = [tick for previous, tick in zip([None] + ticks, ticks) if previous != tick - 1]
+    stats["spikes"] = len(spike_ticks)
+    stats["spikePeriod"], stats["spikePeriodShare"] = _dominant_period(spike_ticks)
+    return stats
+
+
+def histogram_distribution(histogram: dict) -> dict:
+    """Percentiles (bucket upper bounds) from a {"upperBoundsMs": [...], "counts": [...]} histogram."""
+    bounds = histogram.get("upperBoundsMs", [])
+    counts = histogram.get("counts", [])
+    total = sum(counts)
+    stats = {}
+    if not total:
+        return stats
+    for name, q in DISTRIBUTION_PERCENTILES:
+        rank = total * q / 100.0
+        seen = 0
+        for bound, count in zip(bounds, counts):
+            seen += count
+            if seen >= rank:
+                stats[name] = bound
+                break
+        else:
+            stats[name] = bounds[-1] if bounds else 0.0
+    return stats
+
+
+def scenario_budget(scenario_id: str):
+    """Exact-match budget from the catalog (scenario files over BUDGETS), or None."""
+    return budget_catalog.lookup(scenario_id, BUDGETS)
+
+
+def validate_distribution(report: dict, target_tick_time: float,
+                          percentile_limits=None) -> tuple[list[str], list[str]]:
+    """Check per-tick samples (tickTimesMs) or a tickTimeHistogram against the distribution budgets."""
     errors = []
     warnings = []
-    
+    samples, skipped = perf_history.tick_samples(report)
+    if skipped:
+        warnings.append(f"Skipped {skipped} non-numeric tickTimesMs samples")
+    if samples:
+        stats = tick_distribution(samples, target_tick_time)
+    elif report.get("tickTimeHistogram"):
+        stats = histogram_distribution(report["tickTimeHistogram"])
+    else:
+        return errors, warnings
+
+    for name, _ in DISTRIBUTION_PERCENTILES:
+        if name not in stats:
+            continue
+        limit = (percentile_limits or {}).get(name) or target_tick_time * DISTRIBUTION_BUDGETS[name]
+        if stats[name] > limit:
+            errors.append(f"{name.upper()} tick time {stats[name]:.2f}ms exceeds budget {limit:.2f}ms")
+
+    if "jitter" in stats:
+        limit = target_tick_time * DISTRIBUTION_BUDGETS["jitter"]
+        if stats["jitter"] > limit:
+            errors.append(f"Frame-time jitter {stats['jitter']:.2f}ms exceeds budget {limit:.2f}ms")
+        elif stats["jitter"] > limit * 0.8:
+            warnings.append(f"Frame-time jitter {stats['jitter']:.2f}ms approaching budget {limit:.2f}ms")
+
+    if "overBudgetRun" in stats and stats["overBudgetRun"] >= DISTRIBUTION_BUDGETS["overBudgetRun"]:
+        errors.append(f"{stats['overBudgetRun']} consecutive ticks exceeds budget {target_tick_time:.2f}ms "
+                      f"(limit {DISTRIBUTION_BUDGETS['overBudgetRun']} ticks)")
+
+    if stats.get("spikes", 0) >= DISTRIBUTION_BUDGETS["minPeriodicSpikes"] \
+            and stats["spikePeriodShare"] >= DISTRIBUTION_BUDGETS["periodShare"]:
+        message = (f"Periodic tick spikes every ~{stats['spikePeriod']} ticks "
+                   f"({stats['spikes']} spikes, {stats['spikePeriodShare']:.0%} of gaps)")
+        if stats.get("p99", 0) > target_tick_time or stats.get("p99.9", 0) > target_tick_time:
+            errors.append(message + f" exceeds budget {target_tick_time:.2f}ms")
+        else:
+            warnings.append(message)
+    return errors, warnings
+
+# Memory trend budgets for soak runs. Ticks convert to simulated minutes via the
+# report's fixedDeltaTime (seconds per tick, default 60 Hz).
+MEMORY_TREND_BUDGETS = {
+    "warmupFraction": 0.1,        # leading share of the run ignored while caches fill
+    "minGrowthMBPerMin": 1.0,     # slower growth is treated as noise
+    "minFit": 0.5,                # r^2 of the linear fit before growth counts as a trend
+    "horizonMinutes": 240.0,      # fail if the budget would be exhausted within this soak horizon
+    "maxPoints": 2000,            # downsample long series to this many points
+}
+DEFAULT_TICK_SECONDS = 1.0 / 60.0
+
+
+def linear_fit(points: list[tuple[float, float]]) -> tuple[float, float, float]:
+    """Least-squares (slope, intercept, r^2) for (x, y) points."""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    syy = sum((y - mean_y) ** 2 for _, y in points)
+    if sxx == 0:
+        return 0.0, mean_y, 0.0
+    slope = sxy / sxx
+    r2 = (sxy * sxy) / (sxx * syy) if syy > 0 else 1.0
+    return slope, mean_y - slope * mean_x, r2
+
+
+def downsample(values: list[float], interval_ticks: int, max_points: int) -> list[tuple[float, float]]:
+    """(tick, value) points for an evenly sampled series, bucket-averaged to max_points."""
+    sampler = SeriesDownsampler(max_points)
+    for i, value in enumerate(values):
+        sampler.add(i * interval_ticks, value)
+    return sampler.points()
+
+
+def memory_growth(points: list[tuple[float, float]], tick_seconds: float):
+    """Fit growth after warm-up: (MB per simulated minute, r^2, fitted MB at end, end tick) or None."""
+    if len(points) < 3:
+        return None
+    first_tick, last_tick = points[0][0], points[-1][0]
+    warmup_end = first_tick + (last_tick - first_tick) * MEMORY_TREND_BUDGETS["warmupFraction"]
+    steady = [point for point in points if point[0] >= warmup_end]
+    if len(steady) < 3:
+        return None
+    slope, intercept, r2 = linear_fit(steady)
+    ticks_per_minute = 60.0 / tick_seconds
+    return slope * ticks_per_minute, r2, slope * last_tick + intercept, last_tick
+
+
+def memory_series_points(report: dict) -> tuple[list, dict]:
+    """Total and per-subsystem (tick, MB) points from an embedded memorySeries block."""
+    series = report.get("memorySeries") or {}
+    interval = series.get("intervalTicks") or report.get("metricsConfig", {}).get("sampleInterval") or 1
+    max_points = MEMORY_TREND_BUDGETS["maxPoints"]
+    total = downsample(series.get("totalMB") or [], interval, max_points)
+    subsystems = {name: downsample(values, interval, max_points)
+                  for name, values in (series.get("subsystemsMB") or {}).items() if values}
+    return total, subsystems
+
+
+def validate_memory_trend(report: dict, max_memory_mb: float, total_points=None,
+                          subsystem_points=None) -> tuple[list[str], list[str]]:
+    """Project memory growth to budget exhaustion and flag growing subsystems."""
+    errors = []
+    warnings = []
+    if total_points is None:
+        total_points, subsystem_points = memory_series_points(report)
+    tick_seconds = report.get("fixedDeltaTime") or DEFAULT_TICK_SECONDS
+    growth = memory_growth(total_points, tick_seconds)
+    if growth is None:
+        return errors, warnings
+
+    rate, r2, current_mb, _ = growth
+    trending = rate > MEMORY_TREND_BUDGETS["minGrowthMBPerMin"] and r2 >= MEMORY_TREND_BUDGETS["minFit"]
+    if trending:
+        minutes_left = max(max_memory_mb - current_mb, 0.0) / rate
+        culprits = []
+        for name, points in sorted((subsystem_points or {}).items()):
+            sub = memory_growth(points, tick_seconds)
+            if sub and sub[0] > MEMORY_TREND_BUDGETS["minGrowthMBPerMin"] and sub[1] >= MEMORY_TREND_BUDGETS["minFit"]:
+                culprits.append((sub[0], name))
+        culprits.sort(reverse=True)
+        detail = f"growing {rate:.1f}MB/sim-min (r2={r2:.2f})"
+        if culprits:
+            detail += "; top growth: " + ", ".join(f"{name} {sub_rate:.1f}MB/min" for sub_rate, name in culprits[:3])
+        if minutes_left <= MEMORY_TREND_BUDGETS["horizonMinutes"]:
+            errors.append(f"Projected memory exceeds budget {max_memory_mb:.0f}MB in "
+                          f"{minutes_left:.0f} sim-min ({detail})")
+        else:
+            warnings.append(f"Memory {detail}; budget {max_memory_mb:.0f}MB reached in ~{minutes_left:.0f} sim-min")
+    return errors, warnings
+
+
+# Messages that fail a report besides budget breaches ("exceeds")
+ERROR_PREFIXES = ("Failed to parse JSON", "Report file not found", "Malformed ")
+
+
+def is_error(msg: str) -> bool:
+    """Errors fail a report; every other message is a warning."""
+    return "exceeds" in msg.lower() or msg.startswith(ERROR_PREFIXES)
+
+
+def load_report(report_path: Path):
+    """(report dict, []) or (None, [error]) for one report file."""
     try:
         with open(report_path, 'r') as f:
             report = json.load(f)
     except json.JSONDecodeError as e:
-        return False, [f"Failed to parse JSON: {e}"]
+        return None, [f"Failed to parse JSON: {e}"]
     except FileNotFoundError:
-        return False, [f"Report file not found: {report_path}"]
+        return None, [f"Report file not found: {report_path}"]
+    if not isinstance(report, dict):
+        return None, [f"Malformed report: expected a JSON object, got {type(report).__name__}"]
+    return report, []
+
+
+def validate_report(report_path: Path, report: dict = None) -> tuple[bool, list[str]]:
+    """Validate a single metrics report against its budget (report: already parsed, if at hand)."""
+    errors = []
+    warnings = []
     
-    scenario_id = report.get("scenarioId", "unknown")
-    budget = BUDGETS.get(scenario_id)
+    if report is None:
+        report, problems = load_report(report_path)
+        if report is None:
+            return False, problems
     
-    if not budget:
-        # Try to match by prefix
-        for key in BUDGETS:
-            if scenario_id.startswith(key.split("_")[0]):
-                budget = BUDGETS[key]
-                break
+    scenario_id = report.get("scenarioId", "unknown")
+    budget = scenario_budget(scenario_id)
     
     if not budget:
         warnings.append(f"No budget defined for scenario: {scenario_id}")
@@ -67,6 +335,12 @@ def validate_report(report_path: Path) -> tuple[bool, list[str]]:
     
     if max_tick_time > target_tick_time * 2:
         errors.append(f"Max tick time {max_tick_time:.2f}ms exceeds 2x budget {target_tick_time * 2:.2f}ms")
+
+    # Check tick-time distribution (percentiles, jitter, over-budget runs, periodic spikes)
+    distribution_errors, distribution_warnings = validate_distribution(report, target_tick_time,
+                                                                       budget.get("tickPercentilesMs"))
+    errors += distribution_errors
+    warnings += distribution_warnings
     
     # Check memory
     peak_memory_mb = report.get("peakMemoryMB", 0)
@@ -75,10 +349,23 @@ def validate_report(report_path: Path) -> tuple[bool, list[str]]:
     elif peak_memory_mb > budget["maxMemoryMB"] * 0.75:
         warnings.append(f"Peak memory {peak_memory_mb:.0f}MB approaching budget {budget['maxMemoryMB']}MB")
     
+    # Check memory growth over the run (leaks that only blow the budget in long soaks)
+    trend_errors, trend_warnings = validate_memory_trend(report, budget["maxMemoryMB"])
+    errors += trend_errors
+    warnings += trend_warnings
+    
     # Check entity counts
     total_entities = report.get("totalEntities", 0)
-    if total_entities > 100000 and scenario_id == "scale_baseline_10k":
-        errors.append(f"Entity count {total_entities} exceeds baseline target of 10k")
+    max_entities = budget.get("maxEntities")
+    if max_entities and total_entities > max_entities:
+        errors.append(f"Entity count {total_entities} exceeds budget {max_entities}")
+    elif max_entities and total_entities > max_entities * 0.9:
+        warnings.append(f"Entity count {total_entities} approaching budget {max_entities}")
+
+    # Check per-tier and per-system/group timings when the report carries them
+    system_errors, system_warnings = system_timings.validate_systems(report, budget)
+    errors += system_errors
+    warnings += system_warnings
     
     # Report status
     passed = len(errors) == 0
@@ -86,53 +373,276 @@ def validate_report(report_path: Path) -> tuple[bool, list[str]]:
     
     return passed, messages
 
+def find_telemetry(report_path: Path, report: dict):
+    """Locate the telemetry ndjson that belongs to a report, if any."""
+    candidates = []
+    explicit = report.get("telemetryPath")
+    if explicit:
+        candidates.append(report_path.parent / explicit)
+    candidates.append(report_path.with_suffix(".ndjson"))
+    if report_path.stem.endswith("_report"):
+        candidates.append(report_path.with_name(report_path.stem[:-len("_report")] + "_telemetry.ndjson"))
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def validate_telemetry(report_path: Path, report: dict = None) -> list[str]:
+    """Check the report's telemetry stream (if present); report-only apart from the memory trend.
+
+    time.tick in telemetry is the tick counter, not a duration, so tick time is
+    gated on the report (averageTickTimeMs, tickTimesMs) only. frameTiming
+    durationMs per group is summarized here as warnings.
+    """
+    if report is None:
+        report, _ = load_report(report_path)
+        if report is None:
+            return []
+    telemetry_path = find_telemetry(report_path, report)
+    if telemetry_path is None:
+        return []
+
+    messages = []
+    embedded_memory = bool((report.get("memorySeries") or {}).get("totalMB"))
+    summary = analyze_telemetry(telemetry_path, ("frameTiming.",),
+                                memory_points=0 if embedded_memory else MEMORY_TREND_BUDGETS["maxPoints"])
+    if summary["truncated"]:
+        messages.append(f"Telemetry {telemetry_path.name} was truncated at the size cap")
+    budget = scenario_budget(report.get("scenarioId", "unknown")) or {}
+    if summary.get("memorySeries") and budget.get("maxMemoryMB"):
+        trend_errors, trend_warnings = validate_memory_trend(report, budget["maxMemoryMB"], summary["memorySeries"], {})
+        messages += trend_errors + trend_warnings
+
+    target_tick_time = report.get("targetTickTimeMs", budget.get("maxTickTimeMs"))
+    groups = [(key[len("frameTiming."):], stats) for key, stats in summary["metrics"].items()
+              if stats["count"] and stats["p95"] is not None]
+    if target_tick_time and groups:
+        group, stats = max(groups, key=lambda item: item[1]["p95"])
+        if stats["p95"] > target_tick_time:
+            messages.append(f"Telemetry frameTiming group {group} P95 {stats['p95']:.2f}ms "
+                            f"is over the tick budget {target_tick_time:.2f}ms")
+    return messages
+
+
+def system_breakdown(report_path: Path, folded_dir: Path = None, report: dict = None) -> list[dict]:
+    """Ranked per-system timings (and folded stacks under folded_dir) for one report."""
+    if report is None:
+        report, _ = load_report(report_path)
+        if report is None:
+            return []
+    ranked = system_timings.breakdown(report)
+    if ranked and folded_dir:
+        folded_dir.mkdir(parents=True, exist_ok=True)
+        (folded_dir / f"{report_path.stem}.folded").write_text(
+            "\n".join(system_timings.folded_stacks(report)) + "\n", encoding="utf-8")
+    return ranked
+
+
+def check_report(report_path: Path, with_telemetry: bool = True, folded_dir: Path = None,
+                 with_history: bool = False) -> dict:
+    """Run every check for one report; safe to call from a worker process.
+
+    The report is parsed once and shared by every check. With with_history the fields
+    perf history needs travel back in result["history"], so the parent does not parse it again.
+    """
+    started = time.perf_counter()
+    report, messages = load_report(report_path)
+    passed = report is not None
+    if report is not None:
+        passed, messages = validate_report(report_path, report)
+    if with_telemetry and report is not None:
+        telemetry_messages = validate_telemetry(report_path, report)
+        messages += telemetry_messages
+        passed = passed and not any(is_error(msg) for msg in telemetry_messages)
+    result = {
+        "report": report_path.name,
+        "passed": passed,
+        "errors": [msg for msg in messages if is_error(msg)],
+        "warnings": [msg for msg in messages if not is_error(msg)],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    systems = system_breakdown(report_path, folded_dir, report) if report is not None else []
+    if systems:
+        result["systems"] = systems
+    if with_history and report is not None:
+        result["history"] = perf_history.history_fields(report)
+    return result
+
+
+def write_junit(results: list[dict], path: Path, elapsed: float) -> None:
+    """Write results as a JUnit XML test suite (one testcase per report)."""
+    suite = ET.Element("testsuite", {
+        "name": "PureDOTS Scale Test Validation",
+        "tests": str(len(results)),
+        "failures": str(sum(1 for r in results if not r["passed"])),
+        "time": f"{elapsed:.3f}",
+    })
+    for result in results:
+        case = ET.SubElement(suite, "testcase", {
+            "classname": "validate_metrics",
+            "name": result["report"],
+            "time": f"{result['seconds']:.3f}",
+        })
+        if not result["passed"]:
+            failure = ET.SubElement(case, "failure", {"message": "; ".join(result["errors"] or result["warnings"])})
+            failure.text = "\n".join(result["errors"] or result["warnings"])
+        if result["warnings"]:
+            ET.SubElement(case, "system-out").text = "\n".join(result["warnings"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python validate_metrics.py <reports_directory>")
-        sys.exit(1)
-    
-    reports_dir = Path(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Validate scale test reports against performance budgets.")
+    parser.add_argument("reports_dir", type=Path)
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes (0 = one per CPU; default: 1, serial)")
+    parser.add_argument("--json", type=Path, dest="json_out", help="Write a machine-readable summary to this path")
+    parser.add_argument("--junit", type=Path, help="Write a JUnit XML summary to this path")
+    parser.add_argument("--no-telemetry", action="store_true", help="Skip the telemetry ndjson checks")
+    parser.add_argument("--history", action="store_true",
+                        help="Check each report against, then append it to, the perf history database")
+    parser.add_argument("--history-db", type=Path, default=perf_history.DEFAULT_DB,
+                        help="Perf history database for --history (default: %(default)s)")
+    parser.add_argument("--project", help="Project whose current_<project>.json supplies build_commit for history")
+    parser.add_argument("--state-dir", type=Path, help="Tri state dir holding builds/current_<project>.json")
+    parser.add_argument("--top", type=int, default=system_timings.DEFAULT_TOP,
+                        help="Rows in each report's system hotspot table (0 = none)")
+    parser.add_argument("--folded", type=Path, help="Write <report>.folded flamegraph stacks to this directory")
+    parser.add_argument("--scaling", action="store_true",
+                        help="Also fit tick time and memory against entity count across the reports, per build commit")
+    parser.add_argument("--max-exponent", type=float, default=scaling_curve.DEFAULT_MAX_EXPONENT,
+                        help="Tick-time scaling exponent above which --scaling fails")
+    parser.add_argument("--export", action="store_true",
+                        help="Also transcode reports and telemetry into the columnar store (columnar_export.py)")
+    parser.add_argument("--export-dir", type=Path, default=Path(__file__).resolve().parent / "Columnar",
+                        help="Columnar store for --export (default: CI/Columnar)")
+    parser.add_argument("--scenarios", action="append", default=[],
+                        help="Extra scenario directory for the budget catalog (repeatable)")
+    args = parser.parse_args()
+    if args.scenarios:
+        # Through the environment so worker processes compile the same catalog
+        os.environ["PUREDOTS_SCENARIO_DIRS"] = os.pathsep.join(
+            [p for p in os.environ.get("PUREDOTS_SCENARIO_DIRS", "").split(os.pathsep) if p] + args.scenarios)
+
+    reports_dir = args.reports_dir
     if not reports_dir.exists():
         print(f"Reports directory not found: {reports_dir}")
         sys.exit(1)
     
-    # Find all JSON reports
-    report_files = list(reports_dir.glob("*.json"))
+    # Find all JSON reports; sorted so output order never depends on the pool
+    report_files = sorted(reports_dir.glob("*.json"))
     if not report_files:
         print(f"No JSON reports found in {reports_dir}")
         sys.exit(0)
     
-    all_passed = True
-    total_errors = 0
-    total_warnings = 0
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    jobs = min(jobs, len(report_files))
+    with_telemetry = not args.no_telemetry
+    started = time.perf_counter()
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(check_report, report_files, [with_telemetry] * len(report_files),
+                                    [args.folded] * len(report_files), [args.history] * len(report_files)))
+    else:
+        results = [check_report(path, with_telemetry, args.folded, args.history) for path in report_files]
+    if args.history:
+        # History is written from this process only, in filename order, so the store stays single-writer
+        conn = perf_history.open_history(args.history_db)
+        for report_path, result in zip(report_files, results):
+            errors, warnings = perf_history.record_report(conn, report_path, result["passed"],
+                                                          args.project, args.state_dir, result.get("systems"),
+                                                          result.pop("history", None))
+            result["errors"] += errors
+            result["warnings"] += warnings
+            result["passed"] = result["passed"] and not errors
+        conn.close()
+    exports = []
+    if args.export:
+        # Imported here so plain validation never pays for loading pyarrow
+        import columnar_export
+        options = (args.export_dir, "auto", args.project, args.state_dir)
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                exports = list(pool.map(columnar_export.export_run, report_files,
+                                        *([option] * len(report_files) for option in options)))
+        else:
+            exports = [columnar_export.export_run(path, *options) for path in report_files]
+    scaling = None
+    scaling_warnings = []
+    if args.scaling:
+        ladder_points, scaling_warnings = scaling_curve.load_points(report_files, scaling_curve.LADDER,
+                                                                    args.project, args.state_dir)
+        scaling = scaling_curve.analyze(ladder_points, args.max_exponent)
+    elapsed = time.perf_counter() - started
+
+    all_passed = all(result["passed"] for result in results) and not any(
+        analysis["errors"] for analysis in (scaling or {}).values())
+    total_errors = sum(len(result["errors"]) for result in results)
+    total_warnings = sum(len(result["warnings"]) for result in results)
+    for analysis in (scaling or {}).values():
+        total_errors += len(analysis["errors"])
+        total_warnings += len(analysis["warnings"])
+    total_warnings += len(scaling_warnings)
     
     print("=" * 60)
     print("PureDOTS Scale Test Validation")
     print("=" * 60)
     
-    for report_path in report_files:
-        print(f"\nValidating: {report_path.name}")
+    for result in results:
+        print(f"\nValidating: {result['report']} ({result['seconds']:.2f}s)")
         print("-" * 40)
-        
-        passed, messages = validate_report(report_path)
-        
-        if passed:
-            print("  Status: PASSED")
-        else:
-            print("  Status: FAILED")
-            all_passed = False
-        
-        for msg in messages:
-            if "exceeds" in msg.lower():
-                print(f"  ERROR: {msg}")
-                total_errors += 1
-            else:
-                print(f"  WARNING: {msg}")
-                total_warnings += 1
+        print("  Status: PASSED" if result["passed"] else "  Status: FAILED")
+        for msg in result["errors"]:
+            print(f"  ERROR: {msg}")
+        for msg in result["warnings"]:
+            print(f"  WARNING: {msg}")
+        if result.get("systems") and args.top > 0:
+            print("  System hotspots:")
+            for line in system_timings.format_table(result["systems"], args.top):
+                print(f"  {line}")
+
+    if scaling is not None:
+        print("\nScaling curve")
+        print("-" * 40)
+        for msg in scaling_warnings:
+            print(f"  WARNING: {msg}")
+        for commit, analysis in scaling.items():
+            for line in scaling_curve.format_analysis(commit, analysis):
+                print(f"  {line}")
+        if not scaling:
+            print("  No ladder reports with totalEntities and averageTickTimeMs")
+
+    if args.export:
+        exported = sum(1 for export in exports if not export.get("error"))
+        print(f"\nColumnar export: {exported} of {len(exports)} reports to {args.export_dir}")
+        for export in exports:
+            if export.get("error"):
+                print(f"  WARNING: {export['report']}: {export['error']}")
     
     print("\n" + "=" * 60)
-    print(f"Summary: {len(report_files)} reports, {total_errors} errors, {total_warnings} warnings")
+    print(f"Summary: {len(report_files)} reports, {total_errors} errors, {total_warnings} warnings "
+          f"({elapsed:.2f}s, {jobs} job{'s' if jobs != 1 else ''})")
     print("=" * 60)
+
+    if args.json_out:
+        summary = {
+            "passed": all_passed,
+            "reports": len(results),
+            "errors": total_errors,
+            "warnings": total_warnings,
+            "jobs": jobs,
+            "seconds": round(elapsed, 3),
+            "results": results,
+        }
+        if scaling is not None:
+            summary["scaling"] = scaling
+            summary["scalingWarnings"] = scaling_warnings
+        args.json_out.parent.mkdir(parents=True, exist_ok=True)
+        args.json_out.write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    if args.junit:
+        write_junit(results, args.junit, elapsed)
     
     if not all_passed:
         print("\nValidation FAILED - performance budgets exceeded")
@@ -143,4 +653,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
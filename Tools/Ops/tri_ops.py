@@ -2,12 +2,14 @@
 import argparse
 import json
 import os
-import socket
 import sys
-import uuid
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import socket  # annotations only; commands that need it import it lazily
 
 
 def utc_now() -> datetime:
@@ -31,20 +33,206 @@ def parse_utc(value: Optional[str]) -> Optional[datetime]:
         return None
 
 
-def atomic_write_json(path: Path, data: dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = path.with_name(f".{path.name}.tmp")
+DURABILITY_LEVELS = ("none", "data", "full")
+# none: atomic rename only; data: fsync the file before rename; full: data + fsync the directory.
+DEFAULT_DURABILITY = {
+    "heartbeat": "none",
+    "claim": "none",
+    "lock": "data",
+    "request": "data",
+    "index": "data",
+    "result": "full",
+    "current": "full",
+    "artifact": "data",
+}
+DURABILITY = dict(DEFAULT_DURABILITY)
+
+
+def configure_durability(spec: Optional[str]) -> None:
+    if not spec:
+        return
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, sep, level = item.partition("=")
+        kind, level = kind.strip().lower(), level.strip().lower()
+        if level == "rename-only":
+            level = "none"
+        if not sep or level not in DURABILITY_LEVELS:
+            raise ValueError(f"invalid durability '{item}' (expected <kind>=none|data|full)")
+        if kind == "all":
+            for key in DURABILITY:
+                DURABILITY[key] = level
+        elif kind in DURABILITY:
+            DURABILITY[kind] = level
+        else:
+            raise ValueError(f"unknown durability record kind '{kind}'")
+
+
+# Per-command timing spans (scan/parse/fsync/rename), flushed to ops/metrics/commands.ndjson.
+# Read-only commands are polled constantly and would otherwise pay a stat + append on every call;
+# TRI_OPS_METRICS=all records them too.
+METRICS_ENABLED = os.environ.get("TRI_OPS_METRICS", "1") != "0"
+METRICS_READS = os.environ.get("TRI_OPS_METRICS") == "all"
+# `status` is not one of them: a stale snapshot makes it rewrite status.snapshot.json and may
+# compact the request index.
+READ_ONLY_COMMANDS = frozenset(("lock_status", "current_build", "get_result", "wait"))
+METRICS_ROTATE_BYTES = 8 * 1024 * 1024
+SPAN_TOTALS: dict = {}
+
+
+class span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        total = SPAN_TOTALS.get(self.name)
+        if total is None:
+            total = SPAN_TOTALS[self.name] = [0, 0.0]
+        total[0] += 1
+        total[1] += time.perf_counter() - self.started
+
+
+class GroupCommit:
+    # Defers the fsyncs of every write in a window to one flush pass at the end: each file is
+    # synced once however often it was rewritten, and each touched directory once.
+
+    def __init__(self):
+        self.files: set = set()
+        self.dirs: set = set()
+        self.writes = 0
+
+    def defer(self, path: Path, level: str) -> None:
+        self.writes += 1
+        if level in ("data", "full"):
+            self.files.add(path)
+        if level == "full":
+            self.dirs.add(path.parent)
+
+    def flush(self) -> int:
+        synced = 0
+        for path in sorted(self.files):
+            try:
+                fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+            except OSError:
+                continue
+            try:
+                with span("fsync"):
+                    os.fsync(fd)
+                synced += 1
+            finally:
+                os.close(fd)
+        for path in sorted(self.dirs):
+            fsync_dir(path)
+            synced += 1
+        self.files.clear()
+        self.dirs.clear()
+        self.writes = 0
+        return synced
+
+
+GROUP_COMMIT: Optional[GroupCommit] = None
+
+
+class group_commit:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.owner = False
+
+    def __enter__(self) -> Optional[GroupCommit]:
+        global GROUP_COMMIT
+        if self.enabled and GROUP_COMMIT is None:
+            GROUP_COMMIT = GroupCommit()
+            self.owner = True
+        return GROUP_COMMIT
+
+    def __exit__(self, *exc) -> None:
+        global GROUP_COMMIT
+        if self.owner:
+            commit, GROUP_COMMIT = GROUP_COMMIT, None
+            commit.flush()
+
+
+def write_temp_json(path: Path, data: dict, kind: str) -> Path:
+    # Unique per writer so concurrent writers of the same target never share a temp file.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
     payload = json.dumps(data, ensure_ascii=True, separators=(",", ":"), sort_keys=False)
     with open(tmp_path, "w", encoding="utf-8", newline="\n") as handle:
         handle.write(payload)
         handle.flush()
-        os.fsync(handle.fileno())
-    os.replace(tmp_path, path)
+        if GROUP_COMMIT is None and DURABILITY.get(kind, "data") != "none":
+            with span("fsync"):
+                os.fsync(handle.fileno())
+    return tmp_path
+
+
+def commit_written(path: Path, kind: str) -> None:
+    level = DURABILITY.get(kind, "data")
+    if GROUP_COMMIT is not None:
+        GROUP_COMMIT.defer(path, level)
+    elif level == "full":
+        fsync_dir(path.parent)
+
+
+def fsync_dir(path: Path) -> None:
+    # Directory fsync makes a rename durable; not possible on Windows, where it is skipped.
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        with span("fsync"):
+            os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path: Path, data: dict, kind: str = "data") -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = write_temp_json(path, data, kind)
+    try:
+        with span("rename"):
+            os.replace(tmp_path, path)
+    except OSError:
+        unlink_quiet(tmp_path)
+        raise
+    commit_written(path, kind)
+
+
+def unlink_quiet(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def rmtree_writable(path: Path) -> None:
+    import shutil
+    import stat
+
+    # Published build files are read-only hardlinks to CAS objects, and Windows refuses to
+    # delete a read-only file. The object left writable is rehashed on its next reuse.
+    def make_writable(function, name, _exc_info):
+        try:
+            os.chmod(name, stat.S_IWRITE | stat.S_IREAD)
+            function(name)
+        except OSError:
+            pass
+
+    shutil.rmtree(path, onerror=make_writable)
 
 
 def read_json(path: Path) -> Optional[dict]:
     try:
-        with open(path, "r", encoding="utf-8") as handle:
+        with span("parse"), open(path, "r", encoding="utf-8") as handle:
             return json.load(handle)
     except Exception:
         return None
@@ -58,14 +246,23 @@ def get_state_dir(args: argparse.Namespace) -> Path:
     return Path(state_dir)
 
 
+# Set by `serve`: a resident process only needs to create the layout once per state dir.
+CACHE_OPS_DIRS = False
+ENSURED_STATE_DIRS: set = set()
+
+
 def ensure_ops_dirs(state_dir: Path) -> Path:
     ops_dir = state_dir / "ops"
-    for sub in ("heartbeats", "requests", "claims", "results", "locks", "archive/requests", "archive/claims"):
+    if CACHE_OPS_DIRS and state_dir in ENSURED_STATE_DIRS:
+        return ops_dir
+    for sub in ("heartbeats", "requests", "claims", "results", "locks", "index", "metrics", "archive/requests", "archive/claims"):
         (ops_dir / sub).mkdir(parents=True, exist_ok=True)
     (state_dir / "builds" / "inbox").mkdir(parents=True, exist_ok=True)
     (state_dir / "builds" / "inbox_archive").mkdir(parents=True, exist_ok=True)
     (state_dir / "builds").mkdir(parents=True, exist_ok=True)
     (state_dir / "runs").mkdir(parents=True, exist_ok=True)
+    if CACHE_OPS_DIRS:
+        ENSURED_STATE_DIRS.add(state_dir)
     return ops_dir
 
 
@@ -80,6 +277,138 @@ def is_expired(expires_utc: Optional[str]) -> bool:
     return utc_now() > parsed
 
 
+LEASE_CAS_ATTEMPTS = 5
+LEASE_PARTIAL_GRACE_SECONDS = 30
+LEASE_MARKER_MAX_AGE_SECONDS = 3600
+LEASE_REMOVE = object()
+
+
+def read_lease(path: Path) -> Optional[dict]:
+    # Leases carry a lineage token and a generation counter; every mutation is a compare-and-swap
+    # from generation N to N+1. Files written before tokens existed get a content-derived token.
+    try:
+        with span("parse"), open(path, "rb") as handle:
+            raw = handle.read()
+            mtime = os.fstat(handle.fileno()).st_mtime
+    except FileNotFoundError:
+        return None
+    try:
+        with span("parse"):
+            data = json.loads(raw.decode("utf-8"))
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and data.get("token"):
+        return data
+    import hashlib
+
+    digest = hashlib.sha1(raw).hexdigest()[:16]
+    if isinstance(data, dict):
+        data["token"] = f"legacy-{digest}"
+        data["generation"] = 0
+        return data
+    # Torn lease (exclusive-create fallback mid-write, or a crashed writer): held for a short grace period.
+    partial = {"token": f"partial-{digest}", "generation": 0}
+    if time.time() - mtime < LEASE_PARTIAL_GRACE_SECONDS:
+        partial["lease_expires_utc"] = utc_iso(lease_expiry(LEASE_PARTIAL_GRACE_SECONDS))
+    return partial
+
+
+def lease_marker(path: Path, token: str, generation: int) -> Path:
+    return path.with_name(f".{path.name}.{token}.{generation}")
+
+
+def exclusive_publish(source: Path, target: Path) -> bool:
+    # link() fails if target exists, so the complete file appears atomically or not at all.
+    try:
+        os.link(source, target)
+        return True
+    except FileExistsError:
+        return False
+    except OSError:
+        pass
+    try:
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(source.read_bytes())
+    return True
+
+
+def cas_write_lease(path: Path, data, current: Optional[dict], kind: str) -> bool:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if current is None:
+        if data is LEASE_REMOVE:
+            return not path.exists()
+        tmp_path = write_temp_json(path, dict(data, token=os.urandom(16).hex(), generation=1), kind)
+        try:
+            if not exclusive_publish(tmp_path, path):
+                return False
+            commit_written(path, kind)
+            return True
+        finally:
+            unlink_quiet(tmp_path)
+
+    token = current.get("token")
+    generation = int(current.get("generation") or 0)
+    removing = data is LEASE_REMOVE
+    payload = {"removed": True} if removing else data
+    marker = lease_marker(path, token, generation + 1)
+    tmp_path = write_temp_json(path, dict(payload, token=token, generation=generation + 1), kind)
+    try:
+        if not exclusive_publish(tmp_path, marker):
+            return False
+        # Winning the marker only proves nobody else advanced this lineage past N; make sure the
+        # lease we read is still the one on disk (not deleted, recreated, or already moved on).
+        latest = read_lease(path)
+        if latest is None or latest.get("token") != token or int(latest.get("generation") or 0) != generation:
+            unlink_quiet(marker)
+            return False
+        if removing:
+            unlink_quiet(path)
+            unlink_quiet(marker)
+        else:
+            with span("rename"):
+                os.replace(tmp_path, path)
+            commit_written(path, kind)
+        unlink_quiet(lease_marker(path, token, generation))
+        return True
+    finally:
+        unlink_quiet(tmp_path)
+
+
+def lease_transaction(path: Path, decide, kind: str) -> int:
+    # decide(current) returns an exit code to stop, LEASE_REMOVE, or the lease dict to write.
+    for _ in range(LEASE_CAS_ATTEMPTS):
+        current = read_lease(path)
+        outcome = decide(current)
+        if isinstance(outcome, int):
+            return outcome
+        if cas_write_lease(path, outcome, current, kind):
+            return 0
+    sys.stderr.write(f"lease contention on {path.name}\n")
+    return 3
+
+
+def sweep_lease_markers(directory: Path, max_age_seconds: int) -> int:
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    try:
+        with os.scandir(directory) as scan:
+            for item in scan:
+                if not item.name.startswith("."):
+                    continue
+                try:
+                    if item.stat().st_mtime < cutoff:
+                        os.unlink(item.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+    except FileNotFoundError:
+        pass
+    return removed
+
+
 def priority_value(value) -> int:
     if value is None:
         return 0
@@ -101,34 +430,416 @@ def priority_value(value) -> int:
     return mapping.get(text, 0)
 
 
+INDEX_VERSION = 1
+INDEX_COMPACT_LINES = 256
+INDEX_LOCK_STALE_SECONDS = 60
+
+
+def dir_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def append_lines(path: Path, lines: list) -> None:
+    if not lines:
+        return
+    payload = "".join(json.dumps(line, ensure_ascii=True, separators=(",", ":")) + "\n" for line in lines)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+    fd = os.open(path, flags, 0o644)
+    try:
+        os.write(fd, payload.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def append_metrics(path: Path, lines: list) -> None:
+    # Best effort and never fsynced: metrics must not fail or slow down the command they describe.
+    if not METRICS_ENABLED:
+        return
+    try:
+        try:
+            if path.stat().st_size > METRICS_ROTATE_BYTES:
+                os.replace(path, path.with_name(path.name + ".1"))
+        except FileNotFoundError:
+            # Only ops/metrics itself: recording never creates the ops layout (read-only commands rely on that).
+            path.parent.mkdir(exist_ok=True)
+        append_lines(path, lines)
+    except OSError:
+        pass
+
+
+def record_lifecycle(state_dir: Path, req_id: Optional[str], event: str) -> None:
+    if req_id:
+        append_metrics(state_dir / "ops" / "metrics" / "lifecycle.ndjson", [{"id": req_id, "event": event, "ts": round(time.time(), 3)}])
+
+
+def record_command(args: argparse.Namespace, rc: int, seconds: float) -> None:
+    spans = {name: [count, round(total * 1000, 3)] for name, (count, total) in SPAN_TOTALS.items()}
+    SPAN_TOTALS.clear()
+    state_dir = getattr(args, "state_dir", None) or os.environ.get("TRI_STATE_DIR")
+    if not state_dir or args.command in ("metrics", "serve"):
+        return
+    if args.command in READ_ONLY_COMMANDS and not METRICS_READS:
+        return
+    line = {"ts": round(time.time(), 3), "command": args.command, "rc": rc, "ms": round(seconds * 1000, 3), "spans": spans}
+    append_metrics(Path(state_dir) / "ops" / "metrics" / "commands.ndjson", [line])
+
+
+def try_lock_file(path: Path, stale_seconds: float) -> bool:
+    # O_EXCL marker lock; a holder that died is presumed gone once the marker is stale_seconds old.
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            try:
+                age = time.time() - path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age < stale_seconds:
+                return False
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def request_sort_fields(path: Path, req: dict) -> tuple:
+    req_utc = parse_utc(req.get("utc"))
+    if not req_utc:
+        req_utc = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+    return priority_value(req.get("priority")), utc_iso(req_utc)
+
+
+class RequestIndex:
+    # Priority index over ops/requests: a compacted snapshot plus an append-only journal of
+    # add/remove/claim/release/resolve ops. The index is a hint; claim files stay authoritative.
+    # Unresolved requests are also bucketed by project ("" = projects not known yet), so
+    # coalescing only looks at requests that can overlap the claimed one, and kept in a
+    # (-priority, utc, id) heap that claims walk without touching resolved entries.
+
+    def __init__(self, ops_dir: Path):
+        self.requests_dir = ops_dir / "requests"
+        self.snapshot_path = ops_dir / "index" / "requests.snapshot.json"
+        self.journal_path = ops_dir / "index" / "requests.journal"
+        self.lock_path = ops_dir / "index" / ".compact.lock"
+        self.entries: dict = {}
+        self.buckets: dict = {}
+        self.heap: list = []
+        self.mtime_ns: Optional[int] = None
+        self.journal_lines = 0
+
+    @classmethod
+    def open(cls, ops_dir: Path) -> "RequestIndex":
+        index = cls(ops_dir)
+        if not index.load():
+            index.compact(rebuild=True)
+        elif index.mtime_ns != dir_mtime_ns(index.requests_dir):
+            index.compact(reconcile=True)
+        elif index.journal_lines >= INDEX_COMPACT_LINES:
+            index.compact()
+        return index
+
+    def load(self, journal: Optional[Path] = None) -> bool:
+        self.entries = {}
+        self.buckets = {}
+        self.heap = []
+        self.mtime_ns = None
+        self.journal_lines = 0
+        snapshot = read_json(self.snapshot_path)
+        if not isinstance(snapshot, dict) or snapshot.get("version") != INDEX_VERSION:
+            return False
+        entries = snapshot.get("entries")
+        if not isinstance(entries, dict):
+            return False
+        ops = self.read_journal(journal or self.journal_path)
+        if ops is None:
+            return False
+        self.entries = entries
+        buckets = snapshot.get("buckets")
+        if isinstance(buckets, dict):
+            self.buckets = {project: set(ids) for project, ids in buckets.items()}
+        else:
+            self.rebuild_buckets()
+        heap = snapshot.get("heap")
+        if isinstance(heap, list):
+            # Written sorted, and a sorted list is already a valid heap.
+            self.heap = [tuple(key) for key in heap]
+        else:
+            self.rebuild_heap()
+        self.mtime_ns = snapshot.get("requests_mtime_ns")
+        for op in ops:
+            self.apply(op)
+        self.journal_lines = len(ops)
+        return True
+
+    @staticmethod
+    def read_journal(path: Path) -> Optional[list]:
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                lines = handle.read().splitlines()
+        except FileNotFoundError:
+            return []
+        ops = []
+        for line in lines:
+            try:
+                op = json.loads(line)
+            except ValueError:
+                return None
+            if not isinstance(op, dict):
+                return None
+            ops.append(op)
+        return ops
+
+    def apply(self, op: dict) -> None:
+        kind = op.get("op")
+        req_id = op.get("id")
+        if kind == "mtime":
+            if op.get("before") == self.mtime_ns:
+                self.mtime_ns = op.get("after")
+            return
+        if not req_id:
+            return
+        if kind == "add":
+            self.unbucket(req_id)
+            self.entries[req_id] = {"priority": op.get("priority", 0), "utc": op.get("utc", ""), "projects": op.get("projects"), "commit": op.get("commit")}
+            if "type" in op:
+                # Journals written before the type was indexed leave it out; coalescing then reads the request.
+                self.entries[req_id]["type"] = op["type"]
+            self.bucket(req_id)
+            self.push(req_id)
+            return
+        if kind == "remove":
+            self.unbucket(req_id)
+            self.entries.pop(req_id, None)
+            return
+        entry = self.entries.get(req_id)
+        if entry is None:
+            return
+        if kind == "claim":
+            entry["claimed_by"] = op.get("claimed_by")
+            entry["lease_expires_utc"] = op.get("lease_expires_utc")
+        elif kind == "release":
+            entry.pop("claimed_by", None)
+            entry.pop("lease_expires_utc", None)
+        elif kind == "resolve":
+            self.unbucket(req_id)
+            entry["resolved"] = True
+
+    @staticmethod
+    def bucket_keys(entry: dict) -> list:
+        projects = entry.get("projects")
+        if projects is None:
+            return [""]
+        return [str(project).lower() for project in projects]
+
+    def bucket(self, req_id: str) -> None:
+        entry = self.entries.get(req_id)
+        if entry is not None and not entry.get("resolved"):
+            for key in self.bucket_keys(entry):
+                self.buckets.setdefault(key, set()).add(req_id)
+
+    def unbucket(self, req_id: str) -> None:
+        entry = self.entries.get(req_id)
+        if entry is None:
+            return
+        for key in self.bucket_keys(entry):
+            members = self.buckets.get(key)
+            if members is not None:
+                members.discard(req_id)
+                if not members:
+                    del self.buckets[key]
+
+    def rebuild_buckets(self) -> None:
+        self.buckets = {}
+        for req_id in self.entries:
+            self.bucket(req_id)
+
+    @staticmethod
+    def heap_key(req_id: str, entry: dict) -> tuple:
+        return -entry.get("priority", 0), entry.get("utc", ""), req_id
+
+    def live(self, key: tuple) -> bool:
+        # Lazy deletion: resolved, removed or re-added requests leave stale keys behind.
+        entry = self.entries.get(key[2])
+        return entry is not None and not entry.get("resolved") and self.heap_key(key[2], entry) == key
+
+    def push(self, req_id: str) -> None:
+        import heapq
+
+        heapq.heappush(self.heap, self.heap_key(req_id, self.entries[req_id]))
+
+    def rebuild_heap(self) -> None:
+        self.heap = sorted(self.heap_key(req_id, entry) for req_id, entry in self.entries.items() if not entry.get("resolved"))
+
+    def overlapping(self, projects) -> list:
+        # Unresolved requests sharing a project (or with projects not indexed yet), oldest first.
+        ids = set(self.buckets.get("", ()))
+        for project in projects:
+            ids.update(self.buckets.get(str(project).lower(), ()))
+        return sorted(ids, key=lambda req_id: (self.entries.get(req_id, {}).get("utc", ""), req_id))
+
+    def append(self, *ops: dict) -> None:
+        for op in ops:
+            self.apply(op)
+        append_lines(self.journal_path, list(ops))
+
+    def reconcile(self) -> None:
+        on_disk = {}
+        try:
+            with span("scan"), os.scandir(self.requests_dir) as scan:
+                for item in scan:
+                    if item.name.endswith(".json") and not item.name.startswith("."):
+                        on_disk[item.name[:-5]] = Path(item.path)
+        except FileNotFoundError:
+            pass
+        for req_id in [req_id for req_id in self.entries if req_id not in on_disk]:
+            self.unbucket(req_id)
+            del self.entries[req_id]
+        for req_id, path in on_disk.items():
+            if req_id in self.entries:
+                continue
+            req = read_json(path) or {}
+            try:
+                priority, utc = request_sort_fields(path, req)
+            except FileNotFoundError:
+                continue
+            self.entries[req_id] = {"priority": priority, "utc": utc, "projects": req.get("projects"), "commit": req.get("desired_build_commit"), "type": request_type(req)}
+            self.bucket(req_id)
+        self.resolve_from_results()
+        self.rebuild_heap()
+
+    def resolve_from_results(self) -> None:
+        # Resolve ops live only in the journal, so a rebuilt index would offer finished requests
+        # again. A result (live or archived by compact) written no earlier than the request
+        # resolves it; an older one belongs to an earlier request that reused the id.
+        ops_dir = self.requests_dir.parent
+        for req_id, entry in self.entries.items():
+            if entry.get("resolved"):
+                continue
+            record = read_json(ops_dir / "results" / f"{req_id}.json")
+            if record is not None:
+                stamps = [record.get("utc") or ""]
+            else:
+                stamps = [location.get("utc") or "" for location in segment_locations(ops_dir, "results", req_id)]
+            if stamps and max(stamps) >= entry.get("utc", ""):
+                self.unbucket(req_id)
+                entry["resolved"] = True
+
+    def acquire_compact_lock(self) -> bool:
+        return try_lock_file(self.lock_path, INDEX_LOCK_STALE_SECONDS)
+
+    def compact(self, rebuild: bool = False, reconcile: bool = False) -> None:
+        if not self.acquire_compact_lock():
+            # Another process is compacting; fix up the in-memory view only.
+            if rebuild or reconcile:
+                self.reconcile()
+            return
+        staging = self.journal_path.with_name(f"{self.journal_path.name}.{os.getpid()}.compacting")
+        try:
+            mtime_ns = dir_mtime_ns(self.requests_dir)
+            try:
+                os.replace(self.journal_path, staging)
+            except FileNotFoundError:
+                pass
+            if rebuild or not self.load(staging):
+                self.entries = {}
+                self.buckets = {}
+                rebuild = True
+            if rebuild or reconcile or self.mtime_ns != mtime_ns:
+                self.reconcile()
+                self.mtime_ns = mtime_ns
+            else:
+                self.rebuild_heap()
+            snapshot = {
+                "version": INDEX_VERSION,
+                "utc": utc_iso(),
+                "requests_mtime_ns": self.mtime_ns,
+                "entries": self.entries,
+                "buckets": {project: sorted(ids) for project, ids in self.buckets.items()},
+                "heap": self.heap,
+            }
+            atomic_write_json(self.snapshot_path, snapshot, kind="index")
+            self.journal_lines = 0
+            try:
+                staging.unlink()
+            except FileNotFoundError:
+                pass
+        finally:
+            try:
+                self.lock_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def ordered(self):
+        # Unresolved requests in claim order. Stale keys at the top are dropped for good; the
+        # rest of the heap is walked through a frontier heap of its array positions, so yielding
+        # k requests costs O(k log k) however many requests the index holds.
+        import heapq
+
+        heap = self.heap
+        while heap and not self.live(heap[0]):
+            heapq.heappop(heap)
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            key, position = heapq.heappop(frontier)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+            if self.live(key):
+                yield key[2], self.entries[key[2]]
+
+
+def index_append(ops_dir: Path, *ops: dict) -> None:
+    append_lines(ops_dir / "index" / "requests.journal", list(ops))
+
+
 def cmd_init(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ensure_ops_dirs(state_dir)
     return 0
 
 
+def host_name() -> str:
+    # Same value as socket.gethostname() without importing socket on every heartbeat.
+    if hasattr(os, "uname"):
+        return os.uname().nodename
+    import socket
+
+    return socket.gethostname()
+
+
 def cmd_heartbeat(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
     agent = args.agent
     data = {
         "agent": agent,
-        "host": args.host or socket.gethostname(),
-        "pid": os.getpid(),
+        "host": args.host or host_name(),
+        "pid": args.pid or os.getpid(),
         "cycle": args.cycle,
         "phase": args.phase,
         "currentTask": args.current_task,
         "utc": utc_iso(),
         "version": args.version,
     }
-    atomic_write_json(ops_dir / "heartbeats" / f"{agent}.json", data)
+    atomic_write_json(ops_dir / "heartbeats" / f"{agent}.json", data, kind="heartbeat")
     return 0
 
 
 def cmd_request_rebuild(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
-    req_id = args.id or str(uuid.uuid4())
+    if args.id:
+        req_id = args.id
+    else:
+        import uuid
+
+        req_id = str(uuid.uuid4())
     projects = args.project or []
     if args.projects:
         projects += [item.strip() for item in args.projects.split(",") if item.strip()]
@@ -148,101 +859,293 @@ def cmd_request_rebuild(args: argparse.Namespace) -> int:
         data["desired_build_commit"] = args.desired_build_commit
     if args.notes:
         data["notes"] = args.notes
-    atomic_write_json(ops_dir / "requests" / f"{req_id}.json", data)
+    requests_dir = ops_dir / "requests"
+    before_ns = dir_mtime_ns(requests_dir)
+    index_append(ops_dir, {"op": "add", "id": req_id, "priority": priority_value(args.priority), "utc": data["utc"], "projects": projects, "commit": args.desired_build_commit, "type": args.type})
+    atomic_write_json(requests_dir / f"{req_id}.json", data, kind="request")
+    index_append(ops_dir, {"op": "mtime", "before": before_ns, "after": dir_mtime_ns(requests_dir)})
+    record_lifecycle(state_dir, req_id, "requested")
     sys.stdout.write(req_id + "\n")
     return 0
 
 
+def request_type(req: dict) -> str:
+    return req.get("type") or "rebuild"
+
+
+def request_projects(entry: dict, req: Optional[dict]) -> list:
+    projects = entry.get("projects")
+    if projects is None and req is not None:
+        projects = req.get("projects")
+    return [str(project).lower() for project in projects or []]
+
+
+def claim_request(index: RequestIndex, claim_file: Path, req_id: str, existing: Optional[dict],
+                  args: argparse.Namespace, merged_into: Optional[str] = None) -> bool:
+    claim = {
+        "id": req_id,
+        "claimed_by": args.agent,
+        "utc": utc_iso(),
+        "lease_seconds": args.lease_seconds,
+        "lease_expires_utc": utc_iso(lease_expiry(args.lease_seconds)),
+    }
+    if merged_into:
+        claim["merged_into"] = merged_into
+    if not cas_write_lease(claim_file, claim, existing, "claim"):
+        return False
+    index.append({"op": "claim", "id": req_id, "claimed_by": args.agent, "lease_expires_utc": claim["lease_expires_utc"]})
+    return True
+
+
+ANCESTRY_CACHE: dict = {}
+MAX_ANCESTRY_PROBES = 8
+
+
+def is_ancestor(commit: str, descendant: str, repo: Optional[str] = None, probes: Optional[list] = None) -> bool:
+    # git merge-base --is-ancestor; an unknown commit or a missing repo counts as "not an ancestor".
+    # Answers are cached per (repo, commit pair) for the process (serve keeps them warm), and
+    # probes (a one-item counter) caps the git calls one claim may make; past it, "no".
+    import subprocess
+
+    key = (repo or ".", commit, descendant)
+    if key in ANCESTRY_CACHE:
+        return ANCESTRY_CACHE[key]
+    if probes is not None:
+        if probes[0] <= 0:
+            return False
+        probes[0] -= 1
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo or ".", "merge-base", "--is-ancestor", commit, descendant],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30,
+        )
+        answer = result.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+    ANCESTRY_CACHE[key] = answer
+    return answer
+
+
+def coalesces_into(leader: dict, entry: dict, repo: Optional[str] = None, probes: Optional[list] = None) -> bool:
+    # Only requests for the same operation (type) merge: one result cannot answer both a
+    # rebuild and, say, a test run of the same project.
+    if request_type(entry) != request_type(leader):
+        return False
+    # Same desired commit (or neither pins one), or the candidate is older than the claimed
+    # request and so superseded by it: one build of the leader's commit satisfies both. A
+    # superseded candidate must be unpinned or pin an ancestor of the leader's commit, so a
+    # request for another branch is never reported as satisfied by the leader's build.
+    if entry.get("commit") == leader.get("commit"):
+        return True
+    if not entry.get("utc") or entry["utc"] > leader.get("utc", ""):
+        return False
+    if not entry.get("commit"):
+        return True
+    return bool(leader.get("commit")) and is_ancestor(entry["commit"], leader["commit"], repo, probes)
+
+
+def coalesce_requests(index: RequestIndex, ops_dir: Path, leader_id: str, leader_req: dict,
+                      affinity: set, args: argparse.Namespace) -> dict:
+    # Claim every pending request the leader's build also satisfies, marking each claim
+    # merged_into the leader; renew_claim, write_result and archive_request fan out to them.
+    requests_dir = ops_dir / "requests"
+    claims_dir = ops_dir / "claims"
+    leader = {"commit": leader_req.get("desired_build_commit"), "utc": leader_req.get("utc", ""), "type": request_type(leader_req)}
+    projects = request_projects({}, leader_req)
+    # Overlap is judged against the leader's own projects, so the result does not depend on scan order.
+    leader_projects = set(projects)
+    repo = getattr(args, "repo", None) or os.environ.get("TRI_REPO_DIR")
+    probes = [MAX_ANCESTRY_PROBES]
+    merged = []
+    for req_id in index.overlapping(leader_projects):
+        entry = index.entries.get(req_id)
+        if req_id == leader_id or entry is None or entry.get("resolved"):
+            continue
+        if entry.get("claimed_by") and not is_expired(entry.get("lease_expires_utc")):
+            continue
+        req = None
+        if entry.get("projects") is None or "commit" not in entry or "type" not in entry:
+            req = read_json(requests_dir / f"{req_id}.json")
+            if req is None:
+                continue
+            entry = dict(entry, projects=req.get("projects"), commit=req.get("desired_build_commit"), type=request_type(req))
+        candidate = request_projects(entry, None)
+        if not leader_projects.intersection(candidate) or (affinity and not affinity.issuperset(candidate)):
+            continue
+        if not coalesces_into(leader, entry, repo, probes):
+            continue
+        claim_file = claims_dir / f"{req_id}.json"
+        existing = read_lease(claim_file)
+        if existing and not is_expired(existing.get("lease_expires_utc")):
+            continue
+        if not claim_request(index, claim_file, req_id, existing, args, merged_into=leader_id):
+            continue
+        record_lifecycle(ops_dir.parent, req_id, "claimed")
+        merged.append(req_id)
+        projects += [project for project in candidate if project not in projects]
+        entry_priority = entry.get("priority", 0)
+        if entry_priority > priority_value(leader_req.get("priority")):
+            leader_req = dict(leader_req, priority=entry_priority)
+    if not merged:
+        return leader_req
+
+    # The leader's claim lists its merged requests, so fan-out reads one file instead of every claim.
+    def decide(existing: Optional[dict]):
+        if not existing or existing.get("claimed_by") != args.agent:
+            return 3
+        return dict(existing, merged=merged)
+
+    lease_transaction(claims_dir / f"{leader_id}.json", decide, "claim")
+    return dict(leader_req, projects=projects, merged=merged)
+
+
+def merged_claims(claims_dir: Path, leader_id: str) -> list:
+    claim = read_lease(claims_dir / f"{leader_id}.json")
+    return list(claim.get("merged") or []) if claim else []
+
+
 def cmd_claim_next(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
     requests_dir = ops_dir / "requests"
     claims_dir = ops_dir / "claims"
-
-    items = []
-    for path in requests_dir.glob("*.json"):
-        req = read_json(path) or {}
-        req_id = req.get("id") or path.stem
-        if not req_id:
-            continue
-        if req_id != path.stem:
-            req_id = path.stem
-        req_utc = parse_utc(req.get("utc"))
-        if not req_utc:
-            req_utc = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
-        items.append((-priority_value(req.get("priority")), req_utc, path, req_id, req))
-
-    items.sort()
-    for _, _, path, req_id, req in items:
-        claim_file = claims_dir / f"{req_id}.json"
-        if claim_file.exists():
-            existing = read_json(claim_file)
+    affinity = {project.lower() for project in args.project or []}
+    limit = max(1, args.max)
+    batch = limit > 1
+    claimed = 0
+
+    index = RequestIndex.open(ops_dir)
+    with group_commit(batch):
+        for req_id, entry in index.ordered():
+            if entry.get("resolved"):
+                continue
+            if entry.get("claimed_by") and not is_expired(entry.get("lease_expires_utc")):
+                continue
+            req = None
+            if affinity:
+                if entry.get("projects") is None:
+                    req = read_json(requests_dir / f"{req_id}.json")
+                if not affinity.intersection(request_projects(entry, req)):
+                    continue
+            claim_file = claims_dir / f"{req_id}.json"
+            existing = read_lease(claim_file)
             if existing and not is_expired(existing.get("lease_expires_utc")):
+                index.append({"op": "claim", "id": req_id, "claimed_by": existing.get("claimed_by"), "lease_expires_utc": existing.get("lease_expires_utc")})
                 continue
-        lease_seconds = args.lease_seconds
-        expires = lease_expiry(lease_seconds)
-        claim = {
+            if req is None:
+                req = read_json(requests_dir / f"{req_id}.json")
+            if req is None:
+                continue
+            if not claim_request(index, claim_file, req_id, existing, args):
+                continue
+            record_lifecycle(state_dir, req_id, "claimed")
+            if not args.no_coalesce:
+                req = coalesce_requests(index, ops_dir, req_id, req, affinity, args)
+            if args.json:
+                sys.stdout.write(json.dumps({"id": req_id, "request": req}, separators=(",", ":")) + "\n")
+            else:
+                sys.stdout.write(req_id + "\n")
+            sys.stdout.flush()
+            claimed += 1
+            if claimed >= limit:
+                break
+
+    return 0 if claimed else 2
+
+
+def renew_one_claim(claim_file: Path, req_id: str, args: argparse.Namespace) -> Optional[str]:
+    lease_seconds = args.lease_seconds
+    claim = {}
+
+    def decide(existing: Optional[dict]):
+        if existing and not args.force:
+            if existing.get("claimed_by") != args.agent:
+                sys.stderr.write(f"claim owner mismatch: {req_id}\n")
+                return 3
+        claim.update({
             "id": req_id,
             "claimed_by": args.agent,
             "utc": utc_iso(),
             "lease_seconds": lease_seconds,
-            "lease_expires_utc": utc_iso(expires),
-        }
-        atomic_write_json(claim_file, claim)
-        if args.json:
-            sys.stdout.write(json.dumps({"id": req_id, "request": req}, separators=(",", ":")) + "\n")
-        else:
-            sys.stdout.write(req_id + "\n")
-        return 0
-
-    return 2
+            "lease_expires_utc": utc_iso(lease_expiry(lease_seconds)),
+        })
+        if existing:
+            for field in ("merged_into", "merged"):
+                if existing.get(field):
+                    claim[field] = existing[field]
+        return dict(claim)
+
+    if lease_transaction(claim_file, decide, "claim") != 0:
+        return None
+    return claim["lease_expires_utc"]
 
 
 def cmd_renew_claim(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
-    claim_file = ops_dir / "claims" / f"{args.id}.json"
-    existing = read_json(claim_file)
-    if existing and not args.force:
-        if existing.get("claimed_by") != args.agent:
-            sys.stderr.write("claim owner mismatch\n")
-            return 3
-    lease_seconds = args.lease_seconds
-    expires = lease_expiry(lease_seconds)
-    claim = {
-        "id": args.id,
-        "claimed_by": args.agent,
-        "utc": utc_iso(),
-        "lease_seconds": lease_seconds,
-        "lease_expires_utc": utc_iso(expires),
-    }
-    atomic_write_json(claim_file, claim)
-    return 0
+    claims_dir = ops_dir / "claims"
+    ids = []
+    if args.id:
+        ids.append(args.id)
+    for chunk in args.ids or []:
+        ids += [item.strip() for item in chunk.split(",") if item.strip()]
+    if args.all_mine:
+        for claim_file in sorted(claims_dir.glob("*.json")):
+            existing = read_lease(claim_file)
+            if existing and existing.get("claimed_by") == args.agent and claim_file.stem not in ids:
+                ids.append(claim_file.stem)
+    else:
+        # Requests coalesced into a claimed one ride on its renewals.
+        for leader_id in list(ids):
+            ids += [req_id for req_id in merged_claims(claims_dir, leader_id) if req_id not in ids]
+    if not ids:
+        if args.all_mine:
+            return 0
+        sys.stderr.write("renew_claim requires --id, --ids or --all-mine\n")
+        return 2
+
+    batch = len(ids) > 1 or args.all_mine
+    rc = 0
+    ops = []
+    with group_commit(batch):
+        for req_id in ids:
+            expires = renew_one_claim(claims_dir / f"{req_id}.json", req_id, args)
+            if expires is None:
+                rc = 3
+                continue
+            ops.append({"op": "claim", "id": req_id, "claimed_by": args.agent, "lease_expires_utc": expires})
+            if args.json:
+                sys.stdout.write(json.dumps({"id": req_id, "lease_expires_utc": expires}, separators=(",", ":")) + "\n")
+    index_append(ops_dir, *ops)
+    return rc
 
 
 def cmd_lock_build(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
     lock_file = ops_dir / "locks" / "build.lock"
-    if lock_file.exists():
-        existing = read_json(lock_file)
+
+    def decide(existing: Optional[dict]):
         if existing and not is_expired(existing.get("lease_expires_utc")):
             if existing.get("owner") == args.owner and existing.get("request_id") == args.request_id:
                 pass
             elif not args.force:
                 sys.stderr.write("build lock is held by another owner\n")
                 return 3
-    lease_seconds = args.lease_seconds
-    expires = lease_expiry(lease_seconds)
-    lock = {
-        "owner": args.owner,
-        "request_id": args.request_id,
-        "utc": utc_iso(),
-        "lease_seconds": lease_seconds,
-        "lease_expires_utc": utc_iso(expires),
-    }
-    atomic_write_json(lock_file, lock)
-    return 0
+        lease_seconds = args.lease_seconds
+        expires = lease_expiry(lease_seconds)
+        return {
+            "owner": args.owner,
+            "request_id": args.request_id,
+            "utc": utc_iso(),
+            "lease_seconds": lease_seconds,
+            "lease_expires_utc": utc_iso(expires),
+        }
+
+    rc = lease_transaction(lock_file, decide, "lock")
+    if rc == 0 and args.command == "lock_build":
+        record_lifecycle(state_dir, args.request_id, "locked")
+    return rc
 
 
 def cmd_renew_lock(args: argparse.Namespace) -> int:
@@ -253,28 +1156,27 @@ def cmd_unlock_build(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
     lock_file = ops_dir / "locks" / "build.lock"
-    if not lock_file.exists():
-        return 0
-    existing = read_json(lock_file)
-    if existing and not args.force:
-        if existing.get("owner") != args.owner:
-            sys.stderr.write("build lock owner mismatch\n")
-            return 3
-        if args.request_id and existing.get("request_id") != args.request_id:
-            sys.stderr.write("build lock request mismatch\n")
-            return 3
-    try:
-        lock_file.unlink()
-    except FileNotFoundError:
-        pass
-    return 0
+
+    def decide(existing: Optional[dict]):
+        if existing is None:
+            return 0
+        if not args.force:
+            if existing.get("owner") != args.owner:
+                sys.stderr.write("build lock owner mismatch\n")
+                return 3
+            if args.request_id and existing.get("request_id") != args.request_id:
+                sys.stderr.write("build lock request mismatch\n")
+                return 3
+        return LEASE_REMOVE
+
+    return lease_transaction(lock_file, decide, "lock")
 
 
 def cmd_lock_status(args: argparse.Namespace) -> int:
+    # Read-only: no ensure_ops_dirs, a missing layout simply means no lock.
     state_dir = get_state_dir(args)
-    ops_dir = ensure_ops_dirs(state_dir)
-    lock_file = ops_dir / "locks" / "build.lock"
-    existing = read_json(lock_file) if lock_file.exists() else None
+    lock_file = state_dir / "ops" / "locks" / "build.lock"
+    existing = read_json(lock_file)
     if existing and not is_expired(existing.get("lease_expires_utc")):
         if args.json:
             sys.stdout.write(json.dumps(existing, separators=(",", ":")) + "\n")
@@ -282,27 +1184,29 @@ def cmd_lock_status(args: argparse.Namespace) -> int:
     return 1
 
 
+def remove_if_expired(path: Path, kind: str) -> bool:
+    def decide(existing: Optional[dict]):
+        if existing is None or not is_expired(existing.get("lease_expires_utc")):
+            return 1
+        return LEASE_REMOVE
+
+    return lease_transaction(path, decide, kind) == 0
+
+
 def cmd_gc_stale_leases(args: argparse.Namespace) -> int:
     state_dir = get_state_dir(args)
     ops_dir = ensure_ops_dirs(state_dir)
     removed = {"locks": 0, "claims": 0}
     lock_file = ops_dir / "locks" / "build.lock"
-    existing = read_json(lock_file) if lock_file.exists() else None
-    if existing and is_expired(existing.get("lease_expires_utc")):
-        try:
-            lock_file.unlink()
-            removed["locks"] += 1
-        except FileNotFoundError:
-            pass
+    if remove_if_expired(lock_file, "lock"):
+        removed["locks"] += 1
     if args.prune_claims:
         for claim_file in (ops_dir / "claims").glob("*.json"):
-            claim = read_json(claim_file)
-            if claim and is_expired(claim.get("lease_expires_utc")):
-                try:
-                    claim_file.unlink()
-                    removed["claims"] += 1
-                except FileNotFoundError:
-                    pass
+            if remove_if_expired(claim_file, "claim"):
+                removed["claims"] += 1
+                index_append(ops_dir, {"op": "release", "id": claim_file.stem})
+    removed["markers"] = sweep_lease_markers(ops_dir / "locks", LEASE_MARKER_MAX_AGE_SECONDS)
+    removed["markers"] += sweep_lease_markers(ops_dir / "claims", LEASE_MARKER_MAX_AGE_SECONDS)
     if args.json:
         sys.stdout.write(json.dumps(removed, separators=(",", ":")) + "\n")
     return 0
@@ -321,7 +1225,257 @@ def cmd_write_result(args: argparse.Namespace) -> int:
     }
     if args.error:
         data["error"] = args.error
-    atomic_write_json(ops_dir / "results" / f"{args.id}.json", data)
+    merged = merged_claims(ops_dir / "claims", args.id)
+    with group_commit(bool(merged)):
+        atomic_write_json(ops_dir / "results" / f"{args.id}.json", dict(data, merged=merged) if merged else data, kind="result")
+        for req_id in merged:
+            atomic_write_json(ops_dir / "results" / f"{req_id}.json", dict(data, id=req_id, merged_into=args.id), kind="result")
+    index_append(ops_dir, *({"op": "resolve", "id": req_id} for req_id in [args.id] + merged))
+    for req_id in [args.id] + merged:
+        record_lifecycle(state_dir, req_id, "result")
+    return 0
+
+
+def archive_file(source: Path, archive_dir: Path, stamp: str) -> bool:
+    if not source.exists():
+        return False
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(source, archive_dir / f"{source.stem}_{stamp}{source.suffix}")
+    except OSError:
+        try:
+            source.unlink()
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def cmd_archive_request(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    ops_dir = ensure_ops_dirs(state_dir)
+    requests_dir = ops_dir / "requests"
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    before_ns = dir_mtime_ns(requests_dir)
+    ids = [args.id] + merged_claims(ops_dir / "claims", args.id)
+    archived = False
+    for req_id in ids:
+        archived |= archive_file(requests_dir / f"{req_id}.json", ops_dir / "archive" / "requests", stamp)
+        archive_file(ops_dir / "claims" / f"{req_id}.json", ops_dir / "archive" / "claims", stamp)
+    ops = [{"op": "remove", "id": req_id} for req_id in ids]
+    if archived:
+        ops.append({"op": "mtime", "before": before_ns, "after": dir_mtime_ns(requests_dir)})
+    index_append(ops_dir, *ops)
+    return 0
+
+
+RUN_LEASED_RENEW_SECONDS = 45.0
+
+
+class LeaseKeeper:
+    # Renews a request's claim (plus any claims merged into it) and build.lock from a timer
+    # thread while the child runs; one missed renewal is retried early, losing a lease stops.
+
+    def __init__(self, args: argparse.Namespace, ops_dir: Path, hold_lock: bool):
+        import threading
+
+        self.args = args
+        self.ops_dir = ops_dir
+        self.hold_lock = hold_lock
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="tri_ops-lease", daemon=True)
+        self.lost: Optional[str] = None
+        self.renewals = 0
+        self.on_lost = None
+
+    def lock_args(self, command: str) -> argparse.Namespace:
+        return argparse.Namespace(
+            state_dir=str(self.ops_dir.parent), command=command, owner=self.args.owner,
+            request_id=self.args.id, lease_seconds=self.args.lease_seconds, force=False,
+        )
+
+    def renew_claims(self) -> Optional[str]:
+        claims_dir = self.ops_dir / "claims"
+        ops = []
+        for req_id in [self.args.id] + merged_claims(claims_dir, self.args.id):
+            expires = renew_one_claim(claims_dir / f"{req_id}.json", req_id, self.args)
+            if expires is None:
+                return f"claim lost: {req_id}"
+            ops.append({"op": "claim", "id": req_id, "claimed_by": self.args.agent, "lease_expires_utc": expires})
+        index_append(self.ops_dir, *ops)
+        return None
+
+    def renew(self) -> Optional[str]:
+        problem = self.renew_claims()
+        if problem is None and self.hold_lock and cmd_lock_build(self.lock_args("renew_lock")) != 0:
+            problem = "build.lock lost"
+        return problem
+
+    def run(self) -> None:
+        import random
+
+        interval = self.args.renew_seconds
+        failures = 0
+        while not self.stop_event.wait(interval * random.uniform(1 - self.args.jitter, 1 + self.args.jitter)):
+            try:
+                problem = self.renew()
+            except OSError as exc:
+                problem = f"renewal error: {exc}"
+            if problem is None:
+                self.renewals += 1
+                failures = 0
+                interval = self.args.renew_seconds
+                continue
+            failures += 1
+            # Ownership loss (rc 3) shows up as a message from renew(); retry once soon in case it was I/O.
+            if failures < 2:
+                interval = min(5.0, self.args.renew_seconds)
+                continue
+            self.lost = problem
+            sys.stderr.write(f"run_leased: {problem}\n")
+            if self.on_lost is not None:
+                self.on_lost()
+            return
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.thread.join()
+
+
+def pump_output(stream, log_path: Optional[Path]) -> None:
+    log = open(log_path, "ab") if log_path else None
+    out = getattr(sys.stdout, "buffer", None)
+    try:
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            if out is not None:
+                out.write(chunk)
+                out.flush()
+            else:
+                sys.stdout.write(chunk.decode("utf-8", "replace"))
+            if log is not None:
+                log.write(chunk)
+                log.flush()
+    finally:
+        if log is not None:
+            log.close()
+
+
+def cmd_run_leased(args: argparse.Namespace) -> int:
+    import signal
+    import subprocess
+    import threading
+
+    state_dir = get_state_dir(args)
+    ops_dir = ensure_ops_dirs(state_dir)
+    command = list(args.cmd)
+    if command and command[0] == "--":
+        command = command[1:]
+    if not command:
+        sys.stderr.write("run_leased requires a command after --\n")
+        return 2
+    args.owner = args.owner or args.agent
+    args.force = False
+    hold_lock = not args.no_lock
+
+    keeper = LeaseKeeper(args, ops_dir, hold_lock)
+    if keeper.renew_claims() is not None:
+        return 3
+    if hold_lock:
+        deadline = time.monotonic() + args.lock_wait_seconds
+        next_renewal = time.monotonic() + args.renew_seconds
+        while cmd_lock_build(keeper.lock_args("lock_build")) != 0:
+            if time.monotonic() >= deadline:
+                return 3
+            time.sleep(min(5.0, max(0.0, deadline - time.monotonic())))
+            if time.monotonic() >= next_renewal:
+                if keeper.renew_claims() is not None:
+                    return 3
+                next_renewal = time.monotonic() + args.renew_seconds
+
+    started = time.monotonic()
+    popen_kwargs = {}
+    if args.log:
+        popen_kwargs.update(stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if os.name != "nt":
+        popen_kwargs["start_new_session"] = True
+    try:
+        child = subprocess.Popen(command, **popen_kwargs)
+    except OSError as exc:
+        sys.stderr.write(f"run_leased: cannot start {command[0]}: {exc}\n")
+        child = None
+    pump = None
+    if child is not None and args.log:
+        pump = threading.Thread(target=pump_output, args=(child.stdout, Path(args.log)), daemon=True)
+        pump.start()
+
+    def terminate() -> None:
+        if child is not None and child.poll() is None:
+            child.terminate()
+
+    def forward(signum, _frame) -> None:
+        if child is not None and child.poll() is None:
+            child.send_signal(signum)
+
+    previous = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous[signum] = signal.signal(signum, forward)
+    keeper.on_lost = terminate
+    keeper.start()
+    try:
+        rc = child.wait() if child is not None else 127
+        if pump is not None:
+            pump.join()
+    finally:
+        keeper.stop()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+    if hold_lock and keeper.lost != "build.lock lost":
+        cmd_unlock_build(argparse.Namespace(state_dir=str(state_dir), owner=args.owner, request_id=args.id, force=False))
+    error = None
+    if keeper.lost:
+        error = f"{keeper.lost}; command stopped"
+    elif rc != 0:
+        error = f"{command[0]} exited with {rc}"
+    # A lost claim may already belong to another lane: resolving or archiving it here would
+    # overwrite that lane's result, so leave the request alone.
+    claim_lost = bool(keeper.lost) and keeper.lost.startswith("claim lost")
+    result = argparse.Namespace(
+        state_dir=str(state_dir), id=args.id, status="lost" if claim_lost else "failed" if error else "ok",
+        published_build_path=args.published_build_path, build_commit=args.build_commit,
+        log=[args.log] if args.log else [], error=error,
+    )
+    if not claim_lost:
+        cmd_write_result(result)
+        if args.archive:
+            cmd_archive_request(argparse.Namespace(state_dir=str(state_dir), id=args.id))
+    if args.json:
+        summary = {
+            "id": args.id,
+            "rc": rc,
+            "status": result.status,
+            "seconds": round(time.monotonic() - started, 3),
+            "renewals": keeper.renewals,
+            "lost": keeper.lost,
+        }
+        sys.stdout.write(json.dumps(summary, separators=(",", ":")) + "\n")
+    if claim_lost:
+        return 5
+    if keeper.lost:
+        return 4
+    return 128 - rc if rc < 0 else rc
+
+
+def cmd_rebuild_index(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    ops_dir = ensure_ops_dirs(state_dir)
+    index = RequestIndex(ops_dir)
+    index.compact(rebuild=True)
+    if args.json:
+        sys.stdout.write(json.dumps({"entries": len(index.entries)}, separators=(",", ":")) + "\n")
     return 0
 
 
@@ -356,112 +1510,1643 @@ def cmd_write_current(args: argparse.Namespace) -> int:
     }
     if args.notes:
         data["notes"] = args.notes
-    atomic_write_json(state_dir / "builds" / f"current_{project}.json", data)
+    atomic_write_json(state_dir / "builds" / f"current_{project}.json", data, kind="current")
+    record_lifecycle(state_dir, args.request_id, "published")
+    return 0
+
+COMMAND_BUCKETS_SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LIFECYCLE_BUCKETS_SECONDS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+# (metric, from event, to event): each pair is measured from the first time a request reached each event.
+LIFECYCLE_INTERVALS = (
+    ("queue_wait", "requested", "claimed"),
+    ("claim_to_result", "claimed", "result"),
+    ("build_to_publish", "locked", "published"),
+    ("request_to_result", "requested", "result"),
+)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        slot = 0
+        while slot < len(self.bounds) and value > self.bounds[slot]:
+            slot += 1
+        self.counts[slot] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation (None when it lies past the last bound).
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for slot, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[slot] if slot < len(self.bounds) else None
+        return None
+
+
+def read_metrics_lines(path: Path, since: float) -> list:
+    lines = []
+    for source in (path.with_name(path.name + ".1"), path):
+        try:
+            with open(source, "r", encoding="utf-8") as handle:
+                for raw in handle:
+                    try:
+                        line = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if isinstance(line, dict) and line.get("ts", 0) >= since:
+                        lines.append(line)
+        except FileNotFoundError:
+            continue
+    return lines
+
+
+def aggregate_metrics(metrics_dir: Path, since: float) -> dict:
+    commands = {}
+    spans = {}
+    for line in read_metrics_lines(metrics_dir / "commands.ndjson", since):
+        name = line.get("command") or "unknown"
+        histogram = commands.get(name)
+        if histogram is None:
+            histogram = commands[name] = Histogram(COMMAND_BUCKETS_SECONDS)
+        histogram.add(line.get("ms", 0) / 1000.0)
+        for span_name, (count, ms) in (line.get("spans") or {}).items():
+            total = spans.setdefault((name, span_name), [0, 0.0])
+            total[0] += count
+            total[1] += ms / 1000.0
+    first_seen = {}
+    for line in read_metrics_lines(metrics_dir / "lifecycle.ndjson", since):
+        events = first_seen.setdefault(line.get("id"), {})
+        events.setdefault(line.get("event"), line.get("ts", 0))
+    lifecycle = {name: Histogram(LIFECYCLE_BUCKETS_SECONDS) for name, _, _ in LIFECYCLE_INTERVALS}
+    for events in first_seen.values():
+        for name, start, end in LIFECYCLE_INTERVALS:
+            if start in events and end in events and events[end] >= events[start]:
+                lifecycle[name].add(events[end] - events[start])
+    return {"commands": commands, "spans": spans, "lifecycle": lifecycle}
+
+
+def prometheus_histogram(lines: list, metric: str, labels: str, histogram: Histogram) -> None:
+    cumulative = 0
+    sep = "," if labels else ""
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.total:.6f}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+
+
+def format_prometheus(metrics: dict) -> str:
+    lines = [
+        "# HELP tri_ops_command_seconds Wall time of one tri_ops command.",
+        "# TYPE tri_ops_command_seconds histogram",
+    ]
+    for name, histogram in sorted(metrics["commands"].items()):
+        prometheus_histogram(lines, "tri_ops_command_seconds", f'command="{name}"', histogram)
+    lines += [
+        "# HELP tri_ops_span_seconds_total Time spent inside tri_ops in scan/parse/fsync/rename.",
+        "# TYPE tri_ops_span_seconds_total counter",
+    ]
+    for (command, span_name), (_, seconds) in sorted(metrics["spans"].items()):
+        lines.append(f'tri_ops_span_seconds_total{{command="{command}",span="{span_name}"}} {seconds:.6f}')
+    lines += ["# TYPE tri_ops_span_calls_total counter"]
+    for (command, span_name), (count, _) in sorted(metrics["spans"].items()):
+        lines.append(f'tri_ops_span_calls_total{{command="{command}",span="{span_name}"}} {count}')
+    for name, start, end in LIFECYCLE_INTERVALS:
+        metric = f"tri_ops_{name}_seconds"
+        lines += [f"# HELP {metric} Seconds from {start} to {end} per request id.", f"# TYPE {metric} histogram"]
+        prometheus_histogram(lines, metric, "", metrics["lifecycle"][name])
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics_ndjson(metrics: dict) -> str:
+    def row(metric: str, labels: dict, histogram: Histogram) -> dict:
+        return {
+            "metric": metric,
+            "labels": labels,
+            "bounds": list(histogram.bounds),
+            "counts": histogram.counts,
+            "sum": round(histogram.total, 6),
+            "count": histogram.count,
+            "p50": histogram.quantile(0.5),
+            "p95": histogram.quantile(0.95),
+        }
+
+    rows = [row("command_seconds", {"command": name}, histogram) for name, histogram in sorted(metrics["commands"].items())]
+    rows += [
+        {"metric": "span_seconds", "labels": {"command": command, "span": span_name}, "calls": count, "sum": round(seconds, 6)}
+        for (command, span_name), (count, seconds) in sorted(metrics["spans"].items())
+    ]
+    rows += [row(f"{name}_seconds", {}, metrics["lifecycle"][name]) for name, _, _ in LIFECYCLE_INTERVALS]
+    return "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in rows)
+
+
+def cmd_metrics(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    metrics_dir = state_dir / "ops" / "metrics"
+    since = time.time() - args.window_hours * 3600 if args.window_hours else 0.0
+    metrics = aggregate_metrics(metrics_dir, since)
+    if args.format == "prom":
+        text = format_prometheus(metrics)
+        default_name = "tri_ops.prom"
+    else:
+        text = format_metrics_ndjson(metrics)
+        default_name = "summary.ndjson"
+    if args.out == "-":
+        sys.stdout.write(text)
+        return 0
+    target = Path(args.out) if args.out else metrics_dir / default_name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Same temp + rename rule as every other ops file, so a textfile collector never reads a torn export.
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, target)
+    sys.stdout.write(str(target) + "\n")
+    return 0
+
+
+STATUS_VERSION = 1
+STATUS_DIRS = ("heartbeats", "requests", "claims", "results", "locks")
+# Three missed beats at the runners' default 45 s heartbeat.
+HEARTBEAT_STALE_SECONDS = 135
+PRIORITY_TIERS = (("tier0", 100), ("tier1", 80), ("tier2", 60), ("high", 50), ("normal", 10), ("task", 5), ("low", None))
+STATUS_CACHE: dict = {}
+
+
+def priority_tier(priority: int) -> str:
+    for name, floor in PRIORITY_TIERS:
+        if floor is None or priority >= floor:
+            return name
+    return "low"
+
+
+def status_signature(ops_dir: Path) -> dict:
+    return {sub: dir_mtime_ns(ops_dir / sub) for sub in STATUS_DIRS}
+
+
+def seconds_until(value: Optional[str], now: datetime) -> Optional[float]:
+    moment = parse_utc(value)
+    if moment is None:
+        return None
+    return round((moment - now).total_seconds(), 1)
+
+
+def build_status_snapshot(ops_dir: Path, signature: dict) -> dict:
+    # Everything here is time-independent; ages and expiry are derived when the snapshot is read.
+    tiers = {}
+    index = RequestIndex.open(ops_dir) if signature.get("requests") is not None else None
+    entries = index.entries if index is not None else {}
+    for req_id, entry in entries.items():
+        if entry.get("resolved"):
+            continue
+        tier = tiers.setdefault(priority_tier(entry.get("priority", 0)), {"unresolved": 0, "oldest_utc": None})
+        tier["unresolved"] += 1
+        utc = entry.get("utc") or None
+        if utc and (tier["oldest_utc"] is None or utc < tier["oldest_utc"]):
+            tier["oldest_utc"] = utc
+
+    claims = []
+    for claim_file in sorted((ops_dir / "claims").glob("*.json")):
+        claim = read_lease(claim_file)
+        if not claim:
+            continue
+        entry = entries.get(claim_file.stem)
+        claims.append({
+            "id": claim_file.stem,
+            "claimed_by": claim.get("claimed_by"),
+            "utc": claim.get("utc"),
+            "lease_expires_utc": claim.get("lease_expires_utc"),
+            "tier": priority_tier(entry.get("priority", 0)) if entry and not entry.get("resolved") else None,
+        })
+
+    heartbeats = {}
+    for beat_file in sorted((ops_dir / "heartbeats").glob("*.json")):
+        beat = read_json(beat_file)
+        if beat:
+            heartbeats[beat.get("agent") or beat_file.stem] = {
+                key: beat.get(key) for key in ("host", "pid", "cycle", "phase", "currentTask", "utc", "version")
+            }
+
+    results = {"count": 0, "latest": None}
+    latest = None
+    try:
+        with span("scan"), os.scandir(ops_dir / "results") as scan:
+            for item in scan:
+                if item.name.endswith(".json") and not item.name.startswith("."):
+                    results["count"] += 1
+                    mtime_ns = item.stat().st_mtime_ns
+                    if latest is None or mtime_ns > latest[0]:
+                        latest = (mtime_ns, item.path)
+    except FileNotFoundError:
+        pass
+    if latest is not None:
+        record = read_json(Path(latest[1])) or {}
+        results["latest"] = {key: record.get(key) for key in ("id", "status", "utc", "build_commit")}
+
+    return {
+        "version": STATUS_VERSION,
+        "utc": utc_iso(),
+        "signature": signature,
+        "tiers": tiers,
+        "claims": claims,
+        "heartbeats": heartbeats,
+        "lock": read_lease(ops_dir / "locks" / "build.lock"),
+        "results": results,
+    }
+
+
+def load_status_snapshot(ops_dir: Path, refresh: bool = False) -> dict:
+    signature = status_signature(ops_dir)
+    snapshot_path = ops_dir / "index" / "status.snapshot.json"
+    snapshot = None if refresh else STATUS_CACHE.get(ops_dir)
+    if snapshot is None or snapshot.get("signature") != signature:
+        snapshot = None if refresh else read_json(snapshot_path)
+    if not snapshot or snapshot.get("version") != STATUS_VERSION or snapshot.get("signature") != signature:
+        snapshot = build_status_snapshot(ops_dir, signature)
+        # Written under the index lock so it never races a compaction; if the lock is busy the
+        # fresh snapshot is only used in memory and the next call rebuilds it.
+        lock_path = ops_dir / "index" / ".compact.lock"
+        if (ops_dir / "index").is_dir() and try_lock_file(lock_path, INDEX_LOCK_STALE_SECONDS):
+            try:
+                atomic_write_json(snapshot_path, snapshot, kind="index")
+            finally:
+                unlink_quiet(lock_path)
+    # A resident `serve` keeps the last snapshot in memory and skips even the file read.
+    STATUS_CACHE[ops_dir] = snapshot
+    return snapshot
+
+
+def status_view(snapshot: dict, now: datetime, heartbeat_stale_seconds: float) -> dict:
+    queue = {name: {"queued": tier["unresolved"], "claimed": 0, "oldest_utc": tier["oldest_utc"]}
+             for name, tier in snapshot["tiers"].items()}
+    claims = []
+    for claim in snapshot["claims"]:
+        expires_in = seconds_until(claim.get("lease_expires_utc"), now)
+        live = expires_in is not None and expires_in > 0
+        started = seconds_until(claim.get("utc"), now)
+        tier = queue.get(claim.get("tier"))
+        if live and tier is not None:
+            tier["queued"] -= 1
+            tier["claimed"] += 1
+        claims.append({
+            "id": claim["id"],
+            "claimed_by": claim.get("claimed_by"),
+            "age_seconds": max(0.0, -started) if started is not None else None,
+            "lease_expires_utc": claim.get("lease_expires_utc"),
+            "expires_in_seconds": expires_in,
+            "stale": not live,
+        })
+    heartbeats = {}
+    for agent, beat in snapshot["heartbeats"].items():
+        since = seconds_until(beat.get("utc"), now)
+        age = max(0.0, -since) if since is not None else None
+        heartbeats[agent] = dict(beat, age_seconds=age, stale=age is None or age > heartbeat_stale_seconds)
+    lock = snapshot.get("lock")
+    if lock:
+        expires_in = seconds_until(lock.get("lease_expires_utc"), now)
+        lock = {
+            "owner": lock.get("owner"),
+            "request_id": lock.get("request_id"),
+            "utc": lock.get("utc"),
+            "lease_expires_utc": lock.get("lease_expires_utc"),
+            "expires_in_seconds": expires_in,
+            "held": expires_in is not None and expires_in > 0,
+        }
+    order = {name: rank for rank, (name, _) in enumerate(PRIORITY_TIERS)}
+    return {
+        "utc": utc_iso(now),
+        "snapshot_utc": snapshot["utc"],
+        "queue": {name: queue[name] for name in sorted(queue, key=order.get)},
+        "queued": sum(tier["queued"] for tier in queue.values()),
+        "claims": claims,
+        "heartbeats": heartbeats,
+        "lock": lock,
+        "results": snapshot["results"],
+    }
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    ops_dir = state_dir / "ops"
+    view = status_view(load_status_snapshot(ops_dir, args.refresh), utc_now(), args.heartbeat_stale_seconds)
+    if args.json:
+        sys.stdout.write(json.dumps(view, separators=(",", ":")) + "\n")
+        return 0
+    lines = [f"queue: {view['queued']} queued"]
+    for name, tier in view["queue"].items():
+        lines.append(f"  {name:<7} queued={tier['queued']} claimed={tier['claimed']} oldest={tier['oldest_utc'] or '-'}")
+    for claim in view["claims"]:
+        state = "STALE" if claim["stale"] else f"expires in {claim['expires_in_seconds']}s"
+        lines.append(f"claim {claim['id']} by {claim['claimed_by']} age={claim['age_seconds']}s {state}")
+    for agent, beat in sorted(view["heartbeats"].items()):
+        lines.append(f"heartbeat {agent}: {'STALE' if beat['stale'] else 'alive'} age={beat['age_seconds']}s phase={beat.get('phase')}")
+    lock = view["lock"]
+    if lock and lock["held"]:
+        lines.append(f"build.lock: {lock['owner']} request={lock['request_id']} expires in {lock['expires_in_seconds']}s")
+    else:
+        lines.append("build.lock: free")
+    latest = view["results"]["latest"]
+    lines.append(f"results: {view['results']['count']}" + (f" (latest {latest['id']} {latest['status']})" if latest else ""))
+    sys.stdout.write("\n".join(lines) + "\n")
+    return 0
+
+
+SEGMENT_KINDS = {
+    "results": "results",
+    "requests": "archive/requests",
+    "claims": "archive/claims",
+}
+SEGMENT_BLOCK_RECORDS = 64
+SEGMENT_LOCK_STALE_SECONDS = 3600
+# {shard path: ((mtime_ns, size), {id: [location, ...]})}; a resident `serve` reuses parsed shards.
+SEGMENT_INDEX_CACHE: dict = {}
+
+
+def segments_dir(ops_dir: Path, kind: str) -> Path:
+    return ops_dir / "archive" / "segments" / kind
+
+
+def segment_index_path(directory: Path, record_id: str) -> Path:
+    import zlib
+
+    # 256 shards keyed by a hash of the id, so a lookup reads about 1/256 of the index however
+    # long the archive gets. crc32 rather than the id's own prefix: ids are not always uuids.
+    return directory / "index" / f"{zlib.crc32(record_id.encode('utf-8')) & 0xFF:02x}.ndjson"
+
+
+def append_segment_index(directory: Path, index: list) -> None:
+    shards: dict = {}
+    for location in index:
+        shards.setdefault(segment_index_path(directory, location["id"]), []).append(location)
+    if shards:
+        (directory / "index").mkdir(exist_ok=True)
+    for path, lines in shards.items():
+        append_lines(path, lines)
+
+
+def migrate_segment_index(directory: Path) -> None:
+    # Older compactions wrote one index.ndjson for the whole kind; split it into shards once.
+    legacy = directory / "index.ndjson"
+    try:
+        with open(legacy, "r", encoding="utf-8") as handle:
+            lines = handle.readlines()
+    except FileNotFoundError:
+        return
+    index = []
+    for line in lines:
+        try:
+            index.append(json.loads(line))
+        except ValueError:
+            continue
+    # A crash before the unlink leaves duplicate locations, which lookups ignore.
+    append_segment_index(directory, index)
+    unlink_quiet(legacy)
+
+
+def load_segment_index(path: Path) -> dict:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        SEGMENT_INDEX_CACHE.pop(path, None)
+        return {}
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = SEGMENT_INDEX_CACHE.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    by_id: dict = {}
+    with span("parse"), open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                location = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(location, dict) and "id" in location:
+                by_id.setdefault(location["id"], []).append(location)
+    SEGMENT_INDEX_CACHE[path] = (stamp, by_id)
+    return by_id
+
+
+def aged_record_files(directory: Path, cutoff: float, limit: int) -> list:
+    aged = []
+    try:
+        with span("scan"), os.scandir(directory) as scan:
+            for item in scan:
+                if not item.name.endswith(".json") or item.name.startswith(".") or not item.is_file():
+                    continue
+                stat = item.stat()
+                if stat.st_mtime < cutoff:
+                    aged.append((item.name, stat.st_size, stat.st_mtime_ns))
+    except FileNotFoundError:
+        return []
+    aged.sort(key=lambda entry: (entry[2], entry[0]))
+    return aged[:limit]
+
+
+def write_segment(ops_dir: Path, kind: str, entries: list) -> tuple:
+    import gzip
+
+    # A segment is a run of gzip members, one per block of records, so a lookup
+    # decompresses only the block holding the id.
+    directory = segments_dir(ops_dir, kind)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}.seg"
+    tmp_path = directory / f".{name}.tmp"
+    index = []
+    offset = 0
+    with open(tmp_path, "wb") as handle:
+        for start in range(0, len(entries), SEGMENT_BLOCK_RECORDS):
+            block = entries[start:start + SEGMENT_BLOCK_RECORDS]
+            payload = "".join(json.dumps(entry, ensure_ascii=True, separators=(",", ":")) + "\n" for entry in block)
+            member = gzip.compress(payload.encode("utf-8"), mtime=0)
+            handle.write(member)
+            for entry in block:
+                index.append({"id": entry["id"], "segment": name, "offset": offset, "length": len(member), "utc": entry["utc"]})
+            offset += len(member)
+        handle.flush()
+        if DURABILITY.get("result", "full") != "none":
+            os.fsync(handle.fileno())
+    os.replace(tmp_path, directory / name)
+    if DURABILITY.get("result", "full") == "full":
+        fsync_dir(directory)
+    return name, offset, index
+
+
+def compact_kind(ops_dir: Path, kind: str, cutoff: float, limit: int, segment_records: int) -> dict:
+    source_dir = ops_dir / SEGMENT_KINDS[kind]
+    migrate_segment_index(segments_dir(ops_dir, kind))
+    stats = {"records": 0, "segments": 0, "bytes_in": 0, "bytes_out": 0, "skipped_changed": 0}
+    pending = aged_record_files(source_dir, cutoff, limit)
+    for start in range(0, len(pending), segment_records):
+        batch = pending[start:start + segment_records]
+        entries = []
+        sources = []
+        for name, size, mtime_ns in batch:
+            path = source_dir / name
+            record = read_json(path)
+            if record is None:
+                continue
+            record_id = record.get("id") or Path(name).stem
+            entries.append({
+                "id": record_id,
+                "name": name,
+                "utc": record.get("utc") or utc_iso(datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc)),
+                "record": record,
+            })
+            sources.append((path, size, mtime_ns))
+        if not entries:
+            continue
+        _, written, index = write_segment(ops_dir, kind, entries)
+        append_segment_index(segments_dir(ops_dir, kind), index)
+        stats["segments"] += 1
+        stats["bytes_out"] += written
+        for path, size, mtime_ns in sources:
+            # Only drop a source that still matches what was archived; a rewrite since then stays live.
+            try:
+                current = path.stat()
+            except FileNotFoundError:
+                continue
+            if current.st_size != size or current.st_mtime_ns != mtime_ns:
+                stats["skipped_changed"] += 1
+                continue
+            unlink_quiet(path)
+            stats["records"] += 1
+            stats["bytes_in"] += size
+    return stats
+
+
+def segment_locations(ops_dir: Path, kind: str, record_id: str) -> list:
+    directory = segments_dir(ops_dir, kind)
+    locations = []
+    seen = set()
+    # The legacy index.ndjson only exists until the next compact splits it.
+    for path in (directory / "index.ndjson", segment_index_path(directory, record_id)):
+        for location in load_segment_index(path).get(record_id, ()):
+            key = (location.get("segment"), location.get("offset"))
+            if key not in seen:
+                seen.add(key)
+                locations.append(location)
+    return locations
+
+
+def lookup_segments(ops_dir: Path, kind: str, record_id: str) -> list:
+    directory = segments_dir(ops_dir, kind)
+    locations = segment_locations(ops_dir, kind, record_id)
+    if not locations:
+        return []
+    import gzip
+
+    records = []
+    for location in locations:
+        try:
+            with open(directory / location["segment"], "rb") as handle:
+                handle.seek(location["offset"])
+                block = gzip.decompress(handle.read(location["length"]))
+        except (OSError, EOFError, KeyError):
+            continue
+        for line in block.decode("utf-8").splitlines():
+            entry = json.loads(line)
+            if entry.get("id") == record_id:
+                records.append(entry["record"])
+    return records
+
+
+def prune_inbox_archive(state_dir: Path, keep: int, max_age_days: float) -> int:
+    archive_dir = state_dir / "builds" / "inbox_archive"
+    try:
+        folders = sorted((item for item in archive_dir.iterdir() if item.is_dir()),
+                         key=lambda item: item.stat().st_mtime, reverse=True)
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for folder in folders[keep:]:
+        if folder.stat().st_mtime < cutoff:
+            rmtree_writable(folder)
+            removed += 1
+    return removed
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    ops_dir = ensure_ops_dirs(state_dir)
+    lock_dir = ops_dir / "archive" / "segments"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    lock_path = lock_dir / ".compact.lock"
+    # Independent of build.lock: compaction only touches aged records, so builds keep running.
+    if not try_lock_file(lock_path, SEGMENT_LOCK_STALE_SECONDS):
+        sys.stderr.write("compact already running\n")
+        return 1
+    started = time.perf_counter()
+    summary = {}
+    try:
+        cutoff = time.time() - args.days * 86400
+        for kind in args.kind or list(SEGMENT_KINDS):
+            summary[kind] = compact_kind(ops_dir, kind, cutoff, args.max_files, args.segment_records)
+        if not args.kind or args.inbox_keep is not None:
+            keep = args.inbox_keep if args.inbox_keep is not None else 10
+            summary["inbox_archive_removed"] = prune_inbox_archive(state_dir, keep, args.inbox_days)
+    finally:
+        unlink_quiet(lock_path)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    if args.json:
+        sys.stdout.write(json.dumps(summary, separators=(",", ":")) + "\n")
+    return 0
+
+
+def cmd_get_result(args: argparse.Namespace) -> int:
+    state_dir = get_state_dir(args)
+    ops_dir = state_dir / "ops"
+    live = read_json(ops_dir / "results" / f"{args.id}.json")
+    history = lookup_segments(ops_dir, "results", args.id)
+    if live is not None:
+        history.append(live)
+    if not history:
+        return 2
+    for record in history if args.all else history[-1:]:
+        sys.stdout.write(json.dumps(record, separators=(",", ":")) + "\n")
+    return 0
+
+
+PROJECT_EXECUTABLES = {
+    "space4x": "Space4X_Headless.x86_64",
+    "godgame": "Godgame_Headless.x86_64",
+}
+CAS_HASH_CHUNK = 1024 * 1024
+FICLONE = 0x40049409
+
+
+def hash_file(path: Path) -> str:
+    import hashlib
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CAS_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reflink_file(source: Path, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        unlink_quiet(target)
+        return False
+
+
+def clone_file(source: Path, target: Path, allow_hardlink: bool = True) -> str:
+    import shutil
+
+    # Cheapest first: hardlink (same filesystem), reflink (CoW filesystems), then a plain copy.
+    if allow_hardlink:
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError:
+            pass
+    if reflink_file(source, target):
+        return "reflink"
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+def cas_object_path(cas_dir: Path, digest: str, executable: bool) -> Path:
+    # The exec bit is part of the object identity because hardlinked copies share one inode mode.
+    return cas_dir / "objects" / digest[:2] / (digest + (".x" if executable else ""))
+
+
+def cas_object_mode(executable: bool) -> int:
+    # Objects are read-only: published builds are hardlinks to them, so a write through any
+    # published copy would change the object and every other build that links it.
+    return 0o555 if executable else 0o444
+
+
+def cas_object_intact(target: Path, digest: str, size: int) -> bool:
+    try:
+        stat = target.stat()
+    except FileNotFoundError:
+        return False
+    if stat.st_size != size:
+        return False
+    if stat.st_mode & 0o222:
+        # Made writable (by rmtree_writable, or by hand), so it may have been edited in place.
+        if hash_file(target) != digest:
+            return False
+        os.chmod(target, cas_object_mode(bool(stat.st_mode & 0o111)))
+    return True
+
+
+def cas_store(cas_dir: Path, source: Path, digest: str, executable: bool, size: int) -> Optional[str]:
+    target = cas_object_path(cas_dir, digest, executable)
+    if cas_object_intact(target, digest, size):
+        return None
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
+    try:
+        # Never hardlink from the inbox: the builder owns those inodes and may rewrite them.
+        method = clone_file(source, tmp_path, allow_hardlink=False)
+        if method == "copy" and DURABILITY.get("artifact", "data") != "none":
+            with open(tmp_path, "rb") as handle:
+                os.fsync(handle.fileno())
+        os.chmod(tmp_path, cas_object_mode(executable))
+        # Same name means same content, so a concurrent ingest replacing it is harmless. A damaged
+        # object is replaced by a new inode; builds already linked to it keep the damaged copy.
+        os.replace(tmp_path, target)
+    except OSError:
+        unlink_quiet(tmp_path)
+        raise
+    return method
+
+
+def scan_build_files(source: Path) -> list:
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs.sort()
+        for name in sorted(names):
+            path = Path(root) / name
+            if path.is_symlink() or not path.is_file():
+                continue
+            stat = path.stat()
+            files.append({
+                "path": path.relative_to(source).as_posix(),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "executable": bool(stat.st_mode & 0o111),
+            })
+    return files
+
+
+def load_previous_manifest(state_dir: Path, project: str) -> dict:
+    manifests = state_dir / "builds" / "cas" / "manifests" / project
+    current = read_json(state_dir / "builds" / f"current_{project}.json") or {}
+    manifest = read_json(manifests / f"{current.get('build_id')}.json") if current.get("build_id") else None
+    if manifest is None and manifests.is_dir():
+        candidates = sorted(manifests.glob("*.json"), key=lambda item: item.stat().st_mtime_ns)
+        manifest = read_json(candidates[-1]) if candidates else None
+    return {entry["path"]: entry for entry in (manifest or {}).get("files", [])}
+
+
+def path_for_ops(state_dir: Path, path: Path) -> str:
+    # Record WSL paths when ingest runs on Windows against the \\wsl$ view of the state dir.
+    state_dir_wsl = os.environ.get("TRI_STATE_DIR_WSL")
+    if state_dir_wsl:
+        try:
+            suffix = path.relative_to(state_dir).as_posix()
+        except ValueError:
+            return str(path)
+        return state_dir_wsl.rstrip("/") + "/" + suffix
+    return str(path)
+
+
+def cmd_ingest_build(args: argparse.Namespace) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    state_dir = get_state_dir(args)
+    project = args.project.lower()
+    source = Path(args.source)
+    exe_name = args.executable or PROJECT_EXECUTABLES.get(project)
+    if not source.is_dir():
+        sys.stderr.write(f"source dir not found: {source}\n")
+        return 2
+    if not exe_name:
+        sys.stderr.write(f"unknown project '{project}' (pass --executable)\n")
+        return 2
+    build_commit = args.build_commit or "unknown"
+    build_id = args.build_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{build_commit}"
+    builds_dir = state_dir / "builds"
+    cas_dir = builds_dir / "cas"
+    publish_dir = builds_dir / project / build_id
+    if publish_dir.exists():
+        sys.stderr.write(f"build already published: {publish_dir}\n")
+        return 2
+
+    started = time.perf_counter()
+    files = scan_build_files(source)
+    if not any(entry["path"] == exe_name for entry in files):
+        sys.stderr.write(f"executable missing from source: {exe_name}\n")
+        return 2
+
+    # Unchanged files (same path, size and mtime as the previous ingest) reuse their hash without a read.
+    previous = {} if args.rehash else load_previous_manifest(state_dir, project)
+    to_hash = []
+    for entry in files:
+        known = previous.get(entry["path"])
+        if known and known.get("size") == entry["size"] and known.get("mtime_ns") == entry["mtime_ns"]:
+            entry["sha256"] = known["sha256"]
+        else:
+            to_hash.append(entry)
+    hash_started = time.perf_counter()
+    workers = args.jobs or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entry, digest in zip(to_hash, pool.map(lambda item: hash_file(source / item["path"]), to_hash)):
+            entry["sha256"] = digest
+    hash_seconds = time.perf_counter() - hash_started
+
+    stored_bytes = 0
+    methods = {}
+    for entry in files:
+        method = cas_store(cas_dir, source / entry["path"], entry["sha256"], entry["executable"], entry["size"])
+        if method is not None:
+            stored_bytes += entry["size"]
+            methods[method] = methods.get(method, 0) + 1
+
+    staging = publish_dir.with_name(f".{build_id}.{os.urandom(4).hex()}.tmp")
+    try:
+        for entry in files:
+            target = staging / entry["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            method = clone_file(cas_object_path(cas_dir, entry["sha256"], entry["executable"]), target)
+            methods["publish_" + method] = methods.get("publish_" + method, 0) + 1
+        os.rename(staging, publish_dir)
+    except OSError:
+        rmtree_writable(staging)
+        raise
+    if DURABILITY.get("artifact", "data") == "full":
+        fsync_dir(publish_dir.parent)
+
+    manifest = {
+        "project": project,
+        "build_id": build_id,
+        "build_commit": build_commit,
+        "request_id": args.request_id,
+        "utc": utc_iso(),
+        "files": files,
+    }
+    atomic_write_json(cas_dir / "manifests" / project / f"{build_id}.json", manifest, kind="artifact")
+
+    published_path = path_for_ops(state_dir, publish_dir)
+    executable_path = path_for_ops(state_dir, publish_dir / exe_name)
+    if not args.no_current:
+        cmd_write_current(argparse.Namespace(
+            state_dir=args.state_dir,
+            project=project,
+            path=published_path,
+            executable=executable_path,
+            build_commit=build_commit,
+            build_id=build_id,
+            request_id=args.request_id,
+            notes=None,
+        ))
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(entry["size"] for entry in files)
+    hashed_bytes = sum(entry["size"] for entry in to_hash)
+    mb = 1024 * 1024
+    summary = {
+        "project": project,
+        "build_id": build_id,
+        "path": published_path,
+        "executable": executable_path,
+        "files": len(files),
+        "bytes": total_bytes,
+        "hashed_files": len(to_hash),
+        "hashed_bytes": hashed_bytes,
+        "stored_bytes": stored_bytes,
+        "bytes_saved": total_bytes - stored_bytes,
+        "methods": methods,
+        "seconds": round(elapsed, 3),
+        "hash_mb_per_sec": round(hashed_bytes / mb / hash_seconds, 1) if hash_seconds > 0 else None,
+        "ingest_mb_per_sec": round(total_bytes / mb / elapsed, 1) if elapsed > 0 else None,
+    }
+    sys.stdout.write(json.dumps(summary, separators=(",", ":")) + "\n")
     return 0
 
 
-def build_parser() -> argparse.ArgumentParser:
+WATCH_TOPICS = ("requests", "results", "ready")
+POLLING_FS_TYPES = {"9p", "drvfs", "cifs", "smb3", "smbfs", "nfs", "nfs4", "fuse", "fuseblk", "v9fs"}
+
+
+def watch_topic_dirs(state_dir: Path) -> dict:
+    ops_dir = state_dir / "ops"
+    return {
+        "requests": ops_dir / "requests",
+        "results": ops_dir / "results",
+        "ready": state_dir / "builds" / "inbox",
+    }
+
+
+def topic_signature(topic: str, path: Path) -> tuple:
+    signature = [dir_mtime_ns(path)]
+    if topic == "ready":
+        try:
+            with os.scandir(path) as scan:
+                for item in scan:
+                    if item.is_dir():
+                        signature.append((item.name, dir_mtime_ns(Path(item.path))))
+        except FileNotFoundError:
+            pass
+        signature.sort(key=str)
+    return tuple(signature)
+
+
+def filesystem_type(path: Path) -> Optional[str]:
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8") as handle:
+            mounts = [line.split() for line in handle]
+    except OSError:
+        return None
+    target = str(path.resolve())
+    best, best_type = "", None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace("\\040", " ")
+        if (target == mount_point or target.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) >= len(best):
+            best, best_type = mount_point, fields[2]
+    return best_type
+
+
+class OpsWatcher:
+    # inotify (via ctypes) where the state dir lives on a local filesystem; mtime polling on
+    # 9P/drvfs mounts where inotify never fires for changes made from the Windows side.
+
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self, state_dir: Path, force_poll: bool = False):
+        self.state_dir = state_dir
+        self.dirs = watch_topic_dirs(state_dir)
+        self.generations = {topic: 0 for topic in WATCH_TOPICS}
+        self.signatures = {topic: topic_signature(topic, path) for topic, path in self.dirs.items()}
+        self.fd: Optional[int] = None
+        self.libc = None
+        self.watches: dict = {}
+        if not force_poll and sys.platform.startswith("linux") and filesystem_type(state_dir) not in POLLING_FS_TYPES:
+            self.start_inotify()
+
+    @property
+    def polling(self) -> bool:
+        return self.fd is None
+
+    def start_inotify(self) -> None:
+        import ctypes
+
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        self.libc = libc
+        self.fd = fd
+        for topic, path in self.dirs.items():
+            self.add_watch(topic, path)
+            if topic == "ready":
+                try:
+                    with os.scandir(path) as scan:
+                        for item in scan:
+                            if item.is_dir():
+                                self.add_watch(topic, Path(item.path))
+                except FileNotFoundError:
+                    pass
+
+    def add_watch(self, topic: str, path: Path) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(path)), self.WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = (topic, path)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def bump(self, topics) -> set:
+        for topic in topics:
+            self.generations[topic] += 1
+        return set(topics)
+
+    def read_events(self) -> set:
+        import struct
+
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _, name_len = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + name_len].rstrip(b"\0").decode("utf-8", "replace")
+            offset += 16 + name_len
+            watched = self.watches.get(wd)
+            if watched is None:
+                continue
+            topic, path = watched
+            if mask & (self.IN_DELETE_SELF | self.IN_IGNORED):
+                self.watches.pop(wd, None)
+                ENSURED_STATE_DIRS.discard(self.state_dir)
+                continue
+            if topic == "ready":
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO) and path == self.dirs["ready"]:
+                    self.add_watch(topic, path / name)
+                    if (path / name / "READY.json").exists():
+                        changed.add(topic)
+                elif name == "READY.json":
+                    changed.add(topic)
+                continue
+            if name.endswith(".json") and not name.startswith("."):
+                changed.add(topic)
+        return self.bump(changed)
+
+    def poll(self) -> set:
+        changed = set()
+        for topic, path in self.dirs.items():
+            signature = topic_signature(topic, path)
+            if signature != self.signatures[topic]:
+                self.signatures[topic] = signature
+                changed.add(topic)
+        return self.bump(changed)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def run_in_process(parser: argparse.ArgumentParser, argv: list) -> tuple:
+    import contextlib
+    import io
+
+    out = io.StringIO()
+    err = io.StringIO()
+    saved_durability = dict(DURABILITY)
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            args = parser.parse_args(argv)
+            configure_durability(args.durability)
+            if args.command in ("serve", "run_leased"):
+                sys.stderr.write(f"{args.command} cannot run inside serve\n")
+                rc = 2
+            else:
+                started = time.perf_counter()
+                rc = 1
+                try:
+                    rc = args.func(args)
+                finally:
+                    record_command(args, rc or 0, time.perf_counter() - started)
+        except SystemExit as exc:
+            rc = exc.code if isinstance(exc.code, int) else 2
+        except Exception as exc:
+            sys.stderr.write(f"{type(exc).__name__}: {exc}\n")
+            rc = 1
+        finally:
+            DURABILITY.update(saved_durability)
+    return rc or 0, out.getvalue(), err.getvalue()
+
+
+SERVE_IO_TIMEOUT_SECONDS = 5.0
+# Commands that can run for seconds (git merge-base probes, hashing, segment rewrites) are run
+# by a child tri_ops process so the serve loop keeps answering every other client meanwhile.
+SERVE_WORKER_COMMANDS = ("claim_next", "gc_stale_leases", "rebuild_index", "compact", "ingest_build")
+
+
+def serve_reply(conn: "socket.socket", rc: int, stdout: str) -> None:
+    try:
+        conn.settimeout(SERVE_IO_TIMEOUT_SECONDS)
+        conn.sendall(f"{rc}\n{stdout}".encode("utf-8"))
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+class RequestReader:
+    # One client's request, read without blocking from the serve loop's selector so a client
+    # that never half-closes only holds its own socket open until the deadline.
+
+    def __init__(self, conn: "socket.socket"):
+        conn.setblocking(False)
+        self.conn = conn
+        self.chunks: list = []
+        self.deadline = time.monotonic() + SERVE_IO_TIMEOUT_SECONDS
+
+    def fileno(self) -> int:
+        return self.conn.fileno()
+
+    def read(self) -> bool:
+        # True once the client has half-closed (the request is complete).
+        while True:
+            try:
+                chunk = self.conn.recv(65536)
+            except BlockingIOError:
+                return False
+            if not chunk:
+                return True
+            self.chunks.append(chunk)
+
+    def argv(self) -> Optional[list]:
+        # Request framing: argv items each terminated by NUL; the client half-closes when done.
+        data = b"".join(self.chunks)
+        if not data.endswith(b"\0"):
+            return None
+        return [item.decode("utf-8") for item in data[:-1].split(b"\0")]
+
+
+class ServeWorker:
+    # One offloaded command: a child tri_ops process whose stdout is read from the selector.
+
+    def __init__(self, conn: "socket.socket", argv: list, verbose: bool):
+        import subprocess
+
+        self.conn = conn
+        self.chunks: list = []
+        self.process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve())] + argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=None if verbose else subprocess.DEVNULL,
+        )
+        os.set_blocking(self.process.stdout.fileno(), False)
+
+    def fileno(self) -> int:
+        return self.process.stdout.fileno()
+
+    def read(self) -> bool:
+        # True once the child has closed its stdout (it is exiting).
+        while True:
+            try:
+                chunk = os.read(self.fileno(), 65536)
+            except BlockingIOError:
+                return False
+            if not chunk:
+                return True
+            self.chunks.append(chunk)
+
+    def finish(self) -> tuple:
+        # Blocks for whatever output is left; only called early when the daemon is stopping.
+        os.set_blocking(self.fileno(), True)
+        self.chunks.append(self.process.stdout.read())
+        self.process.stdout.close()
+        rc = self.process.wait()
+        return self.conn, rc if rc >= 0 else 128 - rc, b"".join(self.chunks).decode("utf-8", "replace")
+
+
+def default_socket_path(state_dir: Path) -> Path:
+    env_path = os.environ.get("TRI_OPS_SOCKET")
+    if env_path:
+        return Path(env_path)
+    return state_dir / "ops" / "tri_ops.sock"
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    global CACHE_OPS_DIRS
+    import contextlib
+    import selectors
+    import signal
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        sys.stderr.write("serve requires AF_UNIX sockets\n")
+        return 2
+    state_dir = get_state_dir(args)
+    CACHE_OPS_DIRS = True
+    ensure_ops_dirs(state_dir)
+    os.environ["TRI_STATE_DIR"] = str(state_dir)
+    sock_path = Path(args.socket) if args.socket else default_socket_path(state_dir)
+    if sock_path.exists():
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(sock_path))
+            sys.stderr.write(f"tri_ops serve already running on {sock_path}\n")
+            return 3
+        except OSError:
+            sock_path.unlink()
+        finally:
+            probe.close()
+
+    parser = build_parser()
+    watcher = OpsWatcher(state_dir, force_poll=args.poll)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(sock_path))
+    server.listen(64)
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, "server")
+    if not watcher.polling:
+        selector.register(watcher, selectors.EVENT_READ, "watcher")
+
+    def stop(*_):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    waiters = []
+    next_poll = time.monotonic()
+    sys.stderr.write(f"tri_ops serve: socket={sock_path} watch={'poll' if watcher.polling else 'inotify'}\n")
+
+    def wake(changed: set) -> None:
+        for waiter in list(waiters):
+            conn, topics, _ = waiter
+            hit = sorted(changed & topics)
+            if hit:
+                waiters.remove(waiter)
+                payload = {"topics": hit, "generations": {topic: watcher.generations[topic] for topic in hit}}
+                serve_reply(conn, 0, json.dumps(payload, separators=(",", ":")) + "\n")
+
+    def handle(reader: RequestReader) -> Optional[tuple]:
+        conn = reader.conn
+        try:
+            argv = reader.argv()
+        except UnicodeDecodeError:
+            argv = None
+        if not argv:
+            return conn, 2, ""
+        if argv[0] == "ping":
+            return conn, 0, "pong\n"
+        # Dispatch on the subcommand, not argv[0]: global options may come first.
+        command = argv_command(argv)
+        if command == "wait":
+            try:
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+                    wait_args = parser.parse_args(argv)
+            except SystemExit:
+                return conn, 2, ""
+            if get_state_dir(wait_args).resolve() != state_dir.resolve():
+                # The watcher only covers the served state dir; a blocking cmd_wait would stall the loop.
+                return conn, 2, ""
+            topics = set(wait_args.topic or WATCH_TOPICS)
+            stale = {
+                topic for topic in topics
+                if wait_args.since is not None and watcher.generations[topic] != wait_args.since
+            }
+            if stale:
+                payload = {"topics": sorted(stale), "generations": {t: watcher.generations[t] for t in stale}}
+                return conn, 0, json.dumps(payload, separators=(",", ":")) + "\n"
+            waiters.append((conn, topics, time.monotonic() + wait_args.timeout))
+            return None
+        if command in SERVE_WORKER_COMMANDS:
+            try:
+                worker = ServeWorker(conn, argv, args.verbose)
+            except OSError as exc:
+                sys.stderr.write(f"tri_ops serve: cannot start {command}: {exc}\n")
+                return conn, 1, ""
+            workers.append(worker)
+            selector.register(worker, selectors.EVENT_READ, "worker")
+            return None
+        rc, stdout, stderr = run_in_process(parser, argv)
+        if stderr and args.verbose:
+            sys.stderr.write(stderr)
+        return conn, rc, stdout
+
+    readers: dict = {}
+    workers: list = []
+
+    def pump(timeout: float) -> list:
+        # One selector round: accept new clients, read whichever have data, and return the
+        # readers whose request is complete. Nothing here blocks on a single client.
+        complete = []
+        for key, _ in selector.select(timeout):
+            if key.data == "server":
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except BlockingIOError:
+                        break
+                    reader = RequestReader(conn)
+                    readers[conn] = reader
+                    selector.register(reader, selectors.EVENT_READ, "client")
+            elif key.data == "watcher":
+                wake(watcher.read_events())
+            elif key.data == "worker":
+                worker = key.fileobj
+                if worker.read():
+                    selector.unregister(worker)
+                    workers.remove(worker)
+                    # The child synced its own writes, so its reply does not wait for the group commit.
+                    serve_reply(*worker.finish())
+            else:
+                reader = key.fileobj
+                try:
+                    done = reader.read()
+                except OSError:
+                    selector.unregister(reader)
+                    readers.pop(reader.conn, None)
+                    reader.conn.close()
+                    continue
+                if done:
+                    selector.unregister(reader)
+                    readers.pop(reader.conn, None)
+                    complete.append(reader)
+        return complete
+
+    def run_batch(complete: list) -> None:
+        # Group commit: handle every completed request (waiting up to the commit window for
+        # more), flush all their deferred fsyncs once, and only then acknowledge them.
+        pending = []
+        deadline = time.monotonic() + args.commit_window_ms / 1000.0
+        with group_commit():
+            while True:
+                for reader in complete:
+                    reply = handle(reader)
+                    if reply is not None:
+                        pending.append(reply)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                complete = pump(remaining)
+        for reply in pending:
+            serve_reply(*reply)
+
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = args.poll_interval if watcher.polling else 60.0
+            if watcher.polling:
+                timeout = max(0.0, next_poll - now)
+            if waiters:
+                timeout = min(timeout, max(0.0, min(deadline for _, _, deadline in waiters) - now))
+            if readers:
+                timeout = min(timeout, max(0.0, min(reader.deadline for reader in readers.values()) - now))
+            complete = pump(timeout)
+            if complete:
+                run_batch(complete)
+            now = time.monotonic()
+            if watcher.polling and now >= next_poll:
+                wake(watcher.poll())
+                next_poll = now + args.poll_interval
+            for waiter in [w for w in waiters if w[2] <= now]:
+                waiters.remove(waiter)
+                serve_reply(waiter[0], 1, "")
+            for reader in [r for r in readers.values() if r.deadline <= now]:
+                # Never half-closed: drop it without a reply
+                selector.unregister(reader)
+                del readers[reader.conn]
+                reader.conn.close()
+    finally:
+        for conn, _, _ in waiters:
+            serve_reply(conn, 1, "")
+        for worker in workers:
+            # Let offloaded commands finish: a claim or ingest cut short would leave work half done.
+            serve_reply(*worker.finish())
+        for reader in readers.values():
+            reader.conn.close()
+        selector.close()
+        server.close()
+        watcher.close()
+        try:
+            sock_path.unlink()
+        except FileNotFoundError:
+            pass
+    return 0
+
+
+def cmd_wait(args: argparse.Namespace) -> int:
+    # Standalone fallback for `wait` (the daemon answers it from inotify instead). Read-only: no
+    # ensure_ops_dirs; a missing directory has no mtime, so its creation counts as a change.
+    state_dir = get_state_dir(args)
+    dirs = watch_topic_dirs(state_dir)
+    topics = args.topic or list(WATCH_TOPICS)
+    baseline = {topic: topic_signature(topic, dirs[topic]) for topic in topics}
+    deadline = time.monotonic() + args.timeout
+    while True:
+        changed = [topic for topic in topics if topic_signature(topic, dirs[topic]) != baseline[topic]]
+        if changed:
+            sys.stdout.write(json.dumps({"topics": sorted(changed)}, separators=(",", ":")) + "\n")
+            return 0
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return 1
+        time.sleep(min(args.poll_interval, remaining))
+
+
+# Every subcommand build_parser() knows; main() builds only the one named on the command line.
+COMMANDS = (
+    "init",
+    "heartbeat",
+    "request_rebuild",
+    "claim_next",
+    "renew_claim",
+    "write_result",
+    "lock_build",
+    "renew_lock",
+    "unlock_build",
+    "lock_status",
+    "gc_stale_leases",
+    "run_leased",
+    "archive_request",
+    "rebuild_index",
+    "serve",
+    "wait",
+    "current_build",
+    "write_current",
+    "metrics",
+    "status",
+    "compact",
+    "get_result",
+    "ingest_build",
+)
+
+
+def argv_command(argv: list) -> Optional[str]:
+    # First positional token, skipping the global options (and their values) before it.
+    skip = False
+    for token in argv:
+        if skip:
+            skip = False
+        elif token in ("--state-dir", "--durability"):
+            skip = True
+        elif not token.startswith("-"):
+            return token if token in COMMANDS else None
+        elif not token.startswith(("--state-dir=", "--durability=")):
+            return None
+    return None
+
+
+def build_parser(only: Optional[str] = None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="tri_ops")
     parser.add_argument("--state-dir", help="Override TRI_STATE_DIR")
+    parser.add_argument("--durability", help="Per-record fsync policy, e.g. heartbeat=none,result=full (or TRI_OPS_DURABILITY)")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    init_cmd = subparsers.add_parser("init")
-    init_cmd.set_defaults(func=cmd_init)
-
-    heartbeat = subparsers.add_parser("heartbeat")
-    heartbeat.add_argument("--agent", required=True)
-    heartbeat.add_argument("--phase", required=True)
-    heartbeat.add_argument("--current-task", default="")
-    heartbeat.add_argument("--cycle", type=int, default=0)
-    heartbeat.add_argument("--version", default="1")
-    heartbeat.add_argument("--host")
-    heartbeat.set_defaults(func=cmd_heartbeat)
-
-    request = subparsers.add_parser("request_rebuild")
-    request.add_argument("--id")
-    request.add_argument("--type", default="rebuild")
-    request.add_argument("--project", action="append")
-    request.add_argument("--projects")
-    request.add_argument("--reason", default="")
-    request.add_argument("--requested-by", required=True)
-    request.add_argument("--priority", default="normal")
-    request.add_argument("--desired-build-commit")
-    request.add_argument("--notes")
-    request.set_defaults(func=cmd_request_rebuild)
-
-    claim_next = subparsers.add_parser("claim_next")
-    claim_next.add_argument("--agent", required=True)
-    claim_next.add_argument("--lease-seconds", type=int, default=900)
-    claim_next.add_argument("--json", action="store_true")
-    claim_next.set_defaults(func=cmd_claim_next)
-
-    renew_claim = subparsers.add_parser("renew_claim")
-    renew_claim.add_argument("--id", required=True)
-    renew_claim.add_argument("--agent", required=True)
-    renew_claim.add_argument("--lease-seconds", type=int, default=900)
-    renew_claim.add_argument("--force", action="store_true")
-    renew_claim.set_defaults(func=cmd_renew_claim)
-
-    write_result = subparsers.add_parser("write_result")
-    write_result.add_argument("--id", required=True)
-    write_result.add_argument("--status", required=True)
-    write_result.add_argument("--published-build-path", required=True)
-    write_result.add_argument("--build-commit", required=True)
-    write_result.add_argument("--log", action="append")
-    write_result.add_argument("--error")
-    write_result.set_defaults(func=cmd_write_result)
-
-    lock_build = subparsers.add_parser("lock_build")
-    lock_build.add_argument("--owner", required=True)
-    lock_build.add_argument("--request-id", required=True)
-    lock_build.add_argument("--lease-seconds", type=int, default=900)
-    lock_build.add_argument("--force", action="store_true")
-    lock_build.set_defaults(func=cmd_lock_build)
-
-    renew_lock = subparsers.add_parser("renew_lock")
-    renew_lock.add_argument("--owner", required=True)
-    renew_lock.add_argument("--request-id", required=True)
-    renew_lock.add_argument("--lease-seconds", type=int, default=900)
-    renew_lock.add_argument("--force", action="store_true")
-    renew_lock.set_defaults(func=cmd_renew_lock)
-
-    unlock_build = subparsers.add_parser("unlock_build")
-    unlock_build.add_argument("--owner", required=True)
-    unlock_build.add_argument("--request-id")
-    unlock_build.add_argument("--force", action="store_true")
-    unlock_build.set_defaults(func=cmd_unlock_build)
-
-    lock_status = subparsers.add_parser("lock_status")
-    lock_status.add_argument("--json", action="store_true")
-    lock_status.set_defaults(func=cmd_lock_status)
-
-    gc = subparsers.add_parser("gc_stale_leases")
-    gc.add_argument("--prune-claims", action="store_true")
-    gc.add_argument("--json", action="store_true")
-    gc.set_defaults(func=cmd_gc_stale_leases)
-
-    current_build = subparsers.add_parser("current_build")
-    current_build.add_argument("--project", required=True)
-    current_build.add_argument("--field")
-    current_build.set_defaults(func=cmd_current_build)
-
-    write_current = subparsers.add_parser("write_current")
-    write_current.add_argument("--project", required=True)
-    write_current.add_argument("--path", required=True)
-    write_current.add_argument("--executable", required=True)
-    write_current.add_argument("--build-commit", required=True)
-    write_current.add_argument("--build-id", required=True)
-    write_current.add_argument("--request-id", required=True)
-    write_current.add_argument("--notes")
-    write_current.set_defaults(func=cmd_write_current)
+    def wanted(name: str) -> bool:
+        # `only` builds just one subcommand: the per-invocation fast path (see main()).
+        return only is None or only == name
+
+    if wanted("init"):
+        init_cmd = subparsers.add_parser("init")
+        init_cmd.set_defaults(func=cmd_init)
+
+    if wanted("heartbeat"):
+        heartbeat = subparsers.add_parser("heartbeat")
+        heartbeat.add_argument("--agent", required=True)
+        heartbeat.add_argument("--phase", required=True)
+        heartbeat.add_argument("--current-task", default="")
+        heartbeat.add_argument("--cycle", type=int, default=0)
+        heartbeat.add_argument("--version", default="1")
+        heartbeat.add_argument("--host")
+        heartbeat.add_argument("--pid", type=int)
+        heartbeat.set_defaults(func=cmd_heartbeat)
+
+    if wanted("request_rebuild"):
+        request = subparsers.add_parser("request_rebuild")
+        request.add_argument("--id")
+        request.add_argument("--type", default="rebuild")
+        request.add_argument("--project", action="append")
+        request.add_argument("--projects")
+        request.add_argument("--reason", default="")
+        request.add_argument("--requested-by", required=True)
+        request.add_argument("--priority", default="normal")
+        request.add_argument("--desired-build-commit")
+        request.add_argument("--notes")
+        request.set_defaults(func=cmd_request_rebuild)
+
+    if wanted("claim_next"):
+        claim_next = subparsers.add_parser("claim_next")
+        claim_next.add_argument("--agent", required=True)
+        claim_next.add_argument("--lease-seconds", type=int, default=900)
+        claim_next.add_argument("--json", action="store_true")
+        claim_next.add_argument("--max", type=int, default=1, help="Claim up to N requests (one line each, NDJSON with --json)")
+        claim_next.add_argument("--project", action="append", help="Only claim requests touching this project (repeatable)")
+        claim_next.add_argument("--no-coalesce", action="store_true", help="Do not merge overlapping pending requests into the claim")
+        claim_next.add_argument("--repo", help="Git checkout used to check that a merged request's commit is an ancestor of the leader's (default: $TRI_REPO_DIR or cwd)")
+        claim_next.set_defaults(func=cmd_claim_next)
+
+    if wanted("renew_claim"):
+        renew_claim = subparsers.add_parser("renew_claim")
+        renew_claim.add_argument("--id")
+        renew_claim.add_argument("--ids", action="append", help="Comma-separated request ids (repeatable)")
+        renew_claim.add_argument("--all-mine", action="store_true", help="Renew every claim held by --agent")
+        renew_claim.add_argument("--agent", required=True)
+        renew_claim.add_argument("--lease-seconds", type=int, default=900)
+        renew_claim.add_argument("--force", action="store_true")
+        renew_claim.add_argument("--json", action="store_true")
+        renew_claim.set_defaults(func=cmd_renew_claim)
+
+    if wanted("write_result"):
+        write_result = subparsers.add_parser("write_result")
+        write_result.add_argument("--id", required=True)
+        write_result.add_argument("--status", required=True)
+        write_result.add_argument("--published-build-path", required=True)
+        write_result.add_argument("--build-commit", required=True)
+        write_result.add_argument("--log", action="append")
+        write_result.add_argument("--error")
+        write_result.set_defaults(func=cmd_write_result)
+
+    if wanted("lock_build"):
+        lock_build = subparsers.add_parser("lock_build")
+        lock_build.add_argument("--owner", required=True)
+        lock_build.add_argument("--request-id", required=True)
+        lock_build.add_argument("--lease-seconds", type=int, default=900)
+        lock_build.add_argument("--force", action="store_true")
+        lock_build.set_defaults(func=cmd_lock_build)
+
+    if wanted("renew_lock"):
+        renew_lock = subparsers.add_parser("renew_lock")
+        renew_lock.add_argument("--owner", required=True)
+        renew_lock.add_argument("--request-id", required=True)
+        renew_lock.add_argument("--lease-seconds", type=int, default=900)
+        renew_lock.add_argument("--force", action="store_true")
+        renew_lock.set_defaults(func=cmd_renew_lock)
+
+    if wanted("unlock_build"):
+        unlock_build = subparsers.add_parser("unlock_build")
+        unlock_build.add_argument("--owner", required=True)
+        unlock_build.add_argument("--request-id")
+        unlock_build.add_argument("--force", action="store_true")
+        unlock_build.set_defaults(func=cmd_unlock_build)
+
+    if wanted("lock_status"):
+        lock_status = subparsers.add_parser("lock_status")
+        lock_status.add_argument("--json", action="store_true")
+        lock_status.set_defaults(func=cmd_lock_status)
+
+    if wanted("gc_stale_leases"):
+        gc = subparsers.add_parser("gc_stale_leases")
+        gc.add_argument("--prune-claims", action="store_true")
+        gc.add_argument("--json", action="store_true")
+        gc.set_defaults(func=cmd_gc_stale_leases)
+
+    if wanted("run_leased"):
+        run_leased = subparsers.add_parser("run_leased", help="Run a command while holding the claim and build.lock")
+        run_leased.add_argument("--id", required=True, help="Claimed request id")
+        run_leased.add_argument("--agent", required=True, help="Claim owner")
+        run_leased.add_argument("--owner", help="build.lock owner (default: --agent)")
+        run_leased.add_argument("--lease-seconds", type=int, default=900)
+        run_leased.add_argument("--renew-seconds", type=float, default=RUN_LEASED_RENEW_SECONDS)
+        run_leased.add_argument("--jitter", type=float, default=0.2, help="Renewal interval is randomized by +/- this fraction")
+        run_leased.add_argument("--no-lock", action="store_true", help="Hold only the claim, not build.lock")
+        run_leased.add_argument("--lock-wait-seconds", type=float, default=0.0, help="Wait this long for build.lock (claim renewed meanwhile)")
+        run_leased.add_argument("--log", help="Also append the command's output to this file (listed in the result)")
+        run_leased.add_argument("--published-build-path", default="n/a")
+        run_leased.add_argument("--build-commit", default="unknown")
+        run_leased.add_argument("--archive", action="store_true", help="archive_request after write_result")
+        run_leased.add_argument("--json", action="store_true", help="Print a summary line after the command exits")
+        run_leased.add_argument("cmd", nargs=argparse.REMAINDER, help="-- command [args...]")
+        run_leased.set_defaults(func=cmd_run_leased)
+
+    if wanted("archive_request"):
+        archive_request = subparsers.add_parser("archive_request")
+        archive_request.add_argument("--id", required=True)
+        archive_request.set_defaults(func=cmd_archive_request)
+
+    if wanted("rebuild_index"):
+        rebuild_index = subparsers.add_parser("rebuild_index")
+        rebuild_index.add_argument("--json", action="store_true")
+        rebuild_index.set_defaults(func=cmd_rebuild_index)
+
+    if wanted("serve"):
+        serve = subparsers.add_parser("serve")
+        serve.add_argument("--socket", help="Unix socket path (default: $TRI_OPS_SOCKET or ops/tri_ops.sock)")
+        serve.add_argument("--poll", action="store_true", help="Force mtime polling instead of inotify")
+        serve.add_argument("--poll-interval", type=float, default=2.0)
+        serve.add_argument("--commit-window-ms", type=float, default=0.0, help="Wait this long for more clients before a group commit")
+        serve.add_argument("--verbose", action="store_true")
+        serve.set_defaults(func=cmd_serve)
+
+    if wanted("wait"):
+        wait = subparsers.add_parser("wait")
+        wait.add_argument("--topic", action="append", choices=WATCH_TOPICS)
+        wait.add_argument("--timeout", type=float, default=30.0)
+        wait.add_argument("--since", type=int, help="Return immediately if the topic generation differs (serve only)")
+        wait.add_argument("--poll-interval", type=float, default=1.0)
+        wait.set_defaults(func=cmd_wait)
+
+    if wanted("current_build"):
+        current_build = subparsers.add_parser("current_build")
+        current_build.add_argument("--project", required=True)
+        current_build.add_argument("--field")
+        current_build.set_defaults(func=cmd_current_build)
+
+    if wanted("write_current"):
+        write_current = subparsers.add_parser("write_current")
+        write_current.add_argument("--project", required=True)
+        write_current.add_argument("--path", required=True)
+        write_current.add_argument("--executable", required=True)
+        write_current.add_argument("--build-commit", required=True)
+        write_current.add_argument("--build-id", required=True)
+        write_current.add_argument("--request-id", required=True)
+        write_current.add_argument("--notes")
+        write_current.set_defaults(func=cmd_write_current)
+
+    if wanted("metrics"):
+        metrics = subparsers.add_parser("metrics", help="Export command/span/request-lifecycle histograms")
+        metrics.add_argument("--format", choices=("prom", "ndjson"), default="prom")
+        metrics.add_argument("--out", help="Output file (default ops/metrics/tri_ops.prom or summary.ndjson; - for stdout)")
+        metrics.add_argument("--window-hours", type=float, default=0.0, help="Only samples from the last N hours (0 = all retained)")
+        metrics.set_defaults(func=cmd_metrics)
+
+    if wanted("status"):
+        status = subparsers.add_parser("status", help="Queue, claims, heartbeats and build lock in one call")
+        status.add_argument("--json", action="store_true")
+        status.add_argument("--refresh", action="store_true", help="Ignore the cached snapshot and rescan")
+        status.add_argument("--heartbeat-stale-seconds", type=float, default=HEARTBEAT_STALE_SECONDS)
+        status.set_defaults(func=cmd_status)
+
+    if wanted("compact"):
+        compact = subparsers.add_parser("compact", help="Roll aged results/archive records into indexed segments")
+        compact.add_argument("--days", type=float, default=7.0, help="Only records older than this are compacted")
+        compact.add_argument("--kind", action="append", choices=list(SEGMENT_KINDS))
+        compact.add_argument("--max-files", type=int, default=5000, help="Per kind, per run (keeps each run short)")
+        compact.add_argument("--segment-records", type=int, default=1000)
+        compact.add_argument("--inbox-keep", type=int, help="Newest inbox_archive folders always kept (default 10)")
+        compact.add_argument("--inbox-days", type=float, default=14.0, help="Older inbox_archive folders beyond --inbox-keep are removed")
+        compact.add_argument("--json", action="store_true")
+        compact.set_defaults(func=cmd_compact)
+
+    if wanted("get_result"):
+        get_result = subparsers.add_parser("get_result", help="Result by id, from ops/results or compacted segments")
+        get_result.add_argument("--id", required=True)
+        get_result.add_argument("--all", action="store_true", help="Every recorded result for the id, oldest first")
+        get_result.set_defaults(func=cmd_get_result)
+
+    if wanted("ingest_build"):
+        ingest_build = subparsers.add_parser("ingest_build", help="Publish a build through the content-addressed store")
+        ingest_build.add_argument("--project", required=True)
+        ingest_build.add_argument("--source", required=True, help="Build folder, e.g. builds/inbox/<request_id>/<project>")
+        ingest_build.add_argument("--build-commit")
+        ingest_build.add_argument("--build-id", help="Default: <yyyyMMdd_HHmmss>_<build_commit>")
+        ingest_build.add_argument("--request-id", required=True)
+        ingest_build.add_argument("--executable", help="Executable file name (default: per project)")
+        ingest_build.add_argument("--jobs", type=int, default=0, help="Hashing threads (default: min(8, CPUs))")
+        ingest_build.add_argument("--rehash", action="store_true", help="Hash every file, ignoring the previous manifest")
+        ingest_build.add_argument("--no-current", action="store_true", help="Publish without updating current_<project>.json")
+        ingest_build.set_defaults(func=cmd_ingest_build)
 
     return parser
 
 
 def main() -> int:
-    parser = build_parser()
+    parser = build_parser(argv_command(sys.argv[1:]))
     args = parser.parse_args()
-    return args.func(args)
+    try:
+        configure_durability(os.environ.get("TRI_OPS_DURABILITY"))
+        configure_durability(args.durability)
+    except ValueError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 2
+    started = time.perf_counter()
+    rc = 1
+    try:
+        rc = args.func(args)
+    finally:
+        record_command(args, rc or 0, time.perf_counter() - started)
+    return rc
 
 
 if __name__ == "__main__":
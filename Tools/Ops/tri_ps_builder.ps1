@@ -98,6 +98,10 @@ function Archive-File([string]$SourcePath, [string]$ArchiveDir) {
 }
 
 function Archive-RequestFiles([string]$RequestId) {
+    $archiveResult = Invoke-TriOps @("archive_request", "--id", $RequestId)
+    if ($archiveResult.ExitCode -eq 0) {
+        return
+    }
     $opsDir = Join-Path $env:TRI_STATE_DIR "ops"
     $requestsDir = Join-Path $opsDir "requests"
     $claimsDir = Join-Path $opsDir "claims"
@@ -117,6 +121,8 @@ $triOpsPath = Join-Path $PSScriptRoot "tri_ops.py"
 if (-not (Test-Path $triOpsPath)) {
     throw "tri_ops not found: $triOpsPath"
 }
+# `python -m tri_ops` loads the cached bytecode; running tri_ops.py as a script recompiles it on every call.
+$env:PYTHONPATH = if ($env:PYTHONPATH) { "$PSScriptRoot;$env:PYTHONPATH" } else { $PSScriptRoot }
 
 $builderMode = if ($env:TRI_BUILDER_MODE) { $env:TRI_BUILDER_MODE } else { "orchestrator" }
 $builderMode = $builderMode.ToLowerInvariant()
@@ -132,7 +138,7 @@ $leaseSeconds = if ($env:TRI_OPS_LEASE_SECONDS) { [int]$env:TRI_OPS_LEASE_SECOND
 
 function Invoke-TriOps {
     param([string[]]$TriOpsArgs)
-    $output = & $pythonCmd.Exe @($pythonCmd.Args + @($triOpsPath) + $TriOpsArgs) 2>&1 | Out-String
+    $output = & $pythonCmd.Exe @($pythonCmd.Args + @("-m", "tri_ops") + $TriOpsArgs) 2>&1 | Out-String
     return [pscustomobject]@{
         ExitCode = $LASTEXITCODE
         Output = $output.Trim()
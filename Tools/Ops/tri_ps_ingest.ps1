@@ -32,6 +32,8 @@ $triOpsPath = Join-Path $PSScriptRoot "tri_ops.py"
 if (-not (Test-Path $triOpsPath)) {
     throw "tri_ops not found: $triOpsPath"
 }
+# `python -m tri_ops` loads the cached bytecode; running tri_ops.py as a script recompiles it on every call.
+$env:PYTHONPATH = if ($env:PYTHONPATH) { "$PSScriptRoot;$env:PYTHONPATH" } else { $PSScriptRoot }
 
 $pythonCmd = Get-PythonCommand
 $pollSeconds = if ($env:TRI_INGEST_POLL_SECONDS) { [int]$env:TRI_INGEST_POLL_SECONDS } else { 30 }
@@ -39,7 +41,7 @@ $leaseSeconds = if ($env:TRI_OPS_LEASE_SECONDS) { [int]$env:TRI_OPS_LEASE_SECOND
 
 function Invoke-TriOps {
     param([string[]]$TriOpsArgs)
-    $output = & $pythonCmd.Exe @($pythonCmd.Args + @($triOpsPath) + $TriOpsArgs) 2>&1 | Out-String
+    $output = & $pythonCmd.Exe @($pythonCmd.Args + @("-m", "tri_ops") + $TriOpsArgs) 2>&1 | Out-String
     return [pscustomobject]@{
         ExitCode = $LASTEXITCODE
         Output = $output.Trim()
@@ -90,6 +92,23 @@ function Publish-Project([string]$InboxRoot, [string]$Project, [string]$BuildCom
     if (-not (Test-Path $sourceDir)) {
         throw "missing inbox project dir: $sourceDir"
     }
+    $ingest = Invoke-TriOps @(
+        "ingest_build", "--project", $info.Name,
+        "--source", $sourceDir,
+        "--build-commit", $BuildCommit,
+        "--build-id", $buildId,
+        "--request-id", $RequestId,
+        "--executable", $info.Exe
+    )
+    if ($ingest.ExitCode -eq 0) {
+        $summary = ($ingest.Output -split "`n" | Select-Object -Last 1) | ConvertFrom-Json
+        return @{
+            PublishDir = $summary.path
+            Executable = $summary.executable
+            BuildId = $buildId
+        }
+    }
+
     $publishRoot = Join-Path $env:TRI_STATE_DIR ("builds\" + $info.Name)
     $publishDir = Join-Path $publishRoot $buildId
     New-Item -ItemType Directory -Path $publishDir -Force | Out-Null
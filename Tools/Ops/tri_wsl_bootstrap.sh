@@ -50,4 +50,10 @@ fi
 mkdir -p "$TRI_RUNS_DIR"
 "$PYTHON_BIN" "$SCRIPT_DIR/tri_ops.py" init
 
+if [ "${TRI_OPS_SERVE:-0}" = "1" ]; then
+  TRI_OPS_SOCKET="${TRI_OPS_SOCKET:-${TRI_STATE_DIR}/ops/tri_ops.sock}"
+  export TRI_OPS_SOCKET
+  nohup "$PYTHON_BIN" "$SCRIPT_DIR/tri_ops.py" serve >>"${TRI_STATE_DIR}/ops/tri_ops_serve.log" 2>&1 &
+fi
+
 exec "$SCRIPT_DIR/tri_wsl_runner.sh"
@@ -21,8 +21,37 @@ fi
 HEARTBEAT_SECS="${TRI_OPS_HEARTBEAT_SECONDS:-45}"
 POLL_SECS="${TRI_OPS_POLL_SECONDS:-30}"
 
+TRI_OPS_SOCKET="${TRI_OPS_SOCKET:-}"
+
+# Route through a resident `tri_ops serve` when one is listening; fall back to a fresh interpreter.
 tri_ops() {
-  "$PYTHON_BIN" "$SCRIPT_DIR/tri_ops.py" "$@"
+  if [ -n "$TRI_OPS_SOCKET" ] && [ -S "$TRI_OPS_SOCKET" ] && command -v socat >/dev/null 2>&1; then
+    local reply rc
+    local -a argv=("$@")
+    if [ "${1:-}" = "heartbeat" ]; then
+      argv+=(--pid "$$")
+    fi
+    local err_file="${TMPDIR:-/tmp}/tri_ops_socat.$BASHPID" socat_rc err=""
+    reply="$(printf '%s\0' "${argv[@]}" | socat -t 3600 - "UNIX-CONNECT:$TRI_OPS_SOCKET" 2>"$err_file")"
+    socat_rc=$?
+    [ -s "$err_file" ] && err="$(<"$err_file")"
+    rm -f "$err_file"
+    if [ -n "$reply" ]; then
+      rc="${reply%%$'\n'*}"
+      if [ "$reply" != "$rc" ]; then
+        printf '%s\n' "${reply#*$'\n'}"
+      fi
+      return "$rc"
+    fi
+    # Only a failed connect falls back to a local run. Once connected, the daemon may already have
+    # run the command (claim_next, write_result, ...), so a lost reply must not run it twice.
+    if [ "$socat_rc" -eq 0 ] || [[ "$err" != *"connect("* ]]; then
+      echo "tri_ops: no reply from $TRI_OPS_SOCKET for $1 (not run locally)" >&2
+      return 1
+    fi
+  fi
+  # -m loads tri_ops from its cached bytecode; running tri_ops.py as a script recompiles it every call.
+  PYTHONPATH="$SCRIPT_DIR${PYTHONPATH:+:$PYTHONPATH}" "$PYTHON_BIN" -m tri_ops "$@"
 }
 
 lock_active() {
@@ -116,6 +145,8 @@ run_project() {
   local log_path="${project_dir}/stdout.log"
 
   start_heartbeat_loop "running_${project}" "$project" "$cycle"
+  rm -f "${project_dir}/exit_code"
+  touch "${project_dir}/run.started"
 
   if [ -x "$runner" ]; then
     EXECUTABLE_PATH="$executable" \
@@ -131,6 +162,7 @@ run_project() {
       bash "$runner" >"$log_path" 2>&1
   fi
   local exit_code=$?
+  echo "$exit_code" >"${project_dir}/exit_code"
 
   stop_heartbeat_loop
   tri_ops heartbeat --agent wsl --phase "done_${project}" --current-task "exit=$exit_code" --cycle "$cycle" >/dev/null 2>&1 || true